@@ -56,6 +56,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'questionnaires.middleware.MetricsMiddleware',  # Métriques Prometheus (en premier pour tout mesurer)
+    'questionnaires.middleware.ServerTimingMiddleware',  # En-tête Server-Timing (si SERVER_TIMING_ENABLED)
+    'questionnaires.middleware.SlowQueryLogMiddleware',  # Journal des requêtes SQL lentes (si seuil > 0)
+    'questionnaires.middleware.ReplicaRoutingMiddleware',  # Lectures sur le réplica (si configuré)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,15 +68,19 @@ MIDDLEWARE = [
     'axes.middleware.AxesMiddleware',  # Protection brute force (DOIT être après AuthenticationMiddleware)
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'questionnaires.middleware.ProfilingMiddleware',  # Profilage à la demande (staff, après AuthenticationMiddleware)
 ]
 
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Moteur Django standard, rendus chronométrés pour Server-Timing
+        'BACKEND': 'questionnaires.template_backends.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],  # Templates à la racine
-        'APP_DIRS': True,  # Cherche aussi dans apps/templates/
+        # Cherche aussi dans apps/templates/. Sans 'loaders' explicites, Django
+        # utilise le chargeur en cache (templates compilés une fois par processus)
+        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -97,8 +105,41 @@ WSGI_APPLICATION = 'config.wsgi.application'
 #     }
 # }
 
-# Database - Support SQLite (dev) et MySQL (prod)
-if env('USE_MYSQL', default=False):
+# Database - Support SQLite (dev), PostgreSQL (prod) et MySQL (historique)
+if env.bool('USE_POSTGRES', default=False):
+    # Production - PostgreSQL (psycopg 3 et pool : pip install -r requirements-postgres.txt)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': env('DB_NAME'),
+            'USER': env('DB_USER'),
+            'PASSWORD': env('DB_PASSWORD'),
+            'HOST': env('DB_HOST', default='localhost'),
+            'PORT': env('DB_PORT', default='5432'),
+            'OPTIONS': {},
+        }
+    }
+    if env.bool('DB_POOL', default=True):
+        # Pool de connexions natif : les connexions sont ouvertes au démarrage
+        # du worker puis réutilisées, et vérifiées avant chaque emprunt.
+        # Incompatible avec CONN_MAX_AGE > 0.
+        from psycopg_pool import ConnectionPool
+
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': env.int('DB_POOL_MIN_SIZE', default=2),
+            'max_size': env.int('DB_POOL_MAX_SIZE', default=10),
+            'timeout': env.int('DB_POOL_TIMEOUT', default=10),
+            'check': ConnectionPool.check_connection,
+        }
+    else:
+        # Sans pool (ex: derrière PgBouncer) : connexions persistantes
+        DATABASES['default']['CONN_MAX_AGE'] = env.int('CONN_MAX_AGE', default=600)
+        DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+        # PgBouncer en mode transaction ne supporte pas les curseurs nommés
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = env.bool(
+            'DISABLE_SERVER_SIDE_CURSORS', default=False
+        )
+elif env('USE_MYSQL', default=False):
     # Production - MySQL
     DATABASES = {
         'default': {
@@ -109,6 +150,9 @@ if env('USE_MYSQL', default=False):
             'PASSWORD': env('DB_PASSWORD'),
             'HOST': env('DB_HOST', default='localhost'),
             'PORT': env('DB_PORT', default='3306'),
+            # Connexions persistantes (pas de pool natif pour MySQL)
+            'CONN_MAX_AGE': env.int('CONN_MAX_AGE', default=600),
+            'CONN_HEALTH_CHECKS': True,
             'OPTIONS': {
                 'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
                 'charset': 'utf8mb4',
@@ -116,13 +160,51 @@ if env('USE_MYSQL', default=False):
         }
     }
 else:
-    # Développement - SQLite
+    # SQLite - développement, et production pour les petites installations
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
+            'NAME': BASE_DIR / env('SQLITE_NAME', default='db.sqlite3'),
+            'OPTIONS': {},
         }
     }
+    if env.bool('SQLITE_WAL', default=True):
+        # Journal WAL : les lectures (dashboard, export) ne sont plus bloquées
+        # par les enregistrements de questionnaires. Les transactions
+        # démarrent en IMMEDIATE : un écrivain attend le verrou (timeout)
+        # au lieu d'échouer en "database is locked" lors de sa première écriture.
+        DATABASES['default']['OPTIONS'] = {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'  # sûr en WAL, fsync au checkpoint seulement
+                f"PRAGMA mmap_size={env.int('SQLITE_MMAP_SIZE', default=128 * 1024 * 1024)};"
+                f"PRAGMA cache_size=-{env.int('SQLITE_CACHE_SIZE_KB', default=32 * 1024)};"
+                'PRAGMA temp_store=MEMORY;'
+            ),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': env.int('SQLITE_BUSY_TIMEOUT', default=20),  # secondes
+        }
+
+# Réplica en lecture seule (optionnel) pour le dashboard, l'export, les fiches
+# entreprise et les listes de l'admin (cf. questionnaires.routers).
+# DB_REPLICA_HOST : même base que 'default' sur un autre serveur (PostgreSQL/MySQL)
+# DB_REPLICA_NAME : autre fichier SQLite, pour tester le routage en local
+if env('DB_REPLICA_HOST', default='') or env('DB_REPLICA_NAME', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': env('DB_REPLICA_HOST', default=DATABASES['default'].get('HOST', '')),
+        'PORT': env('DB_REPLICA_PORT', default=DATABASES['default'].get('PORT', '')),
+        'NAME': env('DB_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        # Les tests lisent la base de test principale au travers de l'alias
+        'TEST': {'MIRROR': 'default'},
+    }
+    if DATABASES['replica']['ENGINE'] == 'django.db.backends.sqlite3':
+        DATABASES['replica']['NAME'] = BASE_DIR / DATABASES['replica']['NAME']
+REPLICA_DATABASE = 'replica' if 'replica' in DATABASES else None
+REPLICA_APPS = ['questionnaires']
+# Durée pendant laquelle un utilisateur lit sur la base principale après une écriture
+REPLICA_STICKY_SECONDS = env.int('REPLICA_STICKY_SECONDS', default=10)
+DATABASE_ROUTERS = ['questionnaires.routers.ReplicaRouter']
 
 
 # Password validation
@@ -178,8 +260,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'users.User'
 
 # Session configuration
+# Sessions anonymes (parcours client) en cookie signé, sessions des
+# collaborateurs en base : cf. questionnaires/sessions.py
+SESSION_ENGINE = 'questionnaires.sessions'
+# Cache des sessions des collaborateurs (cached_db), utilisé seulement s'il est
+# partagé entre les workers (Redis, Memcached) ; ignoré si c'est un cache
+# mémoire local (LocMemCache), qui servirait des sessions déjà supprimées
+SESSION_CACHE_ALIAS = env('SESSION_CACHE_ALIAS', default='default')
 SESSION_COOKIE_AGE = 14400  # 4 heures
-SESSION_SAVE_EVERY_REQUEST = True
+# Expiration glissante : session réenregistrée au plus une fois par intervalle
+# (et non à chaque requête, SESSION_SAVE_EVERY_REQUEST)
+SESSION_REFRESH_THRESHOLD = env.int('SESSION_REFRESH_THRESHOLD', default=900)  # 15 minutes
 SESSION_COOKIE_SECURE = not DEBUG  # True si DEBUG=False
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
@@ -205,8 +296,58 @@ CACHES = {
     }
 }
 
+# Pages informatives servies depuis le cache aux visiteurs anonymes
+# (questionnaires/pages.py), en secondes
+PAGE_CACHE_TIMEOUT = env.int('PAGE_CACHE_TIMEOUT', default=3600)
+
 # API INSEE
 INSEE_API_KEY = env('INSEE_API_KEY', default='')
+INSEE_API_URL = env('INSEE_API_URL', default='https://api.insee.fr/api-sirene/3.11')
+
+# Profilage à la demande (staff uniquement) : en-tête X-Profile ou ?_profile=1
+PROFILING_HEADER = 'X-Profile'
+PROFILING_QUERY_PARAM = '_profile'
+PROFILING_MAX_PROFILES = env.int('PROFILING_MAX_PROFILES', default=50)
+
+# Métriques Prometheus (/metrics) : accessibles au staff ou aux IP autorisées.
+# METRICS_DIR est nécessaire avec plusieurs workers gunicorn (agrégation) et
+# doit être vidé au démarrage du serveur.
+METRICS_DIR = env('METRICS_DIR', default=None)
+METRICS_FLUSH_INTERVAL = 5  # secondes
+METRICS_ALLOWED_IPS = env.list('METRICS_ALLOWED_IPS', default=[])
+
+# En-tête Server-Timing (db, insee, template, cache) - désactivé par défaut en production
+SERVER_TIMING_ENABLED = env.bool('SERVER_TIMING_ENABLED', default=DEBUG)
+
+# Journal des requêtes SQL lentes (0 = désactivé). Synthèse : manage.py slow_queries
+SLOW_QUERY_THRESHOLD_MS = env.float('SLOW_QUERY_THRESHOLD_MS', default=0)
+SLOW_QUERY_LOG_FILE = env('SLOW_QUERY_LOG_FILE', default=str(BASE_DIR / 'slow_queries.log'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        # Rotation externe (logrotate) : plusieurs workers gunicorn écrivent
+        # dans le fichier, aucun ne doit le tourner lui-même. Le fichier est
+        # rouvert quand logrotate l'a déplacé.
+        'slow_queries': {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': SLOW_QUERY_LOG_FILE,
+            'formatter': 'message',
+            'delay': True,  # Fichier créé à la première requête lente seulement
+        },
+    },
+    'loggers': {
+        'etac.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
 
 # Login/Logout URLs
 LOGIN_URL = '/collaborateur/login/'
@@ -216,8 +357,14 @@ LOGOUT_REDIRECT_URL = '/'
 # Django Axes - Protection contre les attaques brute force
 AUTHENTICATION_BACKENDS = [
     'axes.backends.AxesStandaloneBackend',  # Backend axes pour la protection brute force
-    'django.contrib.auth.backends.ModelBackend',  # Backend par défaut de Django
+    'users.backends.CachedModelBackend',  # ModelBackend, utilisateur de la session en cache
 ]
+# Cache des utilisateurs connectés (users/backends.py) : alias d'un cache partagé
+# entre les workers (Redis, Memcached), désactivé par défaut. Un cache mémoire
+# local est refusé (vérification users.E001).
+USER_CACHE_ALIAS = env('USER_CACHE_ALIAS', default=None)
+# Durée du cache des utilisateurs connectés, en secondes (invalidé à l'enregistrement)
+USER_CACHE_TIMEOUT = env.int('USER_CACHE_TIMEOUT', default=60)
 AXES_FAILURE_LIMIT = 5  # Nombre max de tentatives échouées
 AXES_COOLOFF_TIME = 1  # Temps de blocage en heures
 AXES_LOCKOUT_PARAMETERS = [['username', 'ip_address']]  # Bloquer par combinaison user + IP
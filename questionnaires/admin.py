@@ -1,5 +1,16 @@
-from django.contrib import admin
-from .models import Entreprise, QuestionnaireClient, QuestionnaireCollaborateur
+import json
+
+from django.contrib import admin, messages
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import filesizeformat
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from .archivage import RestaurationImpossible, decompresser, restaurer
+from .models import (
+    Brouillon, Entreprise, EntrepriseArchivee, QuestionnaireClient, QuestionnaireCollaborateur, ProfilRequete,
+)
 
 
 @admin.register(Entreprise)
@@ -8,14 +19,14 @@ class EntrepriseAdmin(admin.ModelAdmin):
     list_filter = ('is_archived', 'date_creation', 'date_modification')
     search_fields = ('siren', 'nom_entreprise')
     ordering = ('-date_modification',)
-    readonly_fields = ('date_creation', 'date_modification')
+    readonly_fields = ('date_creation', 'date_modification', 'date_archivage')
 
     fieldsets = (
         ('Informations entreprise', {
             'fields': ('siren', 'nom_entreprise')
         }),
         ('Statut', {
-            'fields': ('is_archived',)
+            'fields': ('is_archived', 'date_archivage')
         }),
         ('Dates', {
             'fields': ('date_creation', 'date_modification'),
@@ -23,11 +34,71 @@ class EntrepriseAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        # Date d'archivage tenue à jour comme depuis le dashboard
+        if 'is_archived' in form.changed_data:
+            obj.date_archivage = timezone.now() if obj.is_archived else None
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(EntrepriseArchivee)
+class EntrepriseArchiveeAdmin(admin.ModelAdmin):
+    list_display = ('siren', 'nom_entreprise', 'date_archivage', 'date_transfert',
+                    'questionnaire_client', 'questionnaire_collaborateur', 'taille')
+    list_filter = ('questionnaire_client', 'questionnaire_collaborateur', 'date_transfert')
+    search_fields = ('siren', 'nom_entreprise')
+    exclude = ('donnees',)
+    readonly_fields = ('siren', 'nom_entreprise', 'date_archivage', 'date_transfert',
+                       'questionnaire_client', 'questionnaire_collaborateur', 'taille', 'contenu')
+    actions = ['action_restaurer']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Taille compressée')
+    def taille(self, obj):
+        return filesizeformat(len(obj.donnees))
+
+    @admin.display(description='Contenu archivé')
+    def contenu(self, obj):
+        return format_html('<pre>{}</pre>', json.dumps(decompresser(obj.donnees), indent=2, ensure_ascii=False))
+
+    @admin.action(description='Restaurer dans les tables courantes (entreprises archivées)',
+                  permissions=['delete'])
+    def action_restaurer(self, request, queryset):
+        restaurees = 0
+        for archive in queryset:
+            try:
+                restaurer(archive, utilisateur=request.user)
+            except RestaurationImpossible as e:
+                self.message_user(request, str(e), messages.WARNING)
+            else:
+                restaurees += 1
+        if restaurees:
+            self.message_user(request, f'{restaurees} entreprise(s) restaurée(s).', messages.SUCCESS)
+
+
+class AccompagnementFilter(admin.SimpleListFilter):
+    """Questionnaires dont l'accompagnement souhaité contient un choix (test de bit)"""
+    title = 'accompagnement souhaité'
+    parameter_name = 'accompagnement'
+
+    def lookups(self, request, model_admin):
+        return QuestionnaireClient.CHOIX_ACCOMPAGNEMENT
+
+    def queryset(self, request, queryset):
+        if self.value() in dict(QuestionnaireClient.CHOIX_ACCOMPAGNEMENT):
+            return queryset.filter(accompagnement_souhaite__has=self.value())
+        return queryset
+
 
 @admin.register(QuestionnaireClient)
 class QuestionnaireClientAdmin(admin.ModelAdmin):
     list_display = ('entreprise', 'date_completion', 'date_modification', 'modifie_par_collaborateur')
-    list_filter = ('date_completion', 'date_modification', 'gestion_future', 'aisance_outils')
+    list_filter = ('date_completion', 'date_modification', 'gestion_future', 'aisance_outils', AccompagnementFilter)
     search_fields = ('entreprise__siren', 'entreprise__nom_entreprise')
     readonly_fields = ('date_completion', 'date_modification')
     autocomplete_fields = ['entreprise']
@@ -106,3 +177,54 @@ class QuestionnaireCollaborateurAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(Brouillon)
+class BrouillonAdmin(admin.ModelAdmin):
+    list_display = ('entreprise', 'type_questionnaire', 'version', 'auteur', 'date_modification')
+    list_filter = ('type_questionnaire', 'date_modification')
+    search_fields = ('entreprise__siren', 'entreprise__nom_entreprise')
+    readonly_fields = ('entreprise', 'type_questionnaire', 'donnees', 'version', 'auteur', 'date_modification')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ProfilRequete)
+class ProfilRequeteAdmin(admin.ModelAdmin):
+    list_display = ('date', 'methode', 'chemin', 'vue', 'statut', 'duree_ms', 'nb_requetes_sql',
+                    'duree_sql_ms', 'utilisateur', 'lien_telechargement')
+    list_filter = ('vue', 'statut')
+    search_fields = ('chemin', 'vue')
+    exclude = ('donnees',)
+    readonly_fields = ('date', 'utilisateur', 'methode', 'chemin', 'vue', 'statut', 'duree_ms',
+                       'nb_requetes_sql', 'duree_sql_ms', 'requetes_sql', 'resume', 'lien_telechargement')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/telecharger/', self.admin_site.admin_view(self.telecharger),
+                 name='questionnaires_profilrequete_telecharger'),
+        ] + super().get_urls()
+
+    @admin.display(description='Profil')
+    def lien_telechargement(self, obj):
+        url = reverse('admin:questionnaires_profilrequete_telecharger', args=[obj.pk])
+        return format_html('<a href="{}">Télécharger (.prof)</a>', url)
+
+    def telecharger(self, request, pk):
+        """Télécharge le profil au format .prof (pstats, snakeviz...)"""
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profil = get_object_or_404(ProfilRequete, pk=pk)
+        response = HttpResponse(bytes(profil.donnees), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="profil-{profil.pk}.prof"'
+        return response
@@ -0,0 +1,150 @@
+"""
+Archivage à froid des entreprises archivées depuis longtemps.
+
+Les entreprises archivées (is_archived) depuis plus d'un seuil sont retirées
+des tables courantes avec leurs questionnaires et conservées dans
+EntrepriseArchivee : une ligne par entreprise, les lignes d'origine
+sérialisées (sérialiseur de Django, en JSON) puis compressées (zlib). Les tables
+courantes et leurs index restent ainsi dimensionnés au portefeuille actif.
+
+Le transfert se fait par lots, un lot par transaction : une interruption ne
+laisse jamais une entreprise à la fois dans les deux tables, ni dans aucune.
+La restauration remet les lignes à l'identique (dates comprises) dans les
+tables courantes, toujours archivées, avec une nouvelle date d'archivage.
+
+Utilisé par la commande cold_storage et l'admin (action « Restaurer »).
+"""
+import json
+import zlib
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core import serializers
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Entreprise, EntrepriseArchivee, QuestionnaireClient, QuestionnaireCollaborateur
+
+# Entreprises transférées par transaction
+TAILLE_LOT = 500
+
+
+def _en_json(valeur):
+    # Dates complètes (le sérialiseur JSON de Django tronque à la milliseconde)
+    return valeur.isoformat() if hasattr(valeur, 'isoformat') else str(valeur)
+
+
+def compresser(objets):
+    """Sérialise des instances en JSON compressé"""
+    contenu = json.dumps(serializers.serialize('python', objets), default=_en_json, ensure_ascii=False)
+    return zlib.compress(contenu.encode(), 9)
+
+
+def decompresser(donnees):
+    """Contenu d'une archive : liste de dicts {model, pk, fields}"""
+    return json.loads(zlib.decompress(bytes(donnees)))
+
+
+def candidats(jours):
+    """Entreprises archivées depuis plus de `jours` jours"""
+    return Entreprise.objects.filter(
+        is_archived=True,
+        date_archivage__lt=timezone.now() - timedelta(days=jours),
+    )
+
+
+def _archiver(entreprise):
+    objets = [entreprise]
+    qc = getattr(entreprise, 'questionnaire_client', None)
+    qco = getattr(entreprise, 'questionnaire_collaborateur', None)
+    objets += [q for q in (qc, qco) if q is not None]
+    return EntrepriseArchivee(
+        siren=entreprise.siren,
+        nom_entreprise=entreprise.nom_entreprise,
+        date_archivage=entreprise.date_archivage,
+        questionnaire_client=qc is not None,
+        questionnaire_collaborateur=qco is not None,
+        donnees=compresser(objets),
+    )
+
+
+def transferer(jours, taille_lot=TAILLE_LOT):
+    """
+    Transfère vers les archives les entreprises archivées depuis plus de
+    `jours` jours, avec leurs questionnaires.
+
+    Une archive plus ancienne du même SIREN (entreprise recréée puis
+    archivée de nouveau) est remplacée.
+
+    Returns:
+        int: nombre d'entreprises transférées
+    """
+    total = 0
+    while True:
+        with transaction.atomic():
+            # Lot relu dans la transaction : une entreprise désarchivée entre
+            # deux lots n'est pas transférée
+            lot = list(
+                candidats(jours)
+                .select_related('questionnaire_client', 'questionnaire_collaborateur')
+                .order_by('siren')[:taille_lot]
+            )
+            if not lot:
+                return total
+            sirens = [entreprise.siren for entreprise in lot]
+            EntrepriseArchivee.objects.filter(siren__in=sirens).delete()
+            EntrepriseArchivee.objects.bulk_create([_archiver(entreprise) for entreprise in lot])
+            QuestionnaireClient.objects.filter(entreprise__in=sirens).delete()
+            QuestionnaireCollaborateur.objects.filter(entreprise__in=sirens).delete()
+            Entreprise.objects.filter(siren__in=sirens).delete()
+        total += len(lot)
+
+
+class RestaurationImpossible(Exception):
+    """L'archive ne peut pas être restaurée (SIREN déjà présent, collaborateur supprimé)"""
+
+
+def restaurer(archive, utilisateur=None):
+    """
+    Restaure une entreprise archivée et ses questionnaires dans les tables
+    courantes (toujours archivée, date d'archivage remise à maintenant).
+
+    Args:
+        archive (EntrepriseArchivee): archive à restaurer (supprimée ensuite)
+        utilisateur: collaborateur auquel rattacher le questionnaire
+            collaborateur si son auteur a été supprimé
+
+    Raises:
+        RestaurationImpossible
+    """
+    if Entreprise.objects.filter(siren=archive.siren).exists():
+        raise RestaurationImpossible(f'{archive.siren} : entreprise déjà présente')
+
+    objets = list(serializers.deserialize('python', decompresser(archive.donnees)))
+    auteurs = {
+        getattr(objet.object, champ)
+        for objet in objets
+        for champ in ('collaborateur_id', 'modifie_par_collaborateur_id')
+        if getattr(objet.object, champ, None) is not None
+    }
+    existants = set(get_user_model().objects.filter(pk__in=auteurs).values_list('pk', flat=True))
+
+    for objet in objets:
+        instance = objet.object
+        if isinstance(instance, Entreprise):
+            instance.date_archivage = timezone.now()
+        elif isinstance(instance, QuestionnaireClient):
+            if instance.modifie_par_collaborateur_id not in existants:
+                instance.modifie_par_collaborateur_id = None
+        elif isinstance(instance, QuestionnaireCollaborateur):
+            if instance.collaborateur_id not in existants:
+                if utilisateur is None:
+                    raise RestaurationImpossible(
+                        f'{archive.siren} : le collaborateur du questionnaire a été supprimé'
+                    )
+                instance.collaborateur = utilisateur
+
+    with transaction.atomic():
+        for objet in objets:
+            objet.save()
+        archive.delete()
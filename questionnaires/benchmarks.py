@@ -0,0 +1,416 @@
+"""
+Banc de mesure des vues et fonctions les plus sollicitées.
+
+Chaque scénario est exécuté plusieurs fois contre la base courante (qui doit
+avoir été peuplée au préalable, cf. commande seed_synthetic). Les appels à
+l'API INSEE sont servis par un bouchon HTTP local afin de mesurer le coût
+réel de la pile requests sans dépendre du réseau.
+
+Utilisé par la commande `bench` (option --concurrence pour run_concurrency).
+"""
+import json
+import statistics
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .fields import CompactChoiceField
+from .models import Entreprise, QuestionnaireClient, QuestionnaireCollaborateur
+from .utils import get_company_info
+
+User = get_user_model()
+
+BENCH_EMAIL = 'bench@etac.invalid'
+# SIREN fictif (valide au sens de Luhn) utilisé pour les scénarios d'écriture
+BENCH_SIREN = '999999998'
+
+
+class _InseeHandler(BaseHTTPRequestHandler):
+    """Répond comme l'API Sirene : 200 avec une dénomination, 404 si le SIREN commence par 000"""
+
+    def do_GET(self):
+        siren = self.path.rstrip('/').rsplit('/', 1)[-1]
+        if self.server.latence:
+            time.sleep(self.server.latence)
+        if siren.startswith('000'):
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps({
+            'uniteLegale': {
+                'siren': siren,
+                'periodesUniteLegale': [{'denominationUniteLegale': f'ENTREPRISE {siren}'}],
+            }
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class InseeStandIn:
+    """
+    Bouchon local de l'API INSEE, lancé dans un thread.
+
+    Usage:
+        with InseeStandIn(latence=0.02) as insee:
+            with override_settings(INSEE_API_URL=insee.url):
+                ...
+    """
+
+    def __init__(self, latence=0.0):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _InseeHandler)
+        self.server.latence = latence
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _percentile(valeurs, centile):
+    """Centile par interpolation linéaire (valeurs non vides)"""
+    ordonnees = sorted(valeurs)
+    position = (len(ordonnees) - 1) * centile / 100
+    bas = int(position)
+    haut = min(bas + 1, len(ordonnees) - 1)
+    return ordonnees[bas] + (ordonnees[haut] - ordonnees[bas]) * (position - bas)
+
+
+def measure(fonction, iterations, lignes=1, preparer=None):
+    """
+    Mesure un scénario.
+
+    Args:
+        fonction: callable sans argument exécutant le scénario
+        iterations (int): nombre d'exécutions chronométrées
+        lignes (int): lignes traitées par exécution (pour le débit)
+        preparer: callable optionnel appelé avant chaque exécution (hors chrono)
+
+    Returns:
+        dict: p50_ms, p95_ms, mean_ms, queries, peak_memory_kb, rows_per_second
+    """
+    # Échauffement + mesure mémoire sur une exécution dédiée : tracemalloc
+    # ralentit fortement l'exécution, on ne le garde pas pendant le chrono.
+    if preparer:
+        preparer()
+    tracemalloc.start()
+    try:
+        fonction()
+        _, pic = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    durees, requetes = [], []
+    for _ in range(iterations):
+        if preparer:
+            preparer()
+        with CaptureQueriesContext(connection) as ctx:
+            debut = time.perf_counter()
+            fonction()
+            durees.append(time.perf_counter() - debut)
+        requetes.append(len(ctx.captured_queries))
+
+    moyenne = statistics.fmean(durees)
+    return {
+        'p50_ms': round(_percentile(durees, 50) * 1000, 3),
+        'p95_ms': round(_percentile(durees, 95) * 1000, 3),
+        'mean_ms': round(moyenne * 1000, 3),
+        'queries': max(requetes),
+        'peak_memory_kb': round(pic / 1024, 1),
+        'rows_per_second': round(lignes / moyenne, 1) if moyenne else None,
+    }
+
+
+def _check(response, attendu=200):
+    if response.status_code != attendu:
+        raise AssertionError(f'{response.request["PATH_INFO"]} a répondu {response.status_code}')
+    # Consommer les réponses en flux pour mesurer la génération complète
+    if getattr(response, 'streaming', False):
+        for _ in response.streaming_content:
+            pass
+
+
+def _reponses_client():
+    """Données POST valides pour le questionnaire client"""
+    return {
+        'logiciel_facturation': 'true',
+        'logiciel_facturation_nom': 'Sage',
+        'factures_format_electronique': 'yes',
+        'gestion_future': 'internal',
+        'aisance_outils': 'medium',
+        'reception_factures_achats': 'email',
+        'envoi_factures_ventes': 'email',
+        'conservation_factures': 'mixed',
+        'accompagnement_souhaite': ['information', 'formation'],
+    }
+
+
+def _repartition_choix():
+    """Répartition des réponses de chaque champ à choix unique : un GROUP BY par champ"""
+    for modele in (QuestionnaireClient, QuestionnaireCollaborateur):
+        for field in modele._meta.concrete_fields:
+            if isinstance(field, CompactChoiceField):
+                list(modele.objects.values(field.name).annotate(nombre=Count('pk')).order_by())
+
+
+def build_scenarios():
+    """
+    Construit les scénarios mesurés sur la base courante.
+
+    Returns:
+        dict: nom -> (fonction, lignes, preparer)
+    """
+    user, _ = User.objects.get_or_create(
+        email=BENCH_EMAIL,
+        defaults={'username': 'bench', 'is_collaborateur': True},
+    )
+    collaborateur = Client()
+    collaborateur.force_login(user)
+
+    actives = Entreprise.objects.filter(is_archived=False)
+    nb_actives = actives.count()
+    exemple = (
+        actives.filter(questionnaire_client__isnull=False, questionnaire_collaborateur__isnull=False)
+        .values_list('siren', flat=True).first()
+        or actives.values_list('siren', flat=True).first()
+    )
+
+    client = Client()
+    session = client.session
+    session['client_siren'] = BENCH_SIREN
+    session['client_nom_entreprise'] = 'ENTREPRISE BENCH'
+    session.save()
+    reponses = _reponses_client()
+
+    scenarios = {
+        'dashboard': (
+            lambda: _check(collaborateur.get(reverse('dashboard'))),
+            min(20, nb_actives), None,
+        ),
+        'dashboard_search': (
+            lambda: _check(collaborateur.get(reverse('dashboard'), {'search': 'Martin', 'sort': 'nom_entreprise'})),
+            min(20, nb_actives), None,
+        ),
+        'export_csv': (
+            lambda: _check(collaborateur.get(reverse('export_csv'))),
+            nb_actives, None,
+        ),
+        'repartition_choix': (
+            _repartition_choix,
+            QuestionnaireClient.objects.count() + QuestionnaireCollaborateur.objects.count(), None,
+        ),
+        'client_questionnaire_post': (
+            lambda: _check(client.post(reverse('client_questionnaire'), reponses), attendu=302),
+            1, None,
+        ),
+        'validate_siren': (
+            lambda: _check(client.get(reverse('validate_siren'), {'siren': '552100554'})),
+            1, cache.clear,
+        ),
+        'get_company_info_miss': (
+            lambda: get_company_info('552100554'),
+            1, cache.clear,
+        ),
+        'get_company_info_hit': (
+            lambda: get_company_info('552100554'),
+            1, None,
+        ),
+    }
+    if exemple:
+        scenarios['voir_questionnaire'] = (
+            lambda: _check(collaborateur.get(reverse('voir_questionnaire', args=[exemple]))),
+            1, None,
+        )
+    return scenarios
+
+
+def table_sizes():
+    """
+    Place occupée par les tables de l'application, index compris.
+
+    Returns:
+        dict: table -> octets (vide si le SGBD ne l'expose pas, par exemple
+        SQLite compilé sans dbstat)
+    """
+    tables = [modele._meta.db_table for modele in (Entreprise, QuestionnaireClient, QuestionnaireCollaborateur)]
+    marques = ', '.join(['%s'] * len(tables))
+    requetes = {
+        'sqlite': f'SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name '
+                  f'WHERE m.tbl_name IN ({marques}) GROUP BY m.tbl_name',
+        'postgresql': f'SELECT relname, pg_total_relation_size(oid) FROM pg_class WHERE relname IN ({marques})',
+        'mysql': f'SELECT table_name, data_length + index_length FROM information_schema.tables '
+                 f'WHERE table_schema = DATABASE() AND table_name IN ({marques})',
+    }
+    if connection.vendor not in requetes:
+        return {}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(requetes[connection.vendor], tables)
+            return {table: int(octets) for table, octets in cursor.fetchall()}
+    except OperationalError:
+        return {}
+
+
+def run_benchmarks(iterations=20, scenarios=None, latence_insee=0.0):
+    """
+    Exécute les scénarios sur la base courante avec un bouchon INSEE local.
+
+    Args:
+        iterations (int): nombre d'exécutions chronométrées par scénario
+        scenarios (list|None): noms des scénarios à exécuter (tous par défaut)
+        latence_insee (float): latence simulée de l'API INSEE, en secondes
+
+    Returns:
+        dict: nom du scénario -> mesures (cf. measure)
+    """
+    resultats = {}
+    with InseeStandIn(latence=latence_insee) as insee, override_settings(INSEE_API_URL=insee.url):
+        disponibles = build_scenarios()
+        for nom in scenarios or disponibles:
+            if nom not in disponibles:
+                continue
+            fonction, lignes, preparer = disponibles[nom]
+            resultats[nom] = measure(fonction, iterations, lignes=lignes, preparer=preparer)
+        cache.clear()
+    return resultats
+
+
+def run_concurrency(duree=5.0, lecteurs=4, ecrivains=2):
+    """
+    Charge simultanée : des threads lisent le dashboard pendant que d'autres
+    enregistrent des questionnaires clients, chacun avec sa connexion.
+
+    Mesure le débit de chaque population et compte les erreurs SQL, en
+    particulier "database is locked" (SQLite sans WAL ni transactions
+    IMMEDIATE). La base doit être un fichier, pas une base en mémoire.
+
+    Args:
+        duree (float): durée de la charge, en secondes
+        lecteurs (int): threads lisant le dashboard
+        ecrivains (int): threads enregistrant des questionnaires
+
+    Returns:
+        dict: reads, writes, reads_per_second, writes_per_second,
+        read_p95_ms, write_p95_ms, locked_errors, errors
+    """
+    user, _ = User.objects.get_or_create(
+        email=BENCH_EMAIL,
+        defaults={'username': 'bench', 'is_collaborateur': True},
+    )
+    reponses = _reponses_client()
+    durees = {'lecture': [], 'ecriture': []}
+    erreurs = {'locked': 0, 'autres': 0}
+    verrou = threading.Lock()
+    fin = time.perf_counter() + duree
+
+    def travailler(population, numero):
+        client = Client()
+        if population == 'lecture':
+            client.force_login(user)
+
+            def appel():
+                _check(client.get(reverse('dashboard')))
+        else:
+            # Un SIREN fictif par écrivain : mises à jour répétées du même questionnaire
+            session = client.session
+            session['client_siren'] = f'{BENCH_SIREN[:5]}{numero:04d}'
+            session['client_nom_entreprise'] = f'ENTREPRISE BENCH {numero}'
+            session.save()
+
+            def appel():
+                _check(client.post(reverse('client_questionnaire'), reponses), attendu=302)
+        mesures = []
+        try:
+            while time.perf_counter() < fin:
+                debut = time.perf_counter()
+                try:
+                    appel()
+                except OperationalError as e:
+                    with verrou:
+                        erreurs['locked' if 'locked' in str(e) else 'autres'] += 1
+                    continue
+                mesures.append(time.perf_counter() - debut)
+        finally:
+            connection.close()
+        with verrou:
+            durees[population].extend(mesures)
+
+    threads = [
+        threading.Thread(target=travailler, args=('lecture', i)) for i in range(lecteurs)
+    ] + [
+        threading.Thread(target=travailler, args=('ecriture', i)) for i in range(ecrivains)
+    ]
+    debut = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ecoule = time.perf_counter() - debut
+
+    def p95(valeurs):
+        return round(_percentile(valeurs, 95) * 1000, 3) if valeurs else None
+
+    return {
+        'reads': len(durees['lecture']),
+        'writes': len(durees['ecriture']),
+        'reads_per_second': round(len(durees['lecture']) / ecoule, 1),
+        'writes_per_second': round(len(durees['ecriture']) / ecoule, 1),
+        'read_p95_ms': p95(durees['lecture']),
+        'write_p95_ms': p95(durees['ecriture']),
+        'locked_errors': erreurs['locked'],
+        'errors': erreurs['locked'] + erreurs['autres'],
+    }
+
+
+def compare_to_baseline(resultats, reference, tolerance=0.2):
+    """
+    Compare des résultats à une référence enregistrée.
+
+    Une régression est signalée quand le p95 ou le pic mémoire dépasse la
+    référence de plus de `tolerance` (20% par défaut), ou dès que le nombre
+    de requêtes SQL augmente.
+
+    Args:
+        resultats (dict): {taille: {scenario: mesures}}
+        reference (dict): même structure, issue d'un fichier de référence
+
+    Returns:
+        list: messages décrivant chaque régression
+    """
+    regressions = []
+    for taille, scenarios in resultats.items():
+        for nom, mesures in scenarios.items():
+            base = reference.get(taille, {}).get(nom)
+            if not base:
+                continue
+            if mesures['queries'] > base['queries']:
+                regressions.append(
+                    f"{nom} [{taille}] : {mesures['queries']} requêtes SQL (référence {base['queries']})"
+                )
+            for cle in ('p95_ms', 'peak_memory_kb'):
+                if base.get(cle) and mesures[cle] > base[cle] * (1 + tolerance):
+                    regressions.append(
+                        f"{nom} [{taille}] : {cle} = {mesures[cle]} (référence {base[cle]}, "
+                        f"+{(mesures[cle] / base[cle] - 1) * 100:.0f}%)"
+                    )
+    return regressions
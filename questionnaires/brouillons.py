@@ -0,0 +1,149 @@
+"""
+Brouillons de questionnaires enregistrés côté serveur.
+
+Le navigateur (static/questionnaires/js/autosave.js) n'envoie que les champs
+modifiés depuis la dernière version acquittée (PATCH sur la vue brouillon),
+regroupés après une courte pause de saisie. Le serveur les fusionne dans le
+brouillon et incrémente sa version. Une version périmée (brouillon modifié
+depuis un autre appareil) est refusée avec l'état courant, que le navigateur
+complète de ses propres modifications avant de renvoyer.
+
+À la soumission finale, le formulaire n'envoie que `brouillon=1` : les
+réponses sont relues dans le brouillon (cf. donnees_soumises), qui est
+supprimé une fois le questionnaire enregistré.
+"""
+from django.db import IntegrityError, transaction
+from django.http import QueryDict
+
+from .forms import QuestionnaireClientForm, QuestionnaireCollaborateurForm
+from .models import Brouillon, Entreprise
+
+FORMULAIRES = {
+    Brouillon.TYPE_CLIENT: QuestionnaireClientForm,
+    Brouillon.TYPE_COLLABORATEUR: QuestionnaireCollaborateurForm,
+}
+
+# Champ de la soumission finale demandant la promotion du brouillon
+CHAMP_PROMOTION = 'brouillon'
+
+
+class DiffInvalide(ValueError):
+    """Différence mal formée (version absente, champ inconnu, valeur qui n'est pas du texte)"""
+
+
+class EntrepriseInconnue(Exception):
+    """Aucune entreprise pour ce SIREN (supprimée, transférée aux archives)"""
+
+
+class VersionPerimee(Exception):
+    """Le brouillon a changé depuis la version acquittée par le navigateur"""
+
+    def __init__(self, brouillon):
+        super().__init__(f'Version courante : {brouillon.version}')
+        self.brouillon = brouillon
+
+
+def valider_diff(type_questionnaire, version, champs):
+    """
+    Vérifie une différence envoyée par le navigateur.
+
+    Args:
+        version (int): dernière version acquittée (0 sans brouillon)
+        champs (dict): champ -> valeur (texte), liste de valeurs (cases à
+            cocher multiples), ou None pour un champ vidé (case décochée)
+
+    Raises:
+        DiffInvalide
+    """
+    if not isinstance(version, int) or isinstance(version, bool) or version < 0:
+        raise DiffInvalide('« version » doit être un entier positif')
+    if not isinstance(champs, dict) or not champs:
+        raise DiffInvalide('« champs » doit être un objet non vide')
+    connus = FORMULAIRES[type_questionnaire].base_fields
+    for champ, valeur in champs.items():
+        if champ not in connus:
+            raise DiffInvalide(f'Champ inconnu : {champ}')
+        if valeur is None or isinstance(valeur, str):
+            continue
+        if not (isinstance(valeur, list) and all(isinstance(v, str) for v in valeur)):
+            raise DiffInvalide(f'{champ} : valeur invalide')
+
+
+def appliquer(siren, type_questionnaire, version, champs, auteur=None):
+    """
+    Fusionne une différence dans le brouillon (créé au premier envoi).
+
+    Returns:
+        Brouillon: brouillon à jour, version incrémentée
+
+    Raises:
+        DiffInvalide
+        EntrepriseInconnue: pas d'entreprise pour ce SIREN
+        VersionPerimee: `version` n'est pas la version courante du brouillon
+    """
+    valider_diff(type_questionnaire, version, champs)
+    cle = {'entreprise_id': siren, 'type_questionnaire': type_questionnaire}
+    with transaction.atomic():
+        try:
+            brouillon = Brouillon.objects.select_for_update().get(**cle)
+        except Brouillon.DoesNotExist:
+            # Premier envoi : la clé étrangère (contrôlée au commit) ne doit pas échouer
+            if not Entreprise.objects.filter(siren=siren).exists():
+                raise EntrepriseInconnue(siren) from None
+            brouillon = Brouillon(**cle)
+        if version != brouillon.version:
+            raise VersionPerimee(brouillon)
+        for champ, valeur in champs.items():
+            if valeur is None:
+                brouillon.donnees.pop(champ, None)
+            else:
+                brouillon.donnees[champ] = valeur
+        brouillon.version += 1
+        if auteur is not None:
+            brouillon.auteur = auteur
+        try:
+            with transaction.atomic():
+                brouillon.save()
+        except IntegrityError:
+            # Premier envoi simultané depuis un autre appareil (brouillon_unique) ;
+            # toute autre violation de contrainte est une vraie erreur
+            concurrent = Brouillon.objects.filter(**cle).first()
+            if concurrent is None:
+                raise
+            raise VersionPerimee(concurrent) from None
+    return brouillon
+
+
+def charger(siren, type_questionnaire):
+    """
+    Brouillon en cours d'un questionnaire.
+
+    Returns:
+        dict|None: {'version', 'donnees'}
+    """
+    return Brouillon.objects.filter(
+        entreprise_id=siren, type_questionnaire=type_questionnaire
+    ).values('version', 'donnees').first()
+
+
+def donnees_soumises(post, siren, type_questionnaire):
+    """
+    Données de la soumission finale. Si le formulaire demande la promotion
+    du brouillon (`brouillon=1`), ce sont les réponses du brouillon,
+    remplacées par les éventuels champs postés. Sinon, les champs postés.
+    """
+    if not post.get(CHAMP_PROMOTION):
+        return post
+    brouillon = charger(siren, type_questionnaire)
+    donnees = QueryDict(mutable=True)
+    for champ, valeur in (brouillon['donnees'] if brouillon else {}).items():
+        donnees.setlist(champ, valeur if isinstance(valeur, list) else [valeur])
+    for champ in post:
+        if champ != CHAMP_PROMOTION:
+            donnees.setlist(champ, post.getlist(champ))
+    return donnees
+
+
+def supprimer(siren, type_questionnaire):
+    """Supprime le brouillon d'un questionnaire enregistré"""
+    Brouillon.objects.filter(entreprise_id=siren, type_questionnaire=type_questionnaire).delete()
@@ -0,0 +1,67 @@
+"""
+Enregistrement des questionnaires par upsert.
+
+Plutôt que get_or_create sur l'entreprise, lecture du questionnaire existant
+puis save(), chaque écriture est un seul INSERT ... ON CONFLICT (ON DUPLICATE
+KEY UPDATE / INSERT IGNORE sous MySQL) : deux requêtes par soumission, sans
+lecture préalable. Deux premières soumissions simultanées pour un même SIREN
+ne peuvent plus lever d'IntegrityError : la seconde met à jour la ligne
+créée par la première.
+"""
+from django.db import connection, transaction
+
+from .models import Entreprise
+
+
+def upsert(modele, objets, champs):
+    """
+    INSERT ... ON CONFLICT DO UPDATE (ON DUPLICATE KEY UPDATE sous MySQL) :
+    une requête par lot au lieu des CASE WHEN de bulk_update, très lents sur
+    de nombreux champs. Les champs absents de `champs` (date_creation,
+    date_completion, is_archived...) sont conservés pour les lignes existantes.
+    """
+    cle = [modele._meta.pk.name] if connection.features.supports_update_conflicts_with_target else None
+    modele.objects.bulk_create(objets, update_conflicts=True, update_fields=champs, unique_fields=cle)
+
+
+def assurer_entreprise(siren, nom_entreprise):
+    """
+    Crée l'entreprise si elle n'existe pas (INSERT ... ON CONFLICT DO NOTHING).
+    Une entreprise existante n'est pas modifiée.
+    """
+    Entreprise.objects.bulk_create(
+        [Entreprise(siren=siren, nom_entreprise=nom_entreprise)], ignore_conflicts=True
+    )
+
+
+def enregistrer_questionnaire(form, siren, nom_entreprise, **attributs):
+    """
+    Crée ou met à jour le questionnaire d'un formulaire validé, et son
+    entreprise si besoin, en une transaction de deux requêtes.
+
+    Seuls les champs du formulaire, les `attributs` et date_modification
+    sont écrits sur un questionnaire existant : date_completion,
+    cookies_consent_date... sont conservés.
+
+    Args:
+        form: QuestionnaireClientForm ou QuestionnaireCollaborateurForm validé
+            (l'instance du formulaire n'a pas besoin d'être chargée)
+        attributs: champs hors formulaire (collaborateur, modifie_par_collaborateur)
+
+    Returns:
+        le questionnaire enregistré
+    """
+    questionnaire = form.save(commit=False)
+    questionnaire.entreprise_id = siren
+    for champ, valeur in attributs.items():
+        setattr(questionnaire, champ, valeur)
+
+    modele = type(questionnaire)
+    champs = [
+        field.name for field in modele._meta.concrete_fields if field.name in form.fields
+    ] + list(attributs) + ['date_modification']
+
+    with transaction.atomic():
+        assurer_entreprise(siren, nom_entreprise)
+        upsert(modele, [questionnaire], champs)
+    return questionnaire
@@ -0,0 +1,184 @@
+"""
+Champs de modèle spécifiques au projet.
+"""
+from functools import cached_property
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import Count, Q
+
+
+class CompactChoiceField(models.Field):
+    """
+    Choix unique stocké en petit entier (2 octets) au lieu du code texte :
+    lignes et index plus compacts, GROUP BY et comparaisons sur des entiers.
+
+    Côté Python la valeur reste le code texte ('yes', 'monthly_real'...) :
+    formulaires, get_FOO_display, filtres (champ='yes'), import et export
+    sont inchangés. 0 correspond à la réponse vide (''), i + 1 à choices[i] :
+    l'ordre des choix est figé dans les données, les nouveaux choix
+    s'ajoutent en fin de liste.
+    """
+
+    description = "Choix (code stocké en entier)"
+
+    def get_internal_type(self):
+        return 'PositiveSmallIntegerField'
+
+    @cached_property
+    def _entiers(self):
+        """code -> entier stocké"""
+        return {'': 0, **{code: i for i, (code, _) in enumerate(self.flatchoices, start=1)}}
+
+    @cached_property
+    def _codes(self):
+        """entier stocké -> code"""
+        return {entier: code for code, entier in self._entiers.items()}
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return self._codes.get(value, '')
+
+    def to_python(self, value):
+        if isinstance(value, int):
+            return self._codes.get(value, '')
+        return value
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, int):
+            return value
+        try:
+            return self._entiers[value]
+        except KeyError:
+            raise ValueError(f'{self.name} : code inconnu « {value} »') from None
+
+
+class BitmaskListField(models.Field):
+    """
+    Liste de codes à choix multiples stockée en masque de bits : une colonne
+    entière, indexable, au lieu d'une liste JSON à décoder sur chaque ligne.
+
+    Côté Python la valeur reste une liste de codes (dans l'ordre de `codes`),
+    comme une liste JSON. Le bit i correspond à codes[i] : l'ordre des codes
+    est figé dans les données, les nouveaux codes s'ajoutent en fin de liste.
+
+    Recherches :
+        Modele.objects.filter(champ__has='formation')  # (champ & 4) <> 0
+        Modele.objects.filter(champ=['information', 'formation'])  # égalité exacte
+        count_by_code(Modele.objects.all(), 'champ')  # comptage par code, une requête
+    """
+
+    description = "Liste de codes (masque de bits)"
+
+    def __init__(self, *args, codes=(), **kwargs):
+        self.codes = list(codes)
+        kwargs.setdefault('default', list)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['codes'] = self.codes
+        if kwargs.get('default') is list:
+            del kwargs['default']
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        if len(self.codes) <= 15:
+            return 'PositiveSmallIntegerField'
+        if len(self.codes) <= 31:
+            return 'PositiveIntegerField'
+        return 'PositiveBigIntegerField'
+
+    @property
+    def valeurs(self):
+        return [code for code, _ in self.codes]
+
+    def masque(self, codes):
+        """Masque de bits d'une liste de codes"""
+        valeurs = self.valeurs
+        masque = 0
+        for code in codes:
+            try:
+                masque |= 1 << valeurs.index(code)
+            except ValueError:
+                raise ValueError(f'{self.name} : code inconnu « {code} »') from None
+        return masque
+
+    def decoder(self, masque):
+        """Liste des codes d'un masque de bits"""
+        return [code for i, code in enumerate(self.valeurs) if masque & (1 << i)]
+
+    def from_db_value(self, value, expression, connection):
+        return [] if value is None else self.decoder(value)
+
+    def to_python(self, value):
+        if value is None or value == '':
+            return []
+        if isinstance(value, int):
+            return self.decoder(value)
+        if isinstance(value, str):
+            value = [code.strip() for code in value.split(',') if code.strip()]
+        codes = set(value)
+        inconnus = codes.difference(self.valeurs)
+        if inconnus:
+            raise ValidationError(
+                'Code(s) inconnu(s) : %(codes)s', code='invalid_choice',
+                params={'codes': ', '.join(sorted(inconnus))},
+            )
+        return [code for code in self.valeurs if code in codes]
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, int):
+            return value
+        if isinstance(value, str):
+            value = [value]
+        return self.masque(value)
+
+    def value_to_string(self, obj):
+        # Sérialisation (dumpdata, archives) : la liste de codes
+        return self.value_from_object(obj)
+
+    def formfield(self, **kwargs):
+        defaults = {
+            'form_class': forms.MultipleChoiceField,
+            'choices': self.codes,
+            'widget': forms.CheckboxSelectMultiple,
+            'required': not self.blank,
+        }
+        defaults.update(kwargs)
+        return models.Field.formfield(self, **defaults)
+
+
+@BitmaskListField.register_lookup
+class Has(models.Lookup):
+    """Le masque contient le code (ou l'un des codes d'une liste)"""
+
+    lookup_name = 'has'
+    prepare_rhs = False
+
+    def get_prep_lookup(self):
+        codes = [self.rhs] if isinstance(self.rhs, str) else self.rhs
+        return self.lhs.output_field.masque(codes)
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'({lhs} & {rhs}) <> 0', (*lhs_params, *rhs_params)
+
+
+def count_by_code(queryset, champ):
+    """
+    Nombre de lignes par code d'un BitmaskListField, en une seule requête
+    (un COUNT filtré par bit).
+
+    Returns:
+        dict: code -> nombre
+    """
+    field = queryset.model._meta.get_field(champ)
+    comptages = queryset.aggregate(**{
+        f'nb_{i}': Count('pk', filter=Q(**{f'{champ}__has': code}))
+        for i, code in enumerate(field.valeurs)
+    })
+    return {code: comptages[f'nb_{i}'] for i, code in enumerate(field.valeurs)}
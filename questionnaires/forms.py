@@ -6,16 +6,7 @@ class QuestionnaireClientForm(forms.ModelForm):
     """Formulaire pour le questionnaire client"""
 
     # Champ personnalisé pour les checkboxes multiples
-    CHOIX_ACCOMPAGNEMENT = [
-        ('information', 'Information et sensibilisation sur la réforme'),
-        ('conseil', 'Conseil sur le choix des outils'),
-        ('formation', 'Formation à l\'utilisation des outils'),
-        ('parametrage', 'Paramétrage et mise en place des solutions'),
-        ('gestion_complete', 'Gestion complète de la facturation électronique'),
-        ('support', 'Support et assistance régulière'),
-        ('aucun', 'Aucun accompagnement nécessaire'),
-        ('autre', 'Autre'),
-    ]
+    CHOIX_ACCOMPAGNEMENT = QuestionnaireClient.CHOIX_ACCOMPAGNEMENT
 
     accompagnement_souhaite = forms.MultipleChoiceField(
         choices=CHOIX_ACCOMPAGNEMENT,
@@ -38,7 +29,7 @@ class QuestionnaireClientForm(forms.ModelForm):
 
     def save(self, commit=True):
         instance = super().save(commit=False)
-        # Convertir la liste des choix multiples en JSON
+        # Liste des choix multiples (stockée en masque de bits)
         instance.accompagnement_souhaite = self.cleaned_data.get('accompagnement_souhaite', [])
         if commit:
             instance.save()
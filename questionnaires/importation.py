@@ -0,0 +1,333 @@
+"""
+Import en masse d'entreprises et de questionnaires depuis un CSV au format
+de l'export (cf. views.export_csv).
+
+Le fichier est lu en flux : chaque ligne est validée avec les règles des
+formulaires QuestionnaireClientForm / QuestionnaireCollaborateurForm, puis
+les lignes valides sont enregistrées par lots (bulk_create avec
+update_conflicts : un INSERT ... ON CONFLICT DO UPDATE par table et par
+lot), un lot par transaction.
+Les lignes invalides sont écartées et consignées dans le rapport d'erreurs
+au lieu d'interrompre l'import.
+
+Les libellés exportés ('Oui', 'Réel mensuel'...) sont reconvertis en codes ;
+les codes bruts ('yes', 'monthly_real'...) sont également acceptés.
+Les colonnes de dates sont ignorées (recalculées à l'enregistrement).
+"""
+import codecs
+import csv
+import io
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .enregistrement import upsert
+from .forms import QuestionnaireClientForm, QuestionnaireCollaborateurForm
+from .models import Entreprise, QuestionnaireClient, QuestionnaireCollaborateur
+
+# Lignes enregistrées par transaction
+TAILLE_LOT = 1000
+
+COLONNE_SIREN = 'SIREN'
+COLONNE_NOM = 'Nom Entreprise'
+COLONNE_CLIENT_COMPLETE = 'Q. Client Complété'
+COLONNE_COLLABORATEUR_COMPLETE = 'Q. Collaborateur Complété'
+
+# En-tête de l'export -> champ du questionnaire
+COLONNES_CLIENT = {
+    'Client - Logiciel Facturation': 'logiciel_facturation',
+    'Client - Logiciel Facturation Nom': 'logiciel_facturation_nom',
+    'Client - Factures Format Électronique': 'factures_format_electronique',
+    'Client - Logiciel Devis': 'logiciel_devis',
+    'Client - Logiciel Devis Nom': 'logiciel_devis_nom',
+    'Client - Caisse Enregistreuse': 'caisse_enregistreuse',
+    'Client - Caisse Enregistreuse Nom': 'caisse_enregistreuse_nom',
+    'Client - Caisse Certifiée': 'caisse_certifiee',
+    'Client - Plateforme Agréée': 'plateforme_agreee',
+    'Client - Plateforme Agréée Nom': 'plateforme_agreee_nom',
+    'Client - Gestion Future': 'gestion_future',
+    'Client - Aisance Outils': 'aisance_outils',
+    'Client - Réception Factures Achats': 'reception_factures_achats',
+    'Client - Reception Achats Autre': 'reception_achats_autre',
+    'Client - Envoi Factures Ventes': 'envoi_factures_ventes',
+    'Client - Envoi Ventes Autre': 'envoi_ventes_autre',
+    'Client - Conservation Factures': 'conservation_factures',
+    'Client - Accompagnement Souhaité': 'accompagnement_souhaite',
+    'Client - Accompagnement Autre': 'accompagnement_autre',
+    'Client - Commentaires': 'commentaires',
+}
+
+COLONNES_COLLABORATEUR = {
+    'Collab - Assujettie TVA': 'assujettie_tva',
+    'Collab - Code APE': 'code_ape',
+    'Collab - Activité Précise': 'activite_precise',
+    'Collab - Taille Entreprise': 'taille_entreprise',
+    'Collab - Régime TVA': 'regime_tva',
+    'Collab - Activité Exonérée TVA': 'activite_exoneree_tva',
+    'Collab - Plateforme Agréée': 'plateforme_agreee',
+    'Collab - Plateforme Agréée Nom': 'plateforme_agreee_nom',
+    'Collab - Nb Factures Ventes': 'nb_factures_ventes',
+    'Collab - Nb Clients Actifs': 'nb_clients_actifs',
+    'Collab - Vente B2B France': 'vente_btob_domestique',
+    'Collab - Vente B2B Export': 'vente_btob_export',
+    'Collab - Vente B2C Facture': 'vente_btoc_facture',
+    'Collab - Vente B2C Caisse': 'vente_btoc_caisse',
+    'Collab - Nb Factures Achats': 'nb_factures_achats',
+    'Collab - Nb Fournisseurs Actifs': 'nb_fournisseurs_actifs',
+    'Collab - Achat B2B France': 'achat_btob_domestique',
+    'Collab - Achat B2B UE': 'achat_btob_intracommunautaire',
+    'Collab - Achat B2B Hors UE': 'achat_btob_hors_ue',
+    'Collab - Commentaires': 'commentaires',
+}
+
+COLONNES_OBLIGATOIRES = (
+    [COLONNE_SIREN, COLONNE_NOM, COLONNE_CLIENT_COMPLETE, COLONNE_COLLABORATEUR_COMPLETE]
+    + list(COLONNES_CLIENT) + list(COLONNES_COLLABORATEUR)
+)
+
+_OUI = {'oui', 'yes', 'true', '1'}
+_NON = {'non', 'no', 'false', '0', ''}
+
+
+class FichierInvalide(Exception):
+    """Fichier inexploitable dans son ensemble (en-têtes manquants...)"""
+
+
+class _Validateur:
+    """
+    Applique à une ligne les règles de validation d'un formulaire.
+
+    Les champs du formulaire sont construits une seule fois puis appelés
+    directement (field.clean) : instancier un formulaire par ligne coûterait
+    une copie profonde de tous ses champs.
+    """
+
+    def __init__(self, formulaire, colonnes):
+        self.champs = formulaire().fields
+        self.colonnes = colonnes
+        self.libelles = {}
+        self.codes = {}
+        for nom, champ in self.champs.items():
+            if isinstance(champ, forms.ChoiceField):
+                correspondances = {}
+                for code, libelle in champ.choices:
+                    if code:
+                        correspondances[str(libelle).lower()] = code
+                        correspondances[code.lower()] = code
+                self.libelles[nom] = correspondances
+                if type(champ) is forms.TypedChoiceField:
+                    self.codes[nom] = set(correspondances.values())
+
+    def _convertir(self, nom, champ, brut):
+        """Convertit la valeur textuelle du CSV en donnée de formulaire"""
+        brut = (brut or '').strip()
+        if isinstance(champ, forms.BooleanField):
+            if brut.lower() in _OUI:
+                return True
+            if brut.lower() in _NON:
+                return False
+            raise ValidationError(f'Valeur booléenne attendue (Oui/Non), reçu « {brut} »')
+        if isinstance(champ, forms.MultipleChoiceField):
+            return [self.libelles[nom].get(v.strip().lower(), v.strip()) for v in brut.split(',') if v.strip()]
+        if nom in self.libelles:
+            return self.libelles[nom].get(brut.lower(), brut)
+        return brut
+
+    def valider(self, ligne):
+        """
+        Returns:
+            tuple: (données nettoyées, {colonne: message}) ; données vaut None
+                   si la ligne comporte des erreurs
+        """
+        donnees, erreurs = {}, {}
+        for colonne, nom in self.colonnes.items():
+            champ = self.champs[nom]
+            try:
+                valeur = self._convertir(nom, champ, ligne.get(colonne))
+                if nom in self.codes and valeur in self.codes[nom]:
+                    # Code connu : inutile de reparcourir les choix (ChoiceField.valid_value)
+                    donnees[nom] = valeur
+                else:
+                    donnees[nom] = champ.clean(valeur)
+            except ValidationError as e:
+                erreurs[colonne] = ' '.join(e.messages)
+        return (None if erreurs else donnees), erreurs
+
+
+def _valider_entreprise(ligne):
+    erreurs = {}
+    siren = (ligne.get(COLONNE_SIREN) or '').strip().replace(' ', '')
+    nom = (ligne.get(COLONNE_NOM) or '').strip()
+    if len(siren) != 9 or not siren.isdigit():
+        erreurs[COLONNE_SIREN] = 'Le SIREN doit comporter 9 chiffres'
+    if not nom:
+        erreurs[COLONNE_NOM] = 'Nom obligatoire'
+    elif len(nom) > Entreprise._meta.get_field('nom_entreprise').max_length:
+        erreurs[COLONNE_NOM] = 'Nom trop long'
+    return siren, nom, erreurs
+
+
+def _est_oui(valeur):
+    return (valeur or '').strip().lower() in _OUI
+
+
+class RapportImport:
+    """Compteurs et erreurs d'un import"""
+
+    def __init__(self):
+        self.lignes = 0
+        self.lignes_valides = 0
+        self.entreprises_creees = 0
+        self.entreprises_mises_a_jour = 0
+        self.clients_crees = 0
+        self.clients_mis_a_jour = 0
+        self.collaborateurs_crees = 0
+        self.collaborateurs_mis_a_jour = 0
+        self.erreurs = []  # (numéro de ligne, SIREN, colonne, message)
+
+    @property
+    def lignes_rejetees(self):
+        return len({erreur[0] for erreur in self.erreurs})
+
+    def ecrire_erreurs(self, flux):
+        """Écrit le rapport d'erreurs au format CSV (séparateur ;)"""
+        writer = csv.writer(flux, delimiter=';')
+        writer.writerow(['Ligne', 'SIREN', 'Colonne', 'Erreur'])
+        writer.writerows(self.erreurs)
+
+
+def _enregistrer_lot(lot, utilisateur, rapport):
+    """
+    Crée ou met à jour les entreprises et questionnaires d'un lot de lignes
+    valides, dans une seule transaction.
+
+    Args:
+        lot (dict): siren -> (nom, données client ou None, données collaborateur ou None)
+    """
+    sirens = list(lot)
+    maintenant = timezone.now()
+    entreprises, clients, collaborateurs = [], [], []
+    for siren, (nom, client, collaborateur) in lot.items():
+        entreprises.append(Entreprise(siren=siren, nom_entreprise=nom, date_modification=maintenant))
+        if client is not None:
+            clients.append(QuestionnaireClient(
+                entreprise_id=siren, modifie_par_collaborateur=utilisateur,
+                date_modification=maintenant, **client
+            ))
+        if collaborateur is not None:
+            collaborateurs.append(QuestionnaireCollaborateur(
+                entreprise_id=siren, collaborateur=utilisateur,
+                date_modification=maintenant, **collaborateur
+            ))
+
+    with transaction.atomic():
+        # Existants, pour distinguer créations et mises à jour dans le rapport
+        nb_entreprises = Entreprise.objects.filter(siren__in=sirens).count()
+        nb_clients = QuestionnaireClient.objects.filter(pk__in=[q.pk for q in clients]).count()
+        nb_collaborateurs = QuestionnaireCollaborateur.objects.filter(pk__in=[q.pk for q in collaborateurs]).count()
+
+        upsert(Entreprise, entreprises, ['nom_entreprise', 'date_modification'])
+        upsert(QuestionnaireClient, clients,
+                list(COLONNES_CLIENT.values()) + ['date_modification', 'modifie_par_collaborateur'])
+        upsert(QuestionnaireCollaborateur, collaborateurs,
+                list(COLONNES_COLLABORATEUR.values()) + ['date_modification', 'collaborateur'])
+
+    rapport.entreprises_creees += len(entreprises) - nb_entreprises
+    rapport.entreprises_mises_a_jour += nb_entreprises
+    rapport.clients_crees += len(clients) - nb_clients
+    rapport.clients_mis_a_jour += nb_clients
+    rapport.collaborateurs_crees += len(collaborateurs) - nb_collaborateurs
+    rapport.collaborateurs_mis_a_jour += nb_collaborateurs
+
+
+def import_csv(flux, utilisateur=None, taille_lot=TAILLE_LOT, verifier_seulement=False, delimiter=';'):
+    """
+    Importe un CSV au format de l'export.
+
+    Args:
+        flux: fichier texte (ouvert avec newline='' ; le BOM UTF-8 est ignoré)
+        utilisateur: collaborateur auquel rattacher les questionnaires
+                     collaborateur (obligatoire pour les lignes qui en comportent)
+        taille_lot (int): lignes enregistrées par transaction
+        verifier_seulement (bool): valider sans rien enregistrer
+        delimiter (str): séparateur de colonnes
+
+    Returns:
+        RapportImport
+
+    Raises:
+        FichierInvalide: en-têtes absents ou incomplets
+    """
+    lecteur = csv.DictReader(flux, delimiter=delimiter)
+    en_tetes = [(nom or '').lstrip('\ufeff').strip() for nom in (lecteur.fieldnames or [])]
+    manquantes = [colonne for colonne in COLONNES_OBLIGATOIRES if colonne not in en_tetes]
+    if manquantes:
+        raise FichierInvalide(f"Colonnes manquantes : {', '.join(manquantes)}")
+    lecteur.fieldnames = en_tetes
+
+    validateur_client = _Validateur(QuestionnaireClientForm, COLONNES_CLIENT)
+    validateur_collaborateur = _Validateur(QuestionnaireCollaborateurForm, COLONNES_COLLABORATEUR)
+    rapport = RapportImport()
+    lot = {}
+
+    for ligne in lecteur:
+        rapport.lignes += 1
+        numero = lecteur.line_num
+        siren, nom, erreurs = _valider_entreprise(ligne)
+        client = collaborateur = None
+        if _est_oui(ligne.get(COLONNE_CLIENT_COMPLETE)):
+            client, erreurs_client = validateur_client.valider(ligne)
+            erreurs.update(erreurs_client)
+        if _est_oui(ligne.get(COLONNE_COLLABORATEUR_COMPLETE)):
+            collaborateur, erreurs_collaborateur = validateur_collaborateur.valider(ligne)
+            erreurs.update(erreurs_collaborateur)
+            if utilisateur is None:
+                erreurs[COLONNE_COLLABORATEUR_COMPLETE] = 'Aucun collaborateur auquel rattacher le questionnaire'
+
+        if erreurs:
+            rapport.erreurs.extend((numero, siren, colonne, message) for colonne, message in erreurs.items())
+            continue
+
+        rapport.lignes_valides += 1
+        # Un SIREN répété dans le fichier : la dernière ligne l'emporte
+        lot[siren] = (nom, client, collaborateur)
+        if len(lot) >= taille_lot:
+            if not verifier_seulement:
+                _enregistrer_lot(lot, utilisateur, rapport)
+            lot = {}
+
+    if lot and not verifier_seulement:
+        _enregistrer_lot(lot, utilisateur, rapport)
+    return rapport
+
+
+def verifier_encodage(flux, taille_bloc=64 * 1024):
+    """
+    Vérifie que tout le fichier est en UTF-8, avant le premier lot : une
+    erreur de décodage en cours de lecture laisserait les lots précédents
+    enregistrés. Le fichier est relu par blocs puis rembobiné.
+
+    Args:
+        flux: fichier binaire, repositionnable (seek)
+
+    Raises:
+        FichierInvalide: octets hors UTF-8
+    """
+    decodeur = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for bloc in iter(lambda: flux.read(taille_bloc), b''):
+            decodeur.decode(bloc)
+        decodeur.decode(b'', final=True)
+    except UnicodeDecodeError:
+        raise FichierInvalide('Le fichier doit être encodé en UTF-8.')
+    finally:
+        flux.seek(0)
+
+
+def ouvrir_fichier_envoye(fichier):
+    """Flux texte sur un fichier téléversé (UploadedFile), BOM UTF-8 compris"""
+    fichier.file.seek(0)
+    verifier_encodage(fichier.file)
+    return io.TextIOWrapper(fichier.file, encoding='utf-8-sig', newline='')
@@ -0,0 +1,153 @@
+"""
+Outils d'instrumentation des requêtes SQL.
+
+- call_site() : retrouve la fonction applicative à l'origine d'une requête
+  (ex: 'views.dashboard', 'views._build_csv_row')
+- normalize_sql() : forme canonique d'une requête, sans valeurs littérales
+- record_queries() : enregistre les requêtes exécutées dans un bloc, avec
+  leur durée et leur site d'appel, via connection.execute_wrapper
+- track_phases() / timed_phase() : cumul des durées par phase (db, insee,
+  template, cache) pour la requête en cours (en-tête Server-Timing)
+"""
+import contextvars
+import re
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+# Modules d'outillage à ignorer lors de la recherche du site d'appel (les
+# middlewares installent eux-mêmes des execute_wrapper imbriqués)
+_MODULES_IGNORES = {'instrumentation', 'testing', 'middleware'}
+
+# Ordres de gestion de transaction émis par les atomic() imbriqués (tests,
+# sessions) : ils ne correspondent pas à des requêtes applicatives.
+_PREFIXES_SAVEPOINT = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+def _racine_projet():
+    return str(Path(settings.BASE_DIR).resolve())
+
+
+def call_site(frame=None):
+    """
+    Retourne 'module.fonction' pour la frame applicative la plus proche.
+
+    Les frames de Django, des dépendances et des modules d'outillage sont
+    ignorées. Si aucune frame applicative n'est trouvée, retourne '?'.
+    """
+    racine = _racine_projet()
+    frame = frame or sys._getframe(1)
+    while frame is not None:
+        fichier = frame.f_code.co_filename
+        if fichier.startswith(racine) and 'site-packages' not in fichier:
+            module = Path(fichier).stem
+            if module not in _MODULES_IGNORES:
+                return f'{module}.{frame.f_code.co_name}'
+        frame = frame.f_back
+    return '?'
+
+
+_LITTERAUX = re.compile(r"'(?:[^']|'')*'")
+_NOMBRES = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LISTES = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_ESPACES = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """
+    Normalise une requête pour regrouper les exécutions d'une même forme.
+
+    Les paramètres et littéraux deviennent '?', les listes IN (?, ?, ...)
+    sont réduites à IN (...) et les espaces sont compactés.
+    """
+    sql = sql.replace('%s', '?')
+    sql = _LITTERAUX.sub('?', sql)
+    sql = _NOMBRES.sub('?', sql)
+    sql = _LISTES.sub('(...)', sql)
+    return _ESPACES.sub(' ', sql).strip()
+
+
+def is_savepoint(sql):
+    """Indique si l'ordre SQL est une gestion de savepoint"""
+    return sql.lstrip().upper().startswith(_PREFIXES_SAVEPOINT)
+
+
+@contextmanager
+def record_queries():
+    """
+    Enregistre toutes les requêtes exécutées dans le bloc, sur toutes les bases.
+
+    Usage:
+        with record_queries() as requetes:
+            ...
+        for requete in requetes:
+            print(requete['site'], requete['duree'], requete['sql'])
+
+    Chaque enregistrement est un dict : sql, duree (secondes), site, alias.
+    """
+    enregistrements = []
+
+    def wrapper(execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            enregistrements.append({
+                'sql': sql,
+                'duree': time.perf_counter() - debut,
+                'site': call_site(),
+                'alias': context['connection'].alias,
+            })
+
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield enregistrements
+
+
+# Phases de la requête en cours : {phase: [durée cumulée (s), occurrences]}
+_phases = contextvars.ContextVar('etac_phases', default=None)
+
+
+@contextmanager
+def track_phases():
+    """
+    Active le suivi des phases pour le bloc (une requête HTTP).
+
+    Usage:
+        with track_phases() as phases:
+            response = get_response(request)
+        phases  # {'db': [0.012, 5], 'template': [0.004, 1]}
+    """
+    phases = {}
+    token = _phases.set(phases)
+    try:
+        yield phases
+    finally:
+        _phases.reset(token)
+
+
+def add_phase_time(phase, duree):
+    """Ajoute une durée à une phase ; sans effet hors d'un bloc track_phases()"""
+    phases = _phases.get()
+    if phases is not None:
+        cumul = phases.setdefault(phase, [0.0, 0])
+        cumul[0] += duree
+        cumul[1] += 1
+
+
+@contextmanager
+def timed_phase(phase):
+    """Chronomètre le bloc et l'impute à une phase"""
+    if _phases.get() is None:
+        yield
+        return
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase_time(phase, time.perf_counter() - debut)
@@ -0,0 +1,140 @@
+"""
+Mesure des performances des vues et fonctions critiques.
+
+Usage:
+    python manage.py bench --tailles 1000 100000 --output bench.json
+    python manage.py bench --baseline benchmarks/baseline.json
+    python manage.py bench --concurrence --duree 10 --lecteurs 8 --ecrivains 2
+
+La commande travaille sur une base de test jetable (comme `manage.py test`),
+peuplée pour chaque taille par seed_synthetic : la base configurée n'est
+jamais modifiée. Le rapport donne aussi la place occupée par les tables
+(table_sizes) pour chaque jeu de données.
+
+--concurrence mesure lectures du dashboard et enregistrements de
+questionnaires simultanés. Sous SQLite, la base de test est alors un fichier
+temporaire (avec les options de DATABASES, cf. SQLITE_WAL) : comparer avec
+SQLITE_WAL=False pour voir les erreurs "database is locked".
+"""
+import json
+import platform
+import sys
+import tempfile
+from pathlib import Path
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from django.utils import timezone
+
+from questionnaires.benchmarks import compare_to_baseline, run_benchmarks, run_concurrency, table_sizes
+
+
+class Command(BaseCommand):
+    help = "Mesure p50/p95, requêtes SQL, mémoire et débit des vues critiques (sortie JSON)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tailles', type=int, nargs='+', default=[1000],
+                            help="Nombre d'entreprises générées pour chaque jeu de données (défaut: 1000)")
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Exécutions chronométrées par scénario (défaut: 20)')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Limiter à un scénario (option répétable)')
+        parser.add_argument('--latence-insee', type=float, default=0.0,
+                            help='Latence simulée du bouchon INSEE, en millisecondes (défaut: 0)')
+        parser.add_argument('--seed', type=int, default=42,
+                            help='Graine des données générées (défaut: 42)')
+        parser.add_argument('--output', help='Fichier JSON de sortie (sinon: sortie standard)')
+        parser.add_argument('--baseline', help='Fichier JSON de référence à comparer')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Dégradation tolérée du p95 et de la mémoire (défaut: 0.2 = 20%%)')
+        parser.add_argument('--concurrence', action='store_true',
+                            help='Mesurer lectures et écritures simultanées au lieu des scénarios')
+        parser.add_argument('--duree', type=float, default=5.0,
+                            help='Durée de la charge simultanée, en secondes (défaut: 5)')
+        parser.add_argument('--lecteurs', type=int, default=4,
+                            help='Threads lisant le dashboard (défaut: 4)')
+        parser.add_argument('--ecrivains', type=int, default=2,
+                            help='Threads enregistrant des questionnaires (défaut: 2)')
+
+    def handle(self, *args, **options):
+        reference = None
+        if options['concurrence'] and options['baseline']:
+            raise CommandError('--baseline ne s\'applique pas à --concurrence')
+        if options['baseline']:
+            try:
+                reference = json.loads(Path(options['baseline']).read_text())['results']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Référence illisible ({options['baseline']}) : {e}")
+
+        verbosity = options['verbosity']
+        repertoire = None
+        if options['concurrence'] and connection.vendor == 'sqlite':
+            # Une base en mémoire partagée verrouille par table : fichier obligatoire
+            repertoire = tempfile.TemporaryDirectory()
+            connection.settings_dict['TEST']['NAME'] = str(Path(repertoire.name) / 'bench.sqlite3')
+        setup_test_environment()
+        anciennes_bases = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            resultats, tailles_tables = {}, {}
+            for taille in options['tailles']:
+                if verbosity >= 1:
+                    self.stderr.write(f'Jeu de données : {taille} entreprises...')
+                call_command('flush', interactive=False, verbosity=0)
+                call_command('seed_synthetic', entreprises=taille, collaborateurs=5,
+                             seed=options['seed'], verbosity=0, stdout=self.stderr)
+                if options['concurrence']:
+                    resultats[str(taille)] = run_concurrency(
+                        duree=options['duree'],
+                        lecteurs=options['lecteurs'],
+                        ecrivains=options['ecrivains'],
+                    )
+                else:
+                    tailles_tables[str(taille)] = table_sizes()
+                    resultats[str(taille)] = run_benchmarks(
+                        iterations=options['iterations'],
+                        scenarios=options['scenarios'],
+                        latence_insee=options['latence_insee'] / 1000,
+                    )
+            vendor = connection.vendor
+        finally:
+            teardown_databases(anciennes_bases, verbosity=0)
+            teardown_test_environment()
+            if repertoire is not None:
+                repertoire.cleanup()
+
+        rapport = {
+            'meta': {
+                'date': timezone.now().isoformat(),
+                'python': sys.version.split()[0],
+                'django': django.get_version(),
+                'database': vendor,
+                'machine': platform.platform(),
+                'iterations': options['iterations'],
+                'seed': options['seed'],
+                'mode': 'concurrency' if options['concurrence'] else 'scenarios',
+            },
+            'results': resultats,
+        }
+        if tailles_tables:
+            rapport['table_sizes'] = tailles_tables
+        regressions = []
+        if reference is not None:
+            regressions = compare_to_baseline(resultats, reference, options['tolerance'])
+            rapport['regressions'] = regressions
+
+        sortie = json.dumps(rapport, indent=2, ensure_ascii=False)
+        if options['output']:
+            Path(options['output']).write_text(sortie + '\n')
+        else:
+            self.stdout.write(sortie)
+
+        if regressions:
+            raise CommandError(
+                f'{len(regressions)} régression(s) par rapport à la référence :\n  - '
+                + '\n  - '.join(regressions)
+            )
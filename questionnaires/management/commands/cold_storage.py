@@ -0,0 +1,82 @@
+"""
+Transfert des entreprises archivées depuis longtemps vers les archives
+(EntrepriseArchivee, JSON compressé), et restauration.
+
+Usage:
+    python manage.py cold_storage --jours 365
+    python manage.py cold_storage --jours 365 --verifier
+    python manage.py cold_storage --restaurer 123456789 987654321 --collaborateur jean@etac.fr
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from questionnaires.archivage import TAILLE_LOT, RestaurationImpossible, candidats, restaurer, transferer
+from questionnaires.models import EntrepriseArchivee
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Transfère vers les archives les entreprises archivées depuis plus de N jours (ou les restaure)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=365,
+                            help="Ancienneté minimale de l'archivage, en jours (défaut: 365)")
+        parser.add_argument('--batch-size', type=int, default=TAILLE_LOT,
+                            help=f'Entreprises transférées par transaction (défaut: {TAILLE_LOT})')
+        parser.add_argument('--verifier', action='store_true',
+                            help='Compter les entreprises à transférer sans rien modifier')
+        parser.add_argument('--restaurer', nargs='+', metavar='SIREN',
+                            help='Restaurer ces entreprises dans les tables courantes')
+        parser.add_argument('--collaborateur',
+                            help='Email du collaborateur auquel rattacher les questionnaires '
+                                 'dont l\'auteur a été supprimé (restauration)')
+
+    def handle(self, *args, **options):
+        if options['restaurer']:
+            return self._restaurer(options)
+
+        if options['jours'] < 0:
+            raise CommandError('--jours doit être positif')
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size doit être strictement positif')
+
+        if options['verifier']:
+            self.stdout.write(
+                f"{candidats(options['jours']).count()} entreprises archivées depuis plus de "
+                f"{options['jours']} jours à transférer"
+            )
+            return
+
+        debut = time.perf_counter()
+        nombre = transferer(options['jours'], taille_lot=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{nombre} entreprises transférées vers les archives en {time.perf_counter() - debut:.1f}s'
+        ))
+
+    def _restaurer(self, options):
+        utilisateur = None
+        if options['collaborateur']:
+            utilisateur = User.objects.filter(email=options['collaborateur']).first()
+            if utilisateur is None:
+                raise CommandError(f"Collaborateur introuvable : {options['collaborateur']}")
+
+        archives = {a.siren: a for a in EntrepriseArchivee.objects.filter(siren__in=options['restaurer'])}
+        echecs = 0
+        for siren in options['restaurer']:
+            archive = archives.get(siren)
+            if archive is None:
+                self.stdout.write(self.style.WARNING(f'{siren} : absent des archives'))
+                echecs += 1
+                continue
+            try:
+                restaurer(archive, utilisateur=utilisateur)
+            except RestaurationImpossible as e:
+                self.stdout.write(self.style.WARNING(str(e)))
+                echecs += 1
+                continue
+            self.stdout.write(self.style.SUCCESS(f'{siren} : restaurée'))
+        if echecs:
+            raise CommandError(f'{echecs} entreprise(s) non restaurée(s)')
@@ -0,0 +1,81 @@
+"""
+Import d'entreprises et de questionnaires depuis un CSV au format de l'export.
+
+Usage:
+    python manage.py import_csv export_questionnaires.csv --collaborateur jean@etac.fr
+    python manage.py import_csv reprise.csv --collaborateur jean@etac.fr --rapport erreurs.csv
+    python manage.py import_csv reprise.csv --verifier
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from questionnaires.importation import TAILLE_LOT, FichierInvalide, import_csv, verifier_encodage
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Importe (crée ou met à jour) entreprises et questionnaires depuis un CSV d'export"
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help='Fichier CSV (UTF-8, séparateur ;)')
+        parser.add_argument('--collaborateur',
+                            help='Email du collaborateur auquel rattacher les questionnaires collaborateurs')
+        parser.add_argument('--batch-size', type=int, default=TAILLE_LOT,
+                            help=f'Lignes enregistrées par transaction (défaut: {TAILLE_LOT})')
+        parser.add_argument('--delimiter', default=';', help='Séparateur de colonnes (défaut: ;)')
+        parser.add_argument('--rapport', help="Écrire le rapport d'erreurs complet dans ce fichier CSV")
+        parser.add_argument('--verifier', action='store_true',
+                            help='Valider le fichier sans rien enregistrer')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size doit être strictement positif')
+
+        utilisateur = None
+        if options['collaborateur']:
+            utilisateur = User.objects.filter(email=options['collaborateur']).first()
+            if utilisateur is None:
+                raise CommandError(f"Collaborateur introuvable : {options['collaborateur']}")
+
+        debut = time.perf_counter()
+        try:
+            with open(options['fichier'], 'rb') as brut:
+                verifier_encodage(brut)
+            with open(options['fichier'], encoding='utf-8-sig', newline='') as flux:
+                rapport = import_csv(
+                    flux,
+                    utilisateur=utilisateur,
+                    taille_lot=options['batch_size'],
+                    verifier_seulement=options['verifier'],
+                    delimiter=options['delimiter'],
+                )
+        except OSError as e:
+            raise CommandError(f'Lecture impossible : {e}')
+        except FichierInvalide as e:
+            raise CommandError(str(e))
+        duree = time.perf_counter() - debut
+
+        if options['verifier']:
+            self.stdout.write(
+                f'{rapport.lignes} lignes lues, {rapport.lignes_valides} valides, '
+                f'{rapport.lignes_rejetees} rejetées ({duree:.1f}s)'
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'{rapport.lignes} lignes lues en {duree:.1f}s : '
+                f'{rapport.entreprises_creees} entreprises créées, {rapport.entreprises_mises_a_jour} mises à jour, '
+                f'{rapport.clients_crees + rapport.clients_mis_a_jour} questionnaires clients, '
+                f'{rapport.collaborateurs_crees + rapport.collaborateurs_mis_a_jour} questionnaires collaborateurs '
+                f'enregistrés, {rapport.lignes_rejetees} lignes rejetées'
+            ))
+
+        if options['rapport']:
+            with open(options['rapport'], 'w', encoding='utf-8-sig', newline='') as flux:
+                rapport.ecrire_erreurs(flux)
+        for numero, siren, colonne, message in rapport.erreurs[:20]:
+            self.stdout.write(self.style.WARNING(f'  ligne {numero} ({siren or "?"}) - {colonne} : {message}'))
+        if len(rapport.erreurs) > 20:
+            self.stdout.write(f'  ... {len(rapport.erreurs) - 20} autres erreurs')
@@ -0,0 +1,54 @@
+"""
+Purge par lots des sessions expirées et des anciens enregistrements d'axes
+(tentatives de connexion, journaux de connexion et d'échecs).
+
+Usage:
+    python manage.py purge --jours 90
+    python manage.py purge --jours 90 --verifier
+    python manage.py purge --batch-size 500 --pause 0.5
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from questionnaires.purge import PAUSE, TAILLE_LOT, cibles, purger
+
+
+class Command(BaseCommand):
+    help = "Supprime par lots les sessions expirées et les enregistrements d'axes de plus de N jours"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=90,
+                            help="Conservation des enregistrements d'axes, en jours (défaut: 90)")
+        parser.add_argument('--batch-size', type=int, default=TAILLE_LOT,
+                            help=f'Lignes supprimées par transaction (défaut: {TAILLE_LOT})')
+        parser.add_argument('--pause', type=float, default=PAUSE,
+                            help=f'Pause entre deux lots, en secondes (défaut: {PAUSE})')
+        parser.add_argument('--verifier', action='store_true',
+                            help='Compter les lignes à supprimer sans rien modifier')
+
+    def handle(self, *args, **options):
+        # Une tentative plus récente que le délai de blocage peut encore bloquer un compte
+        if options['jours'] * 24 < settings.AXES_COOLOFF_TIME:
+            raise CommandError(f'--jours doit couvrir le délai de blocage ({settings.AXES_COOLOFF_TIME} h)')
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size doit être strictement positif')
+        if options['pause'] < 0:
+            raise CommandError('--pause doit être positive')
+
+        if options['verifier']:
+            for table, queryset in cibles(options['jours']).items():
+                self.stdout.write(f'{table} : {queryset.count()} lignes à supprimer')
+            return
+
+        debut_total = time.perf_counter()
+        total = 0
+        for table, queryset in cibles(options['jours']).items():
+            debut = time.perf_counter()
+            nombre = purger(queryset, taille_lot=options['batch_size'], pause=options['pause'])
+            total += nombre
+            self.stdout.write(f'{table} : {nombre} lignes supprimées en {time.perf_counter() - debut:.1f}s')
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} lignes supprimées en {time.perf_counter() - debut_total:.1f}s'
+        ))
@@ -0,0 +1,324 @@
+"""
+Génération de données synthétiques pour les tests de charge et de volumétrie.
+
+Usage:
+    python manage.py seed_synthetic --entreprises 100000 --collaborateurs 20 --seed 42
+
+Les SIREN générés sont valides au sens de Luhn et uniques pour une graine
+donnée. Deux exécutions avec la même graine sur une base vide produisent
+exactement les mêmes données.
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.utils import timezone
+
+from questionnaires.forms import QuestionnaireClientForm, QuestionnaireCollaborateurForm
+from questionnaires.models import Entreprise, QuestionnaireClient, QuestionnaireCollaborateur
+from questionnaires.utils import luhn_check_digit
+
+User = get_user_model()
+
+# Pas de parcours de l'espace des préfixes SIREN (10^8 valeurs). Premier avec
+# 10^8, il garantit qu'aucun préfixe n'est généré deux fois.
+PAS_SIREN = 48_271_853
+ESPACE_SIREN = 10 ** 8
+
+# Distributions approximatives observées sur le portefeuille du cabinet.
+# Les champs à choix absents de ce dictionnaire suivent une loi uniforme.
+POIDS_CHOIX = {
+    # Questionnaire client
+    'factures_format_electronique': {'yes': 45, 'no': 35, 'dont_know': 20},
+    'caisse_enregistreuse': {'yes': 25, 'no': 40, 'not_applicable': 35},
+    'caisse_certifiee': {'yes': 30, 'no': 20, 'dont_know': 50},
+    'plateforme_agreee': {'yes': 10, 'no': 55, 'dont_know': 35},
+    'gestion_future': {'internal': 40, 'delegate': 35, 'dont_know': 25},
+    'aisance_outils': {'very_comfortable': 30, 'medium': 50, 'not_comfortable': 20},
+    'reception_factures_achats': {'paper': 20, 'email': 50, 'mixed': 25, 'platform': 4, 'other': 1},
+    'envoi_factures_ventes': {'paper': 15, 'email': 60, 'mixed': 20, 'platform': 4, 'other': 1},
+    'conservation_factures': {'paper': 25, 'electronic': 20, 'mixed': 40, 'accounting_firm': 15},
+    # Questionnaire collaborateur
+    'assujettie_tva': {'yes': 85, 'no': 10, 'unsure': 5},
+    'taille_entreprise': {'small_medium': 92, 'mid_sized': 6, 'large': 2},
+    'regime_tva': {'franchise': 30, 'simplified_real': 45, 'quarterly_real': 5, 'monthly_real': 20},
+    'activite_exoneree_tva': {
+        'mixed': 80, 'health': 6, 'education': 4, 'real_estate': 4,
+        'nonprofit': 3, 'banking': 2, 'insurance': 1,
+    },
+    'nb_factures_ventes': {
+        'less_than_50': 30, 'between_50_200': 30, 'between_200_1000': 25,
+        'between_1000_5000': 8, 'more_than_5000': 2, 'not_applicable': 5,
+    },
+    'nb_clients_actifs': {
+        'less_than_10': 30, 'between_10_50': 35, 'between_50_200': 20,
+        'more_than_200': 10, 'not_applicable': 5,
+    },
+    'nb_factures_achats': {
+        'less_than_50': 35, 'between_50_200': 35, 'between_200_1000': 20,
+        'between_1000_5000': 5, 'more_than_5000': 1, 'not_applicable': 4,
+    },
+    'nb_fournisseurs_actifs': {
+        'less_than_10': 40, 'between_10_50': 40, 'between_50_200': 12,
+        'more_than_200': 3, 'not_applicable': 5,
+    },
+}
+
+# Probabilité qu'un booléen soit coché (0.4 par défaut)
+PROBA_BOOLEENS = {
+    'logiciel_facturation': 0.7,
+    'logiciel_devis': 0.5,
+    'vente_btob_domestique': 0.8,
+    'vente_btob_export': 0.1,
+    'vente_btoc_facture': 0.35,
+    'vente_btoc_caisse': 0.25,
+    'achat_btob_domestique': 0.9,
+    'achat_btob_intracommunautaire': 0.3,
+    'achat_btob_hors_ue': 0.1,
+}
+
+# Part de réponses laissées vides pour les champs à choix facultatifs
+TAUX_VIDE = 0.1
+
+NOMS_PREFIXES = ['Atelier', 'Boulangerie', 'Cabinet', 'Garage', 'Société', 'Transports',
+                 'Pharmacie', 'Menuiserie', 'Restaurant', 'Agence', 'Ferme', 'Librairie']
+NOMS_RADICAUX = ['Martin', 'Bernard', 'Dubois', 'Durand', 'Lefebvre', 'Moreau', 'Laurent',
+                 'Simon', 'Michel', 'Garcia', 'du Centre', 'des Alpes', 'de la Gare', 'Océan']
+FORMES_JURIDIQUES = ['SARL', 'SAS', 'SASU', 'EURL', 'SA', 'SCI', 'EI']
+LOGICIELS = ['Sage', 'EBP', 'Cegid', 'Pennylane', 'QuickBooks', 'Axonaut', 'Henrri', 'Excel']
+CAISSES = ['Lightspeed', 'Zelty', 'SumUp', 'Tiller', 'Square']
+PLATEFORMES = ['Chorus Pro', 'Docaposte', 'Generix', 'Cegedim', 'Esker']
+CODES_APE = ['47.11F', '56.10A', '45.20A', '62.01Z', '69.20Z', '43.21A', '10.71C',
+             '86.21Z', '68.20A', '49.41A', '47.73Z', '01.11Z']
+
+
+@contextmanager
+def dates_manuelles(*model_classes):
+    """
+    Désactive temporairement auto_now / auto_now_add afin de pouvoir étaler
+    les dates générées dans le temps (sinon toutes les lignes auraient la
+    date d'insertion).
+    """
+    champs = [
+        (field, field.auto_now, field.auto_now_add)
+        for model in model_classes
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    for field, _, _ in champs:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in champs:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+class Command(BaseCommand):
+    help = "Génère des entreprises et questionnaires synthétiques pour les tests de charge"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entreprises', type=int, default=1000,
+                            help="Nombre d'entreprises à générer (défaut: 1000)")
+        parser.add_argument('--collaborateurs', type=int, default=1,
+                            help='Nombre de collaborateurs synthétiques (défaut: 1)')
+        parser.add_argument('--seed', type=int, default=42,
+                            help='Graine aléatoire (défaut: 42)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Taille des lots insérés par transaction (défaut: 5000)')
+        parser.add_argument('--taux-client', type=float, default=0.7,
+                            help='Part des entreprises avec questionnaire client (défaut: 0.7)')
+        parser.add_argument('--taux-collaborateur', type=float, default=0.5,
+                            help='Part des entreprises avec questionnaire collaborateur (défaut: 0.5)')
+        parser.add_argument('--taux-archive', type=float, default=0.05,
+                            help='Part des entreprises archivées (défaut: 0.05)')
+        parser.add_argument('--jours', type=int, default=730,
+                            help='Période couverte par les dates générées, en jours (défaut: 730)')
+
+    def handle(self, *args, **options):
+        total = options['entreprises']
+        batch_size = options['batch_size']
+        if total < 0 or batch_size <= 0:
+            raise CommandError('--entreprises doit être positif et --batch-size strictement positif')
+        if options['taux_collaborateur'] > 0 and options['collaborateurs'] <= 0:
+            raise CommandError('Au moins un collaborateur est nécessaire pour générer des questionnaires collaborateurs')
+
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        self.maintenant = timezone.now()
+        self.depart_siren = self.rng.randrange(ESPACE_SIREN)
+        self._preparer_tables()
+
+        collaborateurs = self._collaborateurs(options['collaborateurs'])
+
+        debut = time.perf_counter()
+        compteurs = {'entreprises': 0, 'clients': 0, 'collaborateurs': 0, 'ignorees': 0}
+
+        with dates_manuelles(Entreprise, QuestionnaireClient, QuestionnaireCollaborateur):
+            for offset in range(0, total, batch_size):
+                indices = range(offset, min(offset + batch_size, total))
+                self._inserer_lot(indices, collaborateurs, compteurs)
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f'  {offset + len(indices)}/{total} entreprises traitées')
+
+        duree = time.perf_counter() - debut
+        debit = compteurs['entreprises'] / duree if duree else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{compteurs['entreprises']} entreprises, {compteurs['clients']} questionnaires clients, "
+            f"{compteurs['collaborateurs']} questionnaires collaborateurs créés en {duree:.1f}s "
+            f"({debit:.0f} entreprises/s, {compteurs['ignorees']} SIREN déjà existants ignorés)"
+        ))
+
+    # ------------------------------------------------------------------
+    # Préparation
+    # ------------------------------------------------------------------
+
+    def _preparer_tables(self):
+        """Précalcule les tirages pondérés et les champs obligatoires de chaque modèle"""
+        self.tirages = {}
+        for model in (QuestionnaireClient, QuestionnaireCollaborateur):
+            for field in model._meta.concrete_fields:
+                if not field.choices:
+                    continue
+                poids = POIDS_CHOIX.get(field.name, {})
+                valeurs = [valeur for valeur, _ in field.flatchoices]
+                ponderations = [poids.get(valeur, 1) for valeur in valeurs]
+                self.tirages[(model, field.name)] = (valeurs, ponderations)
+
+        self.obligatoires = {
+            QuestionnaireClient: {n for n, f in QuestionnaireClientForm().fields.items() if f.required},
+            QuestionnaireCollaborateur: {n for n, f in QuestionnaireCollaborateurForm().fields.items() if f.required},
+        }
+        self.choix_accompagnement = [code for code, _ in QuestionnaireClientForm.CHOIX_ACCOMPAGNEMENT]
+
+    def _collaborateurs(self, nombre):
+        """Récupère ou crée les collaborateurs synthétiques"""
+        if nombre <= 0:
+            return []
+        emails = [f'synthetique{i:04d}@etac.invalid' for i in range(nombre)]
+        existants = {u.email: u for u in User.objects.filter(email__in=emails)}
+        mot_de_passe = make_password(None)
+        manquants = [
+            User(email=email, username=email.split('@')[0], password=mot_de_passe,
+                 first_name='Collaborateur', last_name=f'Synthétique {i}', is_collaborateur=True)
+            for i, email in enumerate(emails) if email not in existants
+        ]
+        User.objects.bulk_create(manquants)
+        return list(User.objects.filter(email__in=emails).order_by('email'))
+
+    # ------------------------------------------------------------------
+    # Génération
+    # ------------------------------------------------------------------
+
+    def _siren(self, index):
+        prefixe = f'{(self.depart_siren + index * PAS_SIREN) % ESPACE_SIREN:08d}'
+        return prefixe + luhn_check_digit(prefixe)
+
+    def _inserer_lot(self, indices, collaborateurs, compteurs):
+        rng = self.rng
+        options = self.options
+        entreprises, clients, collabs = [], [], []
+
+        for index in indices:
+            entreprise = self._entreprise(self._siren(index))
+            entreprises.append(entreprise)
+            if rng.random() < options['taux_client']:
+                clients.append(self._questionnaire_client(entreprise))
+            if rng.random() < options['taux_collaborateur']:
+                collabs.append(self._questionnaire_collaborateur(entreprise, rng.choice(collaborateurs)))
+
+        # Ne jamais écraser ni compléter une entreprise réelle
+        existants = set(
+            Entreprise.objects.filter(siren__in=[e.siren for e in entreprises])
+            .values_list('siren', flat=True)
+        )
+        if existants:
+            entreprises = [e for e in entreprises if e.siren not in existants]
+            clients = [q for q in clients if q.entreprise_id not in existants]
+            collabs = [q for q in collabs if q.entreprise_id not in existants]
+            compteurs['ignorees'] += len(existants)
+
+        batch_size = options['batch_size']
+        with transaction.atomic():
+            Entreprise.objects.bulk_create(entreprises, batch_size=batch_size)
+            QuestionnaireClient.objects.bulk_create(clients, batch_size=batch_size)
+            QuestionnaireCollaborateur.objects.bulk_create(collabs, batch_size=batch_size)
+
+        compteurs['entreprises'] += len(entreprises)
+        compteurs['clients'] += len(clients)
+        compteurs['collaborateurs'] += len(collabs)
+
+    def _date_entre(self, debut, fin):
+        return debut + timedelta(seconds=self.rng.random() * (fin - debut).total_seconds())
+
+    def _entreprise(self, siren):
+        rng = self.rng
+        creation = self.maintenant - timedelta(days=rng.random() * self.options['jours'])
+        entreprise = Entreprise(
+            siren=siren,
+            nom_entreprise=f'{rng.choice(NOMS_PREFIXES)} {rng.choice(NOMS_RADICAUX)} {rng.choice(FORMES_JURIDIQUES)}',
+            date_creation=creation,
+            date_modification=self._date_entre(creation, self.maintenant),
+            is_archived=rng.random() < self.options['taux_archive'],
+        )
+        if entreprise.is_archived:
+            entreprise.date_archivage = entreprise.date_modification
+        return entreprise
+
+    def _remplir(self, instance):
+        """Tire une valeur pour chaque champ à choix ou booléen du questionnaire"""
+        rng = self.rng
+        model = type(instance)
+        obligatoires = self.obligatoires[model]
+        for field in model._meta.concrete_fields:
+            if (model, field.name) in self.tirages:
+                if field.name not in obligatoires and rng.random() < TAUX_VIDE:
+                    continue
+                valeurs, ponderations = self.tirages[(model, field.name)]
+                setattr(instance, field.attname, rng.choices(valeurs, weights=ponderations)[0])
+            elif isinstance(field, models.BooleanField):
+                setattr(instance, field.attname, rng.random() < PROBA_BOOLEENS.get(field.name, 0.4))
+
+    def _dates_questionnaire(self, entreprise):
+        completion = self._date_entre(entreprise.date_creation, entreprise.date_modification)
+        return completion, self._date_entre(completion, entreprise.date_modification)
+
+    def _questionnaire_client(self, entreprise):
+        rng = self.rng
+        completion, modification = self._dates_questionnaire(entreprise)
+        questionnaire = QuestionnaireClient(
+            entreprise=entreprise, date_completion=completion, date_modification=modification,
+        )
+        self._remplir(questionnaire)
+        if questionnaire.logiciel_facturation:
+            questionnaire.logiciel_facturation_nom = rng.choice(LOGICIELS)
+        if questionnaire.logiciel_devis:
+            questionnaire.logiciel_devis_nom = rng.choice(LOGICIELS)
+        if questionnaire.caisse_enregistreuse == 'yes':
+            questionnaire.caisse_enregistreuse_nom = rng.choice(CAISSES)
+        if questionnaire.plateforme_agreee == 'yes':
+            questionnaire.plateforme_agreee_nom = rng.choice(PLATEFORMES)
+        questionnaire.accompagnement_souhaite = sorted(
+            rng.sample(self.choix_accompagnement, rng.choice([0, 1, 1, 2, 2, 3])),
+            key=self.choix_accompagnement.index,
+        )
+        return questionnaire
+
+    def _questionnaire_collaborateur(self, entreprise, collaborateur):
+        rng = self.rng
+        completion, modification = self._dates_questionnaire(entreprise)
+        questionnaire = QuestionnaireCollaborateur(
+            entreprise=entreprise, collaborateur=collaborateur,
+            date_completion=completion, date_modification=modification,
+            code_ape=rng.choice(CODES_APE),
+        )
+        self._remplir(questionnaire)
+        if questionnaire.plateforme_agreee:
+            questionnaire.plateforme_agreee_nom = rng.choice(PLATEFORMES)
+        return questionnaire
@@ -0,0 +1,108 @@
+"""
+Synthèse du journal des requêtes SQL lentes (cf. SlowQueryLogMiddleware).
+
+Usage:
+    python manage.py slow_queries --top 20
+    python manage.py slow_queries --tri max --depuis 2026-01-01
+"""
+import json
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+TRIS = {
+    'total': lambda r: r['total_ms'],
+    'nombre': lambda r: r['nombre'],
+    'max': lambda r: r['max_ms'],
+    'moyenne': lambda r: r['moyenne_ms'],
+}
+
+
+def _fichiers_journal(fichier):
+    """Fichier courant et fichiers tournés (.1, .2, ...)"""
+    chemin = Path(fichier)
+    fichiers = [chemin] if chemin.exists() else []
+    fichiers += sorted(chemin.parent.glob(f'{chemin.name}.[0-9]*'))
+    return fichiers
+
+
+def summarize(lignes, depuis=None):
+    """
+    Agrège les enregistrements par requête normalisée.
+
+    Args:
+        lignes: itérable de lignes JSON du journal
+        depuis (str|None): date ISO minimale des enregistrements retenus
+
+    Returns:
+        list: un dict par requête (sql, nombre, total_ms, moyenne_ms, max_ms,
+              vues, sites), non trié
+    """
+    groupes = {}
+    for ligne in lignes:
+        try:
+            enregistrement = json.loads(ligne)
+        except ValueError:
+            continue
+        if depuis and enregistrement.get('date', '') < depuis:
+            continue
+        groupe = groupes.setdefault(enregistrement['sql'], {
+            'sql': enregistrement['sql'], 'nombre': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'vues': Counter(), 'sites': Counter(),
+        })
+        duree = enregistrement['duree_ms']
+        groupe['nombre'] += 1
+        groupe['total_ms'] += duree
+        groupe['max_ms'] = max(groupe['max_ms'], duree)
+        groupe['vues'][enregistrement.get('vue') or '-'] += 1
+        groupe['sites'][enregistrement.get('site') or '?'] += 1
+
+    for groupe in groupes.values():
+        groupe['moyenne_ms'] = groupe['total_ms'] / groupe['nombre']
+    return list(groupes.values())
+
+
+class Command(BaseCommand):
+    help = 'Classe les requêtes SQL lentes journalisées par temps total (ou autre critère)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fichier', default=None,
+                            help='Journal à analyser (défaut: SLOW_QUERY_LOG_FILE, fichiers tournés inclus)')
+        parser.add_argument('--top', type=int, default=20,
+                            help='Nombre de requêtes affichées (défaut: 20)')
+        parser.add_argument('--tri', choices=sorted(TRIS), default='total',
+                            help='Critère de classement (défaut: total)')
+        parser.add_argument('--depuis', help='Ignorer les enregistrements antérieurs (date ISO)')
+        parser.add_argument('--json', action='store_true', help='Sortie JSON')
+
+    def handle(self, *args, **options):
+        fichiers = _fichiers_journal(options['fichier'] or settings.SLOW_QUERY_LOG_FILE)
+        if not fichiers:
+            raise CommandError('Aucun journal de requêtes lentes trouvé')
+
+        def lignes():
+            for fichier in fichiers:
+                with open(fichier, encoding='utf-8') as f:
+                    yield from f
+
+        resultats = summarize(lignes(), depuis=options['depuis'])
+        resultats.sort(key=TRIS[options['tri']], reverse=True)
+        resultats = resultats[:options['top']]
+
+        if options['json']:
+            for resultat in resultats:
+                resultat['vues'] = dict(resultat['vues'].most_common())
+                resultat['sites'] = dict(resultat['sites'].most_common())
+            self.stdout.write(json.dumps(resultats, indent=2, ensure_ascii=False))
+            return
+
+        for rang, resultat in enumerate(resultats, start=1):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"#{rang}  total {resultat['total_ms']:.0f} ms | {resultat['nombre']} exécutions | "
+                f"moyenne {resultat['moyenne_ms']:.1f} ms | max {resultat['max_ms']:.1f} ms"
+            ))
+            self.stdout.write(f"    vues  : {', '.join(f'{v} ({n})' for v, n in resultat['vues'].most_common(5))}")
+            self.stdout.write(f"    sites : {', '.join(f'{s} ({n})' for s, n in resultat['sites'].most_common(5))}")
+            self.stdout.write(f"    {resultat['sql']}")
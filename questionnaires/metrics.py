@@ -0,0 +1,254 @@
+"""
+Métriques applicatives au format texte Prometheus.
+
+Chaque processus accumule ses compteurs et histogrammes en mémoire, puis les
+écrit dans METRICS_DIR (un fichier JSON par processus, écrit de façon
+atomique) : après une requête, au plus toutes les METRICS_FLUSH_INTERVAL
+secondes. Une écriture repoussée par cet intervalle est faite à son échéance
+par un thread minuteur, pour qu'un worker devenu inactif publie aussi ses
+dernières valeurs. Un état inchangé n'est pas réécrit.
+
+L'endpoint /metrics agrège tous les fichiers du répertoire : les workers
+gunicorn sont donc additionnés quel que soit celui qui répond.
+
+Sans METRICS_DIR, les métriques restent locales au processus.
+Le répertoire doit être vidé au démarrage du serveur (ex: hook on_starting
+de gunicorn), sinon les valeurs d'une exécution précédente sont reprises.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+# Bornes des histogrammes de durée (secondes)
+BUCKETS_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bornes des histogrammes de nombre de requêtes SQL
+BUCKETS_REQUETES = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# nom -> (type, description, bornes pour les histogrammes)
+METRIQUES = {
+    'etac_http_requests_total': (
+        'counter', 'Requêtes HTTP traitées, par vue, méthode et statut', None),
+    'etac_http_request_duration_seconds': (
+        'histogram', 'Durée de traitement des requêtes HTTP, par vue', BUCKETS_DUREE),
+    'etac_db_queries_per_request': (
+        'histogram', 'Nombre de requêtes SQL par requête HTTP, par vue', BUCKETS_REQUETES),
+    'etac_db_duration_seconds_per_request': (
+        'histogram', 'Temps SQL cumulé par requête HTTP, par vue', BUCKETS_DUREE),
+    'etac_insee_requests_total': (
+        'counter', "Appels à l'API INSEE, par résultat", None),
+    'etac_insee_request_duration_seconds': (
+        'histogram', "Durée des appels à l'API INSEE", BUCKETS_DUREE),
+    'etac_cache_lookups_total': (
+        'counter', 'Consultations de cache, par cache et résultat (hit/miss)', None),
+    'etac_export_duration_seconds': (
+        'histogram', 'Durée de génération des exports', BUCKETS_DUREE),
+    'etac_export_rows_total': (
+        'counter', 'Lignes exportées', None),
+}
+
+
+def _cle(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+class Registry:
+    """Registre de métriques d'un processus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compteurs = {}
+        self._histogrammes = {}
+        self._dernier_flush = 0.0
+        # Modifications depuis le démarrage, et à la dernière écriture
+        self._version = 0
+        self._version_ecrite = 0
+        self._ecriture = threading.Lock()
+        self._minuterie = None
+
+    def inc(self, nom, labels=None, valeur=1):
+        cle = (nom, _cle(labels))
+        with self._lock:
+            self._compteurs[cle] = self._compteurs.get(cle, 0) + valeur
+            self._version += 1
+
+    def observe(self, nom, valeur, labels=None):
+        bornes = METRIQUES[nom][2]
+        cle = (nom, _cle(labels))
+        with self._lock:
+            serie = self._histogrammes.get(cle)
+            if serie is None:
+                # [compte par borne..., compte +Inf, somme]
+                serie = self._histogrammes[cle] = [0] * (len(bornes) + 1) + [0.0]
+            for index, borne in enumerate(bornes):
+                if valeur <= borne:
+                    serie[index] += 1
+                    break
+            else:
+                serie[len(bornes)] += 1
+            serie[-1] += valeur
+            self._version += 1
+
+    def reset(self):
+        with self._lock:
+            self._compteurs.clear()
+            self._histogrammes.clear()
+            self._version += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[nom, list(labels), v] for (nom, labels), v in self._compteurs.items()],
+                'histograms': [[nom, list(labels), list(s)] for (nom, labels), s in self._histogrammes.items()],
+            }
+
+    def modifie(self):
+        """L'état a changé depuis la dernière écriture"""
+        return self._version != self._version_ecrite
+
+    def flush(self, force=False):
+        """
+        Écrit l'état du processus dans METRICS_DIR s'il a changé, au plus
+        toutes les METRICS_FLUSH_INTERVAL s (sauf `force`). Une écriture
+        repoussée par cet intervalle est planifiée à son échéance : un
+        worker qui devient inactif publie quand même ses derniers incréments.
+        """
+        repertoire = getattr(settings, 'METRICS_DIR', None)
+        if not repertoire or not (force or self.modifie()):
+            return
+        intervalle = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        attente = self._dernier_flush + intervalle - time.monotonic()
+        if not force and attente > 0:
+            self._planifier(attente)
+            return
+        with self._ecriture:
+            self._dernier_flush = time.monotonic()
+            # Version lue avant l'état : une modification concurrente sera réécrite
+            version = self._version
+            repertoire = Path(repertoire)
+            repertoire.mkdir(parents=True, exist_ok=True)
+            cible = repertoire / f'{os.getpid()}.json'
+            temporaire = repertoire / f'.{os.getpid()}.json.tmp'
+            temporaire.write_text(json.dumps(self.snapshot()))
+            os.replace(temporaire, cible)
+            self._version_ecrite = version
+
+    def _planifier(self, delai):
+        """
+        Écriture différée, une seule en attente (un worker forké n'hérite
+        pas du thread)
+        """
+        with self._lock:
+            if self._minuterie is not None and self._minuterie.is_alive():
+                return
+            self._minuterie = threading.Timer(delai, self._flush_differe)
+            self._minuterie.daemon = True
+            self._minuterie.start()
+
+    def _flush_differe(self):
+        try:
+            self.flush(force=True)
+        except OSError:
+            # Répertoire momentanément indisponible : réécrit à la requête suivante
+            pass
+
+
+REGISTRY = Registry()
+atexit.register(lambda: REGISTRY.flush(force=True))
+
+
+def inc(nom, labels=None, valeur=1):
+    REGISTRY.inc(nom, labels, valeur)
+
+
+def observe(nom, valeur, labels=None):
+    REGISTRY.observe(nom, valeur, labels)
+
+
+def _snapshots():
+    """États de tous les processus (ou du seul processus courant sans METRICS_DIR)"""
+    repertoire = getattr(settings, 'METRICS_DIR', None)
+    if not repertoire:
+        return [REGISTRY.snapshot()]
+    REGISTRY.flush(force=True)
+    etats = []
+    for fichier in Path(repertoire).glob('*.json'):
+        try:
+            etats.append(json.loads(fichier.read_text()))
+        except (OSError, ValueError):
+            continue
+    return etats
+
+
+def _aggreger(etats):
+    compteurs, histogrammes = {}, {}
+    for etat in etats:
+        for nom, labels, valeur in etat['counters']:
+            cle = (nom, tuple(tuple(paire) for paire in labels))
+            compteurs[cle] = compteurs.get(cle, 0) + valeur
+        for nom, labels, serie in etat['histograms']:
+            cle = (nom, tuple(tuple(paire) for paire in labels))
+            if cle in histogrammes:
+                histogrammes[cle] = [a + b for a, b in zip(histogrammes[cle], serie)]
+            else:
+                histogrammes[cle] = list(serie)
+    return compteurs, histogrammes
+
+
+def _echapper(valeur):
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    paires = list(labels) + list(extra)
+    if not paires:
+        return ''
+    return '{' + ','.join(f'{k}="{_echapper(v)}"' for k, v in paires) + '}'
+
+
+def _nombre(valeur):
+    return repr(float(valeur)) if isinstance(valeur, float) else str(valeur)
+
+
+def render():
+    """Génère l'exposition texte Prometheus agrégée sur tous les processus"""
+    compteurs, histogrammes = _aggreger(_snapshots())
+    lignes = []
+    for nom, (type_metrique, description, bornes) in METRIQUES.items():
+        lignes.append(f'# HELP {nom} {description}')
+        lignes.append(f'# TYPE {nom} {type_metrique}')
+        if type_metrique == 'counter':
+            for (serie_nom, labels), valeur in sorted(compteurs.items()):
+                if serie_nom == nom:
+                    lignes.append(f'{nom}{_labels(labels)} {_nombre(valeur)}')
+            continue
+        for (serie_nom, labels), serie in sorted(histogrammes.items()):
+            if serie_nom != nom:
+                continue
+            cumul = 0
+            for borne, compte in zip(bornes, serie):
+                cumul += compte
+                lignes.append(f'{nom}_bucket{_labels(labels, [("le", _nombre(borne))])} {cumul}')
+            cumul += serie[len(bornes)]
+            lignes.append(f'{nom}_bucket{_labels(labels, [("le", "+Inf")])} {cumul}')
+            lignes.append(f'{nom}_sum{_labels(labels)} {_nombre(serie[-1])}')
+            lignes.append(f'{nom}_count{_labels(labels)} {cumul}')
+
+    # Ratios de succès des caches, dérivés des compteurs
+    lignes.append('# HELP etac_cache_hit_ratio Part des consultations de cache réussies')
+    lignes.append('# TYPE etac_cache_hit_ratio gauge')
+    par_cache = {}
+    for (nom, labels), valeur in compteurs.items():
+        if nom == 'etac_cache_lookups_total':
+            labels = dict(labels)
+            totaux = par_cache.setdefault(labels.get('cache', ''), {'hit': 0, 'miss': 0})
+            totaux[labels.get('result', 'miss')] = totaux.get(labels.get('result', 'miss'), 0) + valeur
+    for cache, totaux in sorted(par_cache.items()):
+        total = totaux['hit'] + totaux['miss']
+        if total:
+            lignes.append(f'etac_cache_hit_ratio{_labels([("cache", cache)])} {_nombre(totaux["hit"] / total)}')
+    return '\n'.join(lignes) + '\n'
@@ -0,0 +1,300 @@
+import cProfile
+import io
+import json
+import logging
+import marshal
+import pstats
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from . import metrics
+from .instrumentation import (
+    add_phase_time, call_site, is_savepoint, normalize_sql, record_queries, track_phases,
+)
+from .models import ProfilRequete
+from .routers import replica_alias, replica_reads
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger('etac.slow_queries')
+
+
+class MetricsMiddleware:
+    """
+    Alimente les métriques Prometheus (cf. questionnaires.metrics) : durée de
+    chaque requête par nom de vue, nombre et durée des requêtes SQL.
+
+    À placer en tête de MIDDLEWARE pour mesurer toute la chaîne.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sql = {'nombre': 0, 'duree': 0.0}
+
+        def compter(execute, sql_brut, params, many, context):
+            debut_sql = time.perf_counter()
+            try:
+                return execute(sql_brut, params, many, context)
+            finally:
+                sql['nombre'] += 1
+                sql['duree'] += time.perf_counter() - debut_sql
+
+        debut = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(compter))
+            response = self.get_response(request)
+        duree = time.perf_counter() - debut
+
+        match = request.resolver_match
+        vue = match.view_name if match else '<non résolue>'
+        metrics.inc('etac_http_requests_total', {
+            'view': vue, 'method': request.method, 'status': str(response.status_code),
+        })
+        metrics.observe('etac_http_request_duration_seconds', duree, {'view': vue})
+        metrics.observe('etac_db_queries_per_request', sql['nombre'], {'view': vue})
+        metrics.observe('etac_db_duration_seconds_per_request', sql['duree'], {'view': vue})
+        metrics.REGISTRY.flush()
+        return response
+
+
+class ServerTimingMiddleware:
+    """
+    Ajoute un en-tête Server-Timing détaillant les phases de la requête :
+    db (requêtes SQL), insee (appels API), template (rendu), cache
+    (consultations de cache) et total. Visible dans les outils de
+    développement du navigateur.
+
+    Activé par SERVER_TIMING_ENABLED (par défaut en DEBUG uniquement : les
+    durées révèlent par exemple si un SIREN était déjà en cache).
+    """
+
+    DESCRIPTIONS = {
+        'db': 'SQL',
+        'insee': 'API INSEE',
+        'template': 'Rendu',
+        'cache': 'Cache',
+    }
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    @staticmethod
+    def _chronometrer_sql(execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            add_phase_time('db', time.perf_counter() - debut)
+
+    def __call__(self, request):
+        debut = time.perf_counter()
+        with track_phases() as phases, ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self._chronometrer_sql))
+            response = self.get_response(request)
+        total = time.perf_counter() - debut
+
+        mesures = [
+            f'{phase};dur={duree * 1000:.1f};desc="{self.DESCRIPTIONS.get(phase, phase)} ({nombre})"'
+            for phase, (duree, nombre) in phases.items()
+        ]
+        mesures.append(f'total;dur={total * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(mesures)
+        return response
+
+
+class SlowQueryLogMiddleware:
+    """
+    Journalise les requêtes SQL plus lentes que SLOW_QUERY_THRESHOLD_MS.
+
+    Chaque enregistrement (une ligne JSON sur le logger 'etac.slow_queries',
+    fichier configuré dans LOGGING) contient la requête normalisée,
+    sa durée, la vue et la fonction applicative à l'origine de la requête.
+    Synthèse : `python manage.py slow_queries`.
+
+    Désactivé (aucun coût) quand le seuil vaut 0.
+    """
+
+    def __init__(self, get_response):
+        seuil = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 0)
+        if not seuil:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.seuil = seuil / 1000
+
+    def __call__(self, request):
+        def journaliser(execute, sql, params, many, context):
+            debut = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                duree = time.perf_counter() - debut
+                if duree >= self.seuil and not is_savepoint(sql):
+                    match = request.resolver_match
+                    slow_query_logger.info(json.dumps({
+                        'date': timezone.now().isoformat(),
+                        'duree_ms': round(duree * 1000, 3),
+                        'vue': match.view_name if match else '',
+                        'site': call_site(),
+                        'alias': context['connection'].alias,
+                        'sql': normalize_sql(sql),
+                    }, ensure_ascii=False))
+
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(journaliser))
+            return self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Exécute les vues de consultation (dashboard, export, fiche entreprise,
+    listes de l'admin) avec lectures sur le réplica (cf. questionnaires.routers).
+
+    Après une écriture (POST, PUT, PATCH, DELETE), un cookie maintient les
+    lectures de l'utilisateur sur la base principale pendant
+    REPLICA_STICKY_SECONDS, le temps que le réplica rattrape son retard :
+    chacun voit immédiatement ses propres modifications.
+
+    Sans réplica configuré (REPLICA_DATABASE), le middleware est désactivé.
+    """
+
+    VUES_LECTURE = {'dashboard', 'export_csv', 'voir_questionnaire'}
+    COOKIE = 'etac_primaire'
+
+    def __init__(self, get_response):
+        if replica_alias() is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.fenetre = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+    def lecture_seule(self, request):
+        """Indique si la requête peut lire sur le réplica"""
+        if request.method not in ('GET', 'HEAD') or self.COOKIE in request.COOKIES:
+            return False
+        try:
+            match = resolve(request.path_info, getattr(request, 'urlconf', None))
+        except Resolver404:
+            return False
+        if match.namespace == 'admin':
+            return match.url_name.endswith('_changelist')
+        return match.url_name in self.VUES_LECTURE
+
+    @staticmethod
+    def _flux_sur_replica(contenu):
+        # Le contenu d'une réponse en flux est produit après le retour de la
+        # vue : chaque morceau est généré avec lectures sur le réplica.
+        iterateur = iter(contenu)
+        while True:
+            with replica_reads():
+                try:
+                    morceau = next(iterateur)
+                except StopIteration:
+                    return
+            yield morceau
+
+    def __call__(self, request):
+        if not self.lecture_seule(request):
+            response = self.get_response(request)
+            if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+                response.set_cookie(
+                    self.COOKIE, '1', max_age=self.fenetre, httponly=True,
+                    samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+                )
+            return response
+
+        with replica_reads():
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self._flux_sur_replica(response.streaming_content)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profilage à la demande d'une requête.
+
+    Un membre du staff authentifié déclenche le profilage en envoyant l'en-tête
+    `X-Profile: 1` ou le paramètre `?_profile=1`. La requête est alors exécutée
+    sous cProfile, les requêtes SQL sont chronométrées, et le profil est
+    enregistré (ProfilRequete, téléchargeable depuis l'admin). Seuls les
+    PROFILING_MAX_PROFILES derniers profils sont conservés.
+
+    Sans déclencheur, le seul coût est la lecture d'un en-tête et d'un
+    paramètre GET.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = getattr(settings, 'PROFILING_HEADER', 'X-Profile')
+        self.parametre = getattr(settings, 'PROFILING_QUERY_PARAM', '_profile')
+        self.max_profils = getattr(settings, 'PROFILING_MAX_PROFILES', 50)
+
+    def __call__(self, request):
+        if not (request.headers.get(self.header) or self.parametre in request.GET):
+            return self.get_response(request)
+        if not (request.user.is_authenticated and request.user.is_staff):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Un autre profileur est déjà actif (ex: débogueur)
+            logger.warning('Profilage impossible : un autre profileur est actif')
+            return self.get_response(request)
+
+        debut = time.perf_counter()
+        try:
+            with record_queries() as requetes:
+                response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duree = time.perf_counter() - debut
+
+        profil = self._enregistrer(request, response, profiler, requetes, duree)
+        response['X-Profile-Id'] = str(profil.pk)
+        return response
+
+    def _enregistrer(self, request, response, profiler, requetes, duree):
+        requetes = [r for r in requetes if not is_savepoint(r['sql'])]
+        resume = io.StringIO()
+        stats = pstats.Stats(profiler, stream=resume)
+        stats.sort_stats('cumulative').print_stats(40)
+
+        match = request.resolver_match
+        profil = ProfilRequete.objects.create(
+            utilisateur=request.user,
+            methode=request.method,
+            chemin=request.get_full_path()[:500],
+            vue=match.view_name if match else '',
+            statut=response.status_code,
+            duree_ms=duree * 1000,
+            nb_requetes_sql=len(requetes),
+            duree_sql_ms=sum(r['duree'] for r in requetes) * 1000,
+            requetes_sql=[
+                {'sql': r['sql'], 'duree_ms': round(r['duree'] * 1000, 3), 'site': r['site']}
+                for r in requetes
+            ],
+            resume=resume.getvalue(),
+            donnees=marshal.dumps(stats.stats),
+        )
+
+        # Rétention bornée : supprimer les profils les plus anciens
+        anciens = list(
+            ProfilRequete.objects.order_by('-date', '-pk')
+            .values_list('pk', flat=True)[self.max_profils:]
+        )
+        if anciens:
+            ProfilRequete.objects.filter(pk__in=anciens).delete()
+        return profil
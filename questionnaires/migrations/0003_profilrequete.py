@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-19 01:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaires', '0002_alter_questionnaireclient_aisance_outils_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfilRequete',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(auto_now_add=True)),
+                ('methode', models.CharField(max_length=10)),
+                ('chemin', models.CharField(max_length=500)),
+                ('vue', models.CharField(blank=True, max_length=200)),
+                ('statut', models.PositiveSmallIntegerField()),
+                ('duree_ms', models.FloatField(verbose_name='Durée totale (ms)')),
+                ('nb_requetes_sql', models.PositiveIntegerField(verbose_name='Requêtes SQL')),
+                ('duree_sql_ms', models.FloatField(verbose_name='Durée SQL (ms)')),
+                ('requetes_sql', models.JSONField(default=list, help_text='Liste des requêtes : sql, duree_ms, site')),
+                ('resume', models.TextField(blank=True, help_text='Fonctions triées par temps cumulé')),
+                ('donnees', models.BinaryField(help_text='Statistiques cProfile (format .prof)')),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='profils_requetes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Profil de requête',
+                'verbose_name_plural': 'Profils de requêtes',
+                'ordering': ['-date'],
+            },
+        ),
+    ]
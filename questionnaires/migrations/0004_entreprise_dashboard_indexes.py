@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-19 02:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaires', '0003_profilrequete'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='entreprise',
+            options={'ordering': ['-date_modification', '-siren'], 'verbose_name': 'Entreprise', 'verbose_name_plural': 'Entreprises'},
+        ),
+        migrations.RemoveIndex(
+            model_name='entreprise',
+            name='questionnai_siren_20ddd2_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='entreprise',
+            name='questionnai_nom_ent_bd6177_idx',
+        ),
+        migrations.AddIndex(
+            model_name='entreprise',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['date_modification', 'siren'], name='ent_actives_modif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entreprise',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['date_creation', 'siren'], name='ent_actives_creation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entreprise',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['nom_entreprise', 'siren'], name='ent_actives_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entreprise',
+            index=models.Index(condition=models.Q(('is_archived', True)), fields=['date_modification', 'siren'], name='ent_archivees_modif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entreprise',
+            index=models.Index(condition=models.Q(('is_archived', True)), fields=['date_creation', 'siren'], name='ent_archivees_creation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entreprise',
+            index=models.Index(condition=models.Q(('is_archived', True)), fields=['nom_entreprise', 'siren'], name='ent_archivees_nom_idx'),
+        ),
+    ]
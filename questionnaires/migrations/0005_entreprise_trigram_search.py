@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Index trigrammes (PostgreSQL uniquement) pour la recherche du dashboard :
+# `icontains` produit UPPER(col::text) LIKE UPPER('%...%'), qu'aucun index
+# B-tree ne sert. Sous SQLite et MySQL, la migration ne fait rien.
+INDEX_TRIGRAMMES = {
+    'ent_nom_trgm_idx': 'nom_entreprise',
+    'ent_siren_trgm_idx': 'siren',
+}
+
+
+def creer_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nom, colonne in INDEX_TRIGRAMMES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {nom} ON questionnaires_entreprise '
+            f'USING gin ((UPPER({colonne}::text)) gin_trgm_ops)'
+        )
+
+
+def supprimer_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nom in INDEX_TRIGRAMMES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nom}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaires', '0004_entreprise_dashboard_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
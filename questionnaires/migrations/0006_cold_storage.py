@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-19 02:09
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def dater_archivages(apps, schema_editor):
+    # Entreprises déjà archivées : la dernière modification est la meilleure
+    # approximation de la date d'archivage
+    Entreprise = apps.get_model('questionnaires', 'Entreprise')
+    Entreprise.objects.filter(is_archived=True).update(date_archivage=F('date_modification'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaires', '0005_entreprise_trigram_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntrepriseArchivee',
+            fields=[
+                ('siren', models.CharField(max_length=9, primary_key=True, serialize=False, verbose_name='SIREN')),
+                ('nom_entreprise', models.CharField(max_length=255, verbose_name='Nom entreprise')),
+                ('date_archivage', models.DateTimeField()),
+                ('date_transfert', models.DateTimeField(auto_now_add=True, verbose_name='Transférée le')),
+                ('questionnaire_client', models.BooleanField(default=False)),
+                ('questionnaire_collaborateur', models.BooleanField(default=False)),
+                ('donnees', models.BinaryField(help_text='Entreprise et questionnaires (JSON compressé zlib)')),
+            ],
+            options={
+                'verbose_name': 'Entreprise archivée',
+                'verbose_name_plural': 'Entreprises archivées',
+                'ordering': ['-date_transfert', 'siren'],
+            },
+        ),
+        migrations.AddField(
+            model_name='entreprise',
+            name='date_archivage',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Point de départ du transfert vers les archives (commande cold_storage)', null=True),
+        ),
+        migrations.RunPython(dater_archivages, migrations.RunPython.noop),
+    ]
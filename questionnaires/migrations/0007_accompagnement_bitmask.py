@@ -0,0 +1,90 @@
+from django.db import migrations, models
+
+import questionnaires.fields
+
+# Codes dans l'ordre des bits, figés à la date de la migration
+CODES = ['information', 'conseil', 'formation', 'parametrage',
+         'gestion_complete', 'support', 'aucun', 'autre']
+
+TAILLE_LOT = 2000
+
+
+def _lots(queryset, colonne):
+    """(pk, valeur) par lots de TAILLE_LOT, dans l'ordre des clés"""
+    dernier = None
+    while True:
+        lot = queryset.order_by('pk')
+        if dernier is not None:
+            lot = lot.filter(pk__gt=dernier)
+        lot = list(lot.values_list('pk', colonne)[:TAILLE_LOT])
+        if not lot:
+            return
+        yield lot
+        dernier = lot[-1][0]
+
+
+def _mettre_a_jour(queryset, colonne, masques, convertir):
+    # Une requête UPDATE par masque distinct du lot (au plus 256)
+    par_masque = {}
+    for pk, masque in masques:
+        par_masque.setdefault(masque, []).append(pk)
+    for masque, pks in par_masque.items():
+        queryset.filter(pk__in=pks).update(**{colonne: convertir(masque)})
+
+
+def liste_vers_masque(apps, schema_editor):
+    QuestionnaireClient = apps.get_model('questionnaires', 'QuestionnaireClient')
+    questionnaires = QuestionnaireClient.objects.all()
+    for lot in _lots(questionnaires, 'accompagnement_souhaite'):
+        masques = []
+        for pk, codes in lot:
+            masque = 0
+            for code in codes or []:
+                if code in CODES:
+                    masque |= 1 << CODES.index(code)
+            if masque:
+                masques.append((pk, masque))
+        _mettre_a_jour(questionnaires, 'accompagnement_bits', masques, int)
+
+
+def masque_vers_liste(apps, schema_editor):
+    QuestionnaireClient = apps.get_model('questionnaires', 'QuestionnaireClient')
+    questionnaires = QuestionnaireClient.objects.all()
+    for lot in _lots(questionnaires.exclude(accompagnement_bits=0), 'accompagnement_bits'):
+        _mettre_a_jour(questionnaires, 'accompagnement_souhaite', lot, lambda masque: [
+            code for i, code in enumerate(CODES) if masque & (1 << i)
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaires', '0006_cold_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questionnaireclient',
+            name='accompagnement_bits',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(liste_vers_masque, masque_vers_liste),
+        migrations.RemoveField(
+            model_name='questionnaireclient',
+            name='accompagnement_souhaite',
+        ),
+        migrations.RenameField(
+            model_name='questionnaireclient',
+            old_name='accompagnement_bits',
+            new_name='accompagnement_souhaite',
+        ),
+        migrations.AlterField(
+            model_name='questionnaireclient',
+            name='accompagnement_souhaite',
+            field=questionnaires.fields.BitmaskListField(blank=True, codes=[('information', 'Information et sensibilisation sur la réforme'), ('conseil', 'Conseil sur le choix des outils'), ('formation', "Formation à l'utilisation des outils"), ('parametrage', 'Paramétrage et mise en place des solutions'), ('gestion_complete', 'Gestion complète de la facturation électronique'), ('support', 'Support et assistance régulière'), ('aucun', 'Aucun accompagnement nécessaire'), ('autre', 'Autre')], help_text="Liste des types d'accompagnement"),
+        ),
+        migrations.AddIndex(
+            model_name='questionnaireclient',
+            index=models.Index(fields=['accompagnement_souhaite'], name='qc_accompagnement_idx'),
+        ),
+    ]
@@ -0,0 +1,152 @@
+# Generated by Django 6.0 on 2026-10-19 02:18
+
+import questionnaires.fields
+from django.db import migrations
+from django.db.models import Case, Value, When
+
+# Champs convertis ; leurs codes sont lus dans l'état des migrations (choix
+# du CharField d'origine), donc figés : 0 = vide, i + 1 = choices[i]
+CHAMPS = {
+    'QuestionnaireClient': [
+        'factures_format_electronique', 'caisse_enregistreuse', 'caisse_certifiee',
+        'plateforme_agreee', 'gestion_future', 'aisance_outils',
+        'reception_factures_achats', 'envoi_factures_ventes', 'conservation_factures',
+    ],
+    'QuestionnaireCollaborateur': [
+        'assujettie_tva', 'taille_entreprise', 'regime_tva', 'activite_exoneree_tva',
+        'nb_factures_ventes', 'nb_clients_actifs', 'nb_factures_achats', 'nb_fournisseurs_actifs',
+    ],
+}
+
+TAILLE_LOT = 2000
+
+
+def _convertir(apps, correspondances, defaut):
+    """
+    Réécrit les colonnes par lots de TAILLE_LOT lignes : un UPDATE ... CASE
+    par lot et par table, toutes colonnes à la fois.
+    """
+    for nom_modele, champs in CHAMPS.items():
+        modele = apps.get_model('questionnaires', nom_modele)
+        valeurs = {}
+        for champ in champs:
+            codes = [code for code, _ in modele._meta.get_field(champ).flatchoices]
+            valeurs[champ] = Case(
+                *[When(**{champ: avant}, then=Value(apres)) for avant, apres in correspondances(codes)],
+                default=Value(defaut),
+            )
+        dernier = None
+        while True:
+            lot = modele.objects.order_by('pk')
+            if dernier is not None:
+                lot = lot.filter(pk__gt=dernier)
+            pks = list(lot.values_list('pk', flat=True)[:TAILLE_LOT])
+            if not pks:
+                break
+            lot.filter(pk__lte=pks[-1]).update(**valeurs)
+            dernier = pks[-1]
+
+
+def codes_vers_entiers(apps, schema_editor):
+    # '0', '1'... deviennent des entiers au changement de type ; vide et codes inconnus -> '0'
+    _convertir(apps, lambda codes: [(code, str(i)) for i, code in enumerate(codes, start=1)], '0')
+
+
+def entiers_vers_codes(apps, schema_editor):
+    _convertir(apps, lambda codes: [(str(i), code) for i, code in enumerate(codes, start=1)], '')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaires', '0007_accompagnement_bitmask'),
+    ]
+
+    operations = [
+        migrations.RunPython(codes_vers_entiers, entiers_vers_codes),
+        migrations.AlterField(
+            model_name='questionnaireclient',
+            name='aisance_outils',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('very_comfortable', "Très à l'aise"), ('medium', 'Moyen'), ('not_comfortable', "Pas du tout à l'aise")]),
+        ),
+        migrations.AlterField(
+            model_name='questionnaireclient',
+            name='caisse_certifiee',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('yes', 'Oui'), ('no', 'Non'), ('dont_know', 'Je ne sais pas')]),
+        ),
+        migrations.AlterField(
+            model_name='questionnaireclient',
+            name='caisse_enregistreuse',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('yes', 'Oui'), ('no', 'Non'), ('not_applicable', 'Non applicable')]),
+        ),
+        migrations.AlterField(
+            model_name='questionnaireclient',
+            name='conservation_factures',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('paper', 'Classement papier uniquement'), ('electronic', 'Archivage électronique uniquement'), ('mixed', 'Mix papier + électronique'), ('accounting_firm', 'Confié au cabinet comptable')]),
+        ),
+        migrations.AlterField(
+            model_name='questionnaireclient',
+            name='envoi_factures_ventes',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('paper', 'Principalement par courrier papier'), ('email', 'Principalement par email (PDF)'), ('mixed', 'Mix papier/email'), ('platform', 'Via plateforme dématérialisée'), ('other', 'Autre')]),
+        ),
+        migrations.AlterField(
+            model_name='questionnaireclient',
+            name='factures_format_electronique',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('yes', 'Oui'), ('no', 'Non'), ('dont_know', 'Je ne sais pas')]),
+        ),
+        migrations.AlterField(
+            model_name='questionnaireclient',
+            name='gestion_future',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('internal', 'Gérer en interne avec accompagnement'), ('delegate', 'Déléguer au cabinet'), ('dont_know', 'Je ne sais pas, besoin de conseils')]),
+        ),
+        migrations.AlterField(
+            model_name='questionnaireclient',
+            name='plateforme_agreee',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('yes', 'Oui'), ('no', 'Non'), ('dont_know', 'Je ne sais pas')]),
+        ),
+        migrations.AlterField(
+            model_name='questionnaireclient',
+            name='reception_factures_achats',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('paper', 'Principalement par courrier papier'), ('email', 'Principalement par email (PDF)'), ('mixed', 'Mix papier/email'), ('platform', 'Via plateforme dématérialisée'), ('other', 'Autre')]),
+        ),
+        migrations.AlterField(
+            model_name='questionnairecollaborateur',
+            name='activite_exoneree_tva',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('health', 'Prestations santé'), ('education', 'Enseignement et formation'), ('real_estate', 'Opérations immobilières'), ('nonprofit', 'Associations à but non lucratif'), ('banking', 'Opérations bancaires et financières'), ('insurance', "Opérations d'assurance"), ('mixed', "Activité mixte ou n'exerce pas dans ces secteurs")]),
+        ),
+        migrations.AlterField(
+            model_name='questionnairecollaborateur',
+            name='assujettie_tva',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('yes', 'Oui'), ('no', 'Non'), ('unsure', "J'ai un doute")]),
+        ),
+        migrations.AlterField(
+            model_name='questionnairecollaborateur',
+            name='nb_clients_actifs',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('less_than_10', 'Moins de 10'), ('between_10_50', 'Entre 10 et 50'), ('between_50_200', 'Entre 50 et 200'), ('more_than_200', 'Plus de 200'), ('not_applicable', 'N/A')]),
+        ),
+        migrations.AlterField(
+            model_name='questionnairecollaborateur',
+            name='nb_factures_achats',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('less_than_50', 'Moins de 50'), ('between_50_200', 'Entre 50 et 200'), ('between_200_1000', 'Entre 200 et 1000'), ('between_1000_5000', 'Entre 1000 et 5000'), ('more_than_5000', 'Plus de 5000'), ('not_applicable', 'N/A')]),
+        ),
+        migrations.AlterField(
+            model_name='questionnairecollaborateur',
+            name='nb_factures_ventes',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('less_than_50', 'Moins de 50'), ('between_50_200', 'Entre 50 et 200'), ('between_200_1000', 'Entre 200 et 1000'), ('between_1000_5000', 'Entre 1000 et 5000'), ('more_than_5000', 'Plus de 5000'), ('not_applicable', 'N/A')]),
+        ),
+        migrations.AlterField(
+            model_name='questionnairecollaborateur',
+            name='nb_fournisseurs_actifs',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('less_than_10', 'Moins de 10'), ('between_10_50', 'Entre 10 et 50'), ('between_50_200', 'Entre 50 et 200'), ('more_than_200', 'Plus de 200'), ('not_applicable', 'N/A')]),
+        ),
+        migrations.AlterField(
+            model_name='questionnairecollaborateur',
+            name='regime_tva',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('franchise', 'Franchise en base'), ('simplified_real', 'Réel simplifié'), ('quarterly_real', 'Réel trimestriel'), ('monthly_real', 'Réel mensuel')]),
+        ),
+        migrations.AlterField(
+            model_name='questionnairecollaborateur',
+            name='taille_entreprise',
+            field=questionnaires.fields.CompactChoiceField(blank=True, choices=[('small_medium', 'TPE/PME'), ('mid_sized', 'ETI'), ('large', 'Grande entreprise')]),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-19 02:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaires', '0008_compact_choices'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Brouillon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_questionnaire', models.CharField(choices=[('client', 'Questionnaire client'), ('collaborateur', 'Questionnaire collaborateur')], max_length=20)),
+                ('donnees', models.JSONField(default=dict, help_text='Valeurs saisies, au format du formulaire : champ -> valeur ou liste de valeurs')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('date_modification', models.DateTimeField(auto_now=True)),
+                ('auteur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='brouillons', to=settings.AUTH_USER_MODEL)),
+                ('entreprise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='brouillons', to='questionnaires.entreprise')),
+            ],
+            options={
+                'verbose_name': 'Brouillon',
+                'verbose_name_plural': 'Brouillons',
+                'ordering': ['-date_modification'],
+                'constraints': [models.UniqueConstraint(fields=('entreprise', 'type_questionnaire'), name='brouillon_unique')],
+            },
+        ),
+    ]
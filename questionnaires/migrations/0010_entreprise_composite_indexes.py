@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-19 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaires', '0009_brouillon'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entreprise',
+            index=models.Index(fields=['is_archived', 'date_modification', 'siren'], name='ent_statut_modif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entreprise',
+            index=models.Index(fields=['is_archived', 'date_creation', 'siren'], name='ent_statut_creation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entreprise',
+            index=models.Index(fields=['is_archived', 'nom_entreprise', 'siren'], name='ent_statut_nom_idx'),
+        ),
+    ]
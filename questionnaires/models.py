@@ -1,6 +1,73 @@
+import copy
+
 from django.db import models
 from django.conf import settings
 
+from .fields import BitmaskListField, CompactChoiceField
+
+
+class SuiviModificationsMixin:
+    """
+    Suivi des champs modifiés depuis le chargement : save() n'écrit que les
+    colonnes modifiées (update_fields), plus les champs auto_now, et
+    n'exécute aucune requête si rien n'a changé.
+
+    Les instances créées en mémoire (pas encore enregistrées) et les save()
+    avec update_fields explicite gardent le comportement de Django.
+    """
+
+    def _valeurs_courantes(self):
+        # Champs chargés uniquement (les champs différés ne sont pas dans __dict__)
+        return {
+            field.attname: copy.copy(self.__dict__[field.attname])
+            for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in self.__dict__
+        }
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._valeurs_chargees = instance._valeurs_courantes()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        valeurs = self._valeurs_courantes()
+        if fields is not None:
+            # Chargement d'un champ différé : les autres champs gardent leur
+            # valeur de référence (et leurs modifications en attente)
+            rechargees = {
+                field.attname for field in self._meta.concrete_fields
+                if field.name in fields or field.attname in fields
+            }
+            valeurs = {
+                **getattr(self, '_valeurs_chargees', {}),
+                **{attname: valeur for attname, valeur in valeurs.items() if attname in rechargees},
+            }
+        self._valeurs_chargees = valeurs
+
+    def champs_modifies(self):
+        """Noms des champs modifiés depuis le chargement (ou le dernier save)"""
+        chargees = getattr(self, '_valeurs_chargees', {})
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname in self.__dict__ and not field.primary_key
+            and (field.attname not in chargees or chargees[field.attname] != self.__dict__[field.attname])
+        ]
+
+    def save(self, *, update_fields=None, **kwargs):
+        if (update_fields is None and not self._state.adding and not kwargs.get('force_insert')
+                and hasattr(self, '_valeurs_chargees')):
+            update_fields = self.champs_modifies()
+            if not update_fields:
+                return
+            update_fields += [
+                field.name for field in self._meta.concrete_fields
+                if getattr(field, 'auto_now', False) and field.name not in update_fields
+            ]
+        super().save(update_fields=update_fields, **kwargs)
+        self._valeurs_chargees = self._valeurs_courantes()
+
 
 class Entreprise(models.Model):
     """
@@ -23,23 +90,55 @@ class Entreprise(models.Model):
         default=False,
         verbose_name="Archivé"
     )
+    date_archivage = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Point de départ du transfert vers les archives (commande cold_storage)"
+    )
 
     class Meta:
         verbose_name = "Entreprise"
         verbose_name_plural = "Entreprises"
-        ordering = ['-date_modification']
+        ordering = ['-date_modification', '-siren']
+        # Un index par tri du dashboard (cf. views.DASHBOARD_SORTS) et par
+        # statut d'archivage, que filtrent le dashboard et l'export. Index
+        # partiels : Django écrit le filtre booléen « WHERE NOT is_archived »,
+        # qu'un index composite (is_archived, ...) ne sert pas sous SQLite, et
+        # chaque ligne n'alimente que les index de son statut. Le SIREN en
+        # dernière colonne départage les ex-aequo ; le tri par SIREN et les
+        # recherches par SIREN utilisent la clé primaire.
+        # MySQL ne gère pas les index partiels (ignorés, avertissement W037) :
+        # il y écrit « is_archived = false » et utilise les index composites
+        # (is_archived, ..., siren) en fin de liste.
         indexes = [
-            models.Index(fields=['siren']),
-            models.Index(fields=['nom_entreprise']),
+            models.Index(fields=['date_modification', 'siren'], condition=models.Q(is_archived=False),
+                         name='ent_actives_modif_idx'),
+            models.Index(fields=['date_creation', 'siren'], condition=models.Q(is_archived=False),
+                         name='ent_actives_creation_idx'),
+            models.Index(fields=['nom_entreprise', 'siren'], condition=models.Q(is_archived=False),
+                         name='ent_actives_nom_idx'),
+            models.Index(fields=['date_modification', 'siren'], condition=models.Q(is_archived=True),
+                         name='ent_archivees_modif_idx'),
+            models.Index(fields=['date_creation', 'siren'], condition=models.Q(is_archived=True),
+                         name='ent_archivees_creation_idx'),
+            models.Index(fields=['nom_entreprise', 'siren'], condition=models.Q(is_archived=True),
+                         name='ent_archivees_nom_idx'),
+            models.Index(fields=['is_archived', 'date_modification', 'siren'], name='ent_statut_modif_idx'),
+            models.Index(fields=['is_archived', 'date_creation', 'siren'], name='ent_statut_creation_idx'),
+            models.Index(fields=['is_archived', 'nom_entreprise', 'siren'], name='ent_statut_nom_idx'),
         ]
 
     def __str__(self):
         return f"{self.nom_entreprise} ({self.siren})"
 
 
-class QuestionnaireClient(models.Model):
+class QuestionnaireClient(SuiviModificationsMixin, models.Model):
     """Questionnaire rempli par les clients"""
 
+    # Choix uniques stockés en entiers (CompactChoiceField) : l'ordre des
+    # CHOIX_* fixe les valeurs stockées, ajouter les nouveaux choix en fin de liste
+
     # Relation
     entreprise = models.OneToOneField(
         'Entreprise',
@@ -60,8 +159,7 @@ class QuestionnaireClient(models.Model):
         ('no', 'Non'),
         ('dont_know', 'Je ne sais pas'),
     ]
-    factures_format_electronique = models.CharField(
-        max_length=20,
+    factures_format_electronique = CompactChoiceField(
         choices=CHOIX_OUI_NON_NSP,
         blank=True
     )
@@ -76,23 +174,20 @@ class QuestionnaireClient(models.Model):
         ('no', 'Non'),
         ('not_applicable', 'Non applicable'),
     ]
-    caisse_enregistreuse = models.CharField(
-        max_length=20,
+    caisse_enregistreuse = CompactChoiceField(
         choices=CHOIX_CAISSE,
         blank=True
     )
     caisse_enregistreuse_nom = models.CharField(max_length=255, blank=True)
 
     # 1.5 Certification caisse
-    caisse_certifiee = models.CharField(
-        max_length=20,
+    caisse_certifiee = CompactChoiceField(
         choices=CHOIX_OUI_NON_NSP,
         blank=True
     )
 
     # 1.6 Plateforme agréée
-    plateforme_agreee = models.CharField(
-        max_length=20,
+    plateforme_agreee = CompactChoiceField(
         choices=CHOIX_OUI_NON_NSP,
         blank=True
     )
@@ -105,8 +200,7 @@ class QuestionnaireClient(models.Model):
         ('delegate', 'Déléguer au cabinet'),
         ('dont_know', 'Je ne sais pas, besoin de conseils'),
     ]
-    gestion_future = models.CharField(
-        max_length=20,
+    gestion_future = CompactChoiceField(
         choices=CHOIX_GESTION,
         blank=True
     )
@@ -116,8 +210,7 @@ class QuestionnaireClient(models.Model):
         ('medium', 'Moyen'),
         ('not_comfortable', 'Pas du tout à l\'aise'),
     ]
-    aisance_outils = models.CharField(
-        max_length=20,
+    aisance_outils = CompactChoiceField(
         choices=CHOIX_AISANCE,
         blank=True
     )
@@ -131,15 +224,13 @@ class QuestionnaireClient(models.Model):
         ('platform', 'Via plateforme dématérialisée'),
         ('other', 'Autre'),
     ]
-    reception_factures_achats = models.CharField(
-        max_length=20,
+    reception_factures_achats = CompactChoiceField(
         choices=CHOIX_RECEPTION_ACHATS,
         blank=True
     )
     reception_achats_autre = models.CharField(max_length=255, blank=True)
 
-    envoi_factures_ventes = models.CharField(
-        max_length=20,
+    envoi_factures_ventes = CompactChoiceField(
         choices=CHOIX_RECEPTION_ACHATS,  # Mêmes choix
         blank=True
     )
@@ -151,20 +242,28 @@ class QuestionnaireClient(models.Model):
         ('mixed', 'Mix papier + électronique'),
         ('accounting_firm', 'Confié au cabinet comptable'),
     ]
-    conservation_factures = models.CharField(
-        max_length=20,
+    conservation_factures = CompactChoiceField(
         choices=CHOIX_CONSERVATION,
         blank=True
     )
 
-    # Accompagnement (CHOIX MULTIPLES → JSONField)
-    accompagnement_souhaite = models.JSONField(
-        default=list,
+    # Accompagnement (CHOIX MULTIPLES → masque de bits, un bit par choix)
+    # L'ordre fixe la valeur des bits : ajouter les nouveaux choix en fin de liste
+    CHOIX_ACCOMPAGNEMENT = [
+        ('information', 'Information et sensibilisation sur la réforme'),
+        ('conseil', 'Conseil sur le choix des outils'),
+        ('formation', 'Formation à l\'utilisation des outils'),
+        ('parametrage', 'Paramétrage et mise en place des solutions'),
+        ('gestion_complete', 'Gestion complète de la facturation électronique'),
+        ('support', 'Support et assistance régulière'),
+        ('aucun', 'Aucun accompagnement nécessaire'),
+        ('autre', 'Autre'),
+    ]
+    accompagnement_souhaite = BitmaskListField(
+        codes=CHOIX_ACCOMPAGNEMENT,
         blank=True,
         help_text="Liste des types d'accompagnement"
     )
-    # Choix possibles: information, conseil, formation, parametrage,
-    # gestion_complete, support, aucun, autre
 
     accompagnement_autre = models.CharField(max_length=255, blank=True)
 
@@ -190,14 +289,22 @@ class QuestionnaireClient(models.Model):
     class Meta:
         verbose_name = "Questionnaire Client"
         verbose_name_plural = "Questionnaires Clients"
+        indexes = [
+            # Index couvrant : « qui souhaite X » et les comptages par choix
+            # (accompagnement_souhaite__has, count_by_code) le parcourent sans
+            # lire la table
+            models.Index(fields=['accompagnement_souhaite'], name='qc_accompagnement_idx'),
+        ]
 
     def __str__(self):
         return f"Q. Client - {self.entreprise.nom_entreprise}"
 
 
-class QuestionnaireCollaborateur(models.Model):
+class QuestionnaireCollaborateur(SuiviModificationsMixin, models.Model):
     """Questionnaire rempli par les collaborateurs"""
 
+    # Choix uniques stockés en entiers (CompactChoiceField), cf. QuestionnaireClient
+
     # Relation
     entreprise = models.OneToOneField(
         'Entreprise',
@@ -213,8 +320,7 @@ class QuestionnaireCollaborateur(models.Model):
         ('no', 'Non'),
         ('unsure', 'J\'ai un doute'),
     ]
-    assujettie_tva = models.CharField(
-        max_length=20,
+    assujettie_tva = CompactChoiceField(
         choices=CHOIX_TVA,
         blank=True
     )
@@ -227,8 +333,7 @@ class QuestionnaireCollaborateur(models.Model):
         ('mid_sized', 'ETI'),
         ('large', 'Grande entreprise'),
     ]
-    taille_entreprise = models.CharField(
-        max_length=20,
+    taille_entreprise = CompactChoiceField(
         choices=CHOIX_TAILLE,
         blank=True
     )
@@ -239,8 +344,7 @@ class QuestionnaireCollaborateur(models.Model):
         ('quarterly_real', 'Réel trimestriel'),
         ('monthly_real', 'Réel mensuel'),
     ]
-    regime_tva = models.CharField(
-        max_length=20,
+    regime_tva = CompactChoiceField(
         choices=CHOIX_REGIME_TVA,
         blank=True
     )
@@ -254,8 +358,7 @@ class QuestionnaireCollaborateur(models.Model):
         ('insurance', 'Opérations d\'assurance'),
         ('mixed', 'Activité mixte ou n\'exerce pas dans ces secteurs'),
     ]
-    activite_exoneree_tva = models.CharField(
-        max_length=20,
+    activite_exoneree_tva = CompactChoiceField(
         choices=CHOIX_ACTIVITE_EXONEREE,
         blank=True
     )
@@ -273,8 +376,7 @@ class QuestionnaireCollaborateur(models.Model):
         ('more_than_5000', 'Plus de 5000'),
         ('not_applicable', 'N/A'),
     ]
-    nb_factures_ventes = models.CharField(
-        max_length=20,
+    nb_factures_ventes = CompactChoiceField(
         choices=CHOIX_NOMBRE,
         blank=True
     )
@@ -286,8 +388,7 @@ class QuestionnaireCollaborateur(models.Model):
         ('more_than_200', 'Plus de 200'),
         ('not_applicable', 'N/A'),
     ]
-    nb_clients_actifs = models.CharField(
-        max_length=20,
+    nb_clients_actifs = CompactChoiceField(
         choices=CHOIX_CLIENTS,
         blank=True
     )
@@ -300,13 +401,11 @@ class QuestionnaireCollaborateur(models.Model):
 
     # === FLUX FACTURATION - ACHATS ===
 
-    nb_factures_achats = models.CharField(
-        max_length=20,
+    nb_factures_achats = CompactChoiceField(
         choices=CHOIX_NOMBRE,
         blank=True
     )
-    nb_fournisseurs_actifs = models.CharField(
-        max_length=20,
+    nb_fournisseurs_actifs = CompactChoiceField(
         choices=CHOIX_CLIENTS,
         blank=True
     )
@@ -339,3 +438,109 @@ class QuestionnaireCollaborateur(models.Model):
 
     def __str__(self):
         return f"Q. Collab - {self.entreprise.nom_entreprise}"
+
+
+class ProfilRequete(models.Model):
+    """
+    Profil d'exécution d'une requête, déclenché à la demande par un membre
+    du staff (cf. questionnaires.middleware.ProfilingMiddleware)
+    """
+    date = models.DateTimeField(auto_now_add=True)
+    utilisateur = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='profils_requetes'
+    )
+    methode = models.CharField(max_length=10)
+    chemin = models.CharField(max_length=500)
+    vue = models.CharField(max_length=200, blank=True)
+    statut = models.PositiveSmallIntegerField()
+    duree_ms = models.FloatField(verbose_name="Durée totale (ms)")
+    nb_requetes_sql = models.PositiveIntegerField(verbose_name="Requêtes SQL")
+    duree_sql_ms = models.FloatField(verbose_name="Durée SQL (ms)")
+    requetes_sql = models.JSONField(
+        default=list,
+        help_text="Liste des requêtes : sql, duree_ms, site"
+    )
+    resume = models.TextField(blank=True, help_text="Fonctions triées par temps cumulé")
+    donnees = models.BinaryField(help_text="Statistiques cProfile (format .prof)")
+
+    class Meta:
+        verbose_name = "Profil de requête"
+        verbose_name_plural = "Profils de requêtes"
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.methode} {self.chemin} ({self.duree_ms:.0f} ms)"
+
+
+class EntrepriseArchivee(models.Model):
+    """
+    Entreprise archivée depuis longtemps, retirée des tables courantes avec
+    ses questionnaires (cf. questionnaires.archivage et commande cold_storage).
+
+    Les lignes d'origine sont conservées sérialisées (JSON compressé zlib)
+    et peuvent être restaurées à l'identique.
+    """
+    siren = models.CharField(max_length=9, primary_key=True, verbose_name="SIREN")
+    nom_entreprise = models.CharField(max_length=255, verbose_name="Nom entreprise")
+    date_archivage = models.DateTimeField()
+    date_transfert = models.DateTimeField(auto_now_add=True, verbose_name="Transférée le")
+    questionnaire_client = models.BooleanField(default=False)
+    questionnaire_collaborateur = models.BooleanField(default=False)
+    donnees = models.BinaryField(help_text="Entreprise et questionnaires (JSON compressé zlib)")
+
+    class Meta:
+        verbose_name = "Entreprise archivée"
+        verbose_name_plural = "Entreprises archivées"
+        ordering = ['-date_transfert', 'siren']
+
+    def __str__(self):
+        return f"{self.nom_entreprise} ({self.siren})"
+
+
+class Brouillon(models.Model):
+    """
+    Brouillon d'un questionnaire en cours de saisie, enregistré côté serveur
+    (cf. questionnaires.brouillons) : repris sur n'importe quel appareil,
+    complété par différences champ par champ, promu à la soumission.
+    """
+    TYPE_CLIENT = 'client'
+    TYPE_COLLABORATEUR = 'collaborateur'
+    CHOIX_TYPE = [
+        (TYPE_CLIENT, 'Questionnaire client'),
+        (TYPE_COLLABORATEUR, 'Questionnaire collaborateur'),
+    ]
+
+    entreprise = models.ForeignKey(
+        'Entreprise',
+        on_delete=models.CASCADE,
+        related_name='brouillons'
+    )
+    type_questionnaire = models.CharField(max_length=20, choices=CHOIX_TYPE)
+    donnees = models.JSONField(
+        default=dict,
+        help_text="Valeurs saisies, au format du formulaire : champ -> valeur ou liste de valeurs"
+    )
+    version = models.PositiveIntegerField(default=0)
+    auteur = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='brouillons'
+    )
+    date_modification = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Brouillon"
+        verbose_name_plural = "Brouillons"
+        ordering = ['-date_modification']
+        constraints = [
+            models.UniqueConstraint(fields=['entreprise', 'type_questionnaire'], name='brouillon_unique'),
+        ]
+
+    def __str__(self):
+        return f"Brouillon {self.type_questionnaire} - {self.entreprise_id} (v{self.version})"
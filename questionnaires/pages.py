@@ -0,0 +1,79 @@
+"""
+Cache des pages informatives pour les visiteurs anonymes (accueil, mentions
+légales, introduction et récapitulatif du parcours client).
+
+Ces pages affichent le même HTML à tous les visiteurs anonymes : le rendu
+est gardé en cache (par langue et par chemin) et servi sans passer par les
+templates. Il porte un ETag (empreinte du contenu) : le navigateur revalide
+à chaque visite (Cache-Control: no-cache) et reçoit un 304 sans contenu
+tant que la page n'a pas changé.
+
+Restent rendues normalement, sans cache :
+- les requêtes des collaborateurs connectés (en-tête avec leur nom et le
+  formulaire de déconnexion) ;
+- les requêtes avec des messages en attente (« Questionnaire enregistré ») ;
+- les rendus qui utilisent le jeton CSRF (cookie propre au visiteur).
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.translation import get_language
+
+from . import metrics
+from .instrumentation import timed_phase
+
+
+def _cle(request):
+    return f'page_{get_language()}_{request.path}'
+
+
+def _cacheable(request):
+    # len() ne consomme pas les messages : ils restent affichés par la page
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not len(messages.get_messages(request))
+    )
+
+
+def page_anonyme(vue):
+    """
+    Décorateur de vue : page servie depuis le cache pour les visiteurs
+    anonymes, avec ETag et réponse 304 si le navigateur a la version courante.
+    """
+    @wraps(vue)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable(request):
+            return vue(request, *args, **kwargs)
+
+        cle = _cle(request)
+        with timed_phase('cache'):
+            page = cache.get(cle)
+        if page is None:
+            metrics.inc('etac_cache_lookups_total', {'cache': 'pages', 'result': 'miss'})
+            response = vue(request, *args, **kwargs)
+            # Jeton CSRF utilisé pendant le rendu : contenu propre au visiteur
+            if response.status_code != 200 or request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+                return response
+            page = {
+                'contenu': response.content,
+                'content_type': response['Content-Type'],
+                'etag': f'"{hashlib.md5(response.content, usedforsecurity=False).hexdigest()}"',
+            }
+            cache.set(cle, page, getattr(settings, 'PAGE_CACHE_TIMEOUT', 3600))
+        else:
+            metrics.inc('etac_cache_lookups_total', {'cache': 'pages', 'result': 'hit'})
+
+        response = get_conditional_response(request, etag=page['etag'])
+        if response is None:
+            response = HttpResponse(page['contenu'], content_type=page['content_type'])
+        response['ETag'] = page['etag']
+        # Revalidation à chaque visite : la page diffère une fois connecté
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
@@ -0,0 +1,76 @@
+"""
+Purge des sessions expirées et des anciens enregistrements d'axes.
+
+clearsessions supprime toutes les sessions expirées en une seule requête,
+qui verrouille django_session le temps de l'opération. Ici chaque table est
+parcourue dans l'ordre de sa clé primaire, par lots : une transaction courte
+par lot, une pause entre deux lots pour laisser passer le trafic. La purge
+peut donc tourner en journée, et être interrompue puis relancée.
+
+Les lots sont sélectionnés à partir de la dernière clé traitée (pk > dernière)
+et non par OFFSET : chaque lot reprend le parcours de l'index là où le
+précédent l'a laissé.
+
+Utilisé par la commande purge.
+"""
+import time
+from datetime import timedelta
+
+from axes.models import AccessAttempt, AccessFailureLog, AccessLog
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.utils import timezone
+
+# Lignes supprimées par transaction
+TAILLE_LOT = 1000
+
+# Pause entre deux lots, en secondes
+PAUSE = 0.1
+
+
+def cibles(jours):
+    """
+    Lignes à purger, par table : sessions expirées et enregistrements
+    d'axes (tentatives, connexions, échecs) de plus de `jours` jours.
+
+    Returns:
+        dict: nom de la table -> queryset
+    """
+    limite = timezone.now() - timedelta(days=jours)
+    return {
+        modele._meta.db_table: queryset
+        for modele, queryset in (
+            (Session, Session.objects.filter(expire_date__lt=timezone.now())),
+            (AccessAttempt, AccessAttempt.objects.filter(attempt_time__lt=limite)),
+            (AccessLog, AccessLog.objects.filter(attempt_time__lt=limite)),
+            (AccessFailureLog, AccessFailureLog.objects.filter(attempt_time__lt=limite)),
+        )
+    }
+
+
+def purger(queryset, taille_lot=TAILLE_LOT, pause=PAUSE):
+    """
+    Supprime les lignes d'un queryset par lots, dans l'ordre de la clé
+    primaire, une transaction par lot.
+
+    Returns:
+        int: nombre de lignes supprimées
+    """
+    total = 0
+    derniere = None
+    while True:
+        lot = queryset.order_by('pk')
+        if derniere is not None:
+            lot = lot.filter(pk__gt=derniere)
+        with transaction.atomic():
+            cles = list(lot.values_list('pk', flat=True)[:taille_lot])
+            if not cles:
+                return total
+            # Condition réappliquée : une session prolongée depuis la
+            # sélection du lot n'est pas supprimée
+            total += queryset.filter(pk__in=cles).delete()[0]
+        derniere = cles[-1]
+        if len(cles) < taille_lot:
+            return total
+        if pause:
+            time.sleep(pause)
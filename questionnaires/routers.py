@@ -0,0 +1,74 @@
+"""
+Routage des lectures vers le réplica en lecture seule.
+
+Le réplica (alias REPLICA_DATABASE, absent par défaut) ne reçoit que les
+lectures explicitement autorisées : celles exécutées dans un bloc
+replica_reads(), ouvert par ReplicaRoutingMiddleware pour les vues de
+consultation (dashboard, export, fiche entreprise, listes de l'admin).
+Tout le reste - écritures, sessions, authentification, commandes de gestion -
+reste sur la base principale.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Lectures autorisées sur le réplica dans le contexte courant
+_lectures_replica = contextvars.ContextVar('etac_lectures_replica', default=False)
+
+
+def replica_alias():
+    """Alias du réplica s'il est configuré, sinon None"""
+    alias = getattr(settings, 'REPLICA_DATABASE', None)
+    if alias and alias in connections.settings:
+        return alias
+    return None
+
+
+@contextmanager
+def replica_reads(actif=True):
+    """
+    Autorise (ou interdit, avec actif=False) les lectures sur le réplica
+    pour le bloc.
+
+    Usage:
+        with replica_reads():
+            Entreprise.objects.count()  # exécuté sur le réplica
+    """
+    token = _lectures_replica.set(actif)
+    try:
+        yield
+    finally:
+        _lectures_replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Envoie les lectures des applications REPLICA_APPS vers le réplica dans
+    un bloc replica_reads(), tout le reste vers la base principale.
+
+    Les relations d'une instance déjà chargée (accès aux clés étrangères,
+    prefetch) sont lues sur la base de l'instance.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if not _lectures_replica.get():
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label not in getattr(settings, 'REPLICA_APPS', ()):
+            return DEFAULT_DB_ALIAS
+        return replica_alias() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Le réplica est une copie de la base principale
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Le schéma du réplica est répliqué, jamais migré directement
+        return db != replica_alias()
@@ -0,0 +1,96 @@
+"""
+Moteur de sessions hybride (SESSION_ENGINE = 'questionnaires.sessions').
+
+- Sessions anonymes (parcours client : SIREN et nom de l'entreprise) :
+  cookie signé, aucune écriture dans django_session.
+- Sessions authentifiées (collaborateurs) : en base, révocables côté
+  serveur (déconnexion, désactivation du compte). Le cache de
+  SESSION_CACHE_ALIAS n'est utilisé (cached_db) que s'il est partagé entre
+  les processus (Redis, Memcached) : avec un cache mémoire local, un autre
+  worker continuerait de servir une session supprimée (déconnexion).
+
+Une session passe en base dès qu'un utilisateur s'y connecte et revient en
+cookie signé après la déconnexion. Les clés en base sont aléatoires
+([a-z0-9], 32 caractères) ; un cookie signé contient toujours ':'.
+
+Expiration glissante sans SESSION_SAVE_EVERY_REQUEST : une session lue est
+réenregistrée (expiration repoussée de SESSION_COOKIE_AGE) seulement si son
+dernier enregistrement date de plus de SESSION_REFRESH_THRESHOLD secondes.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends import cached_db
+from django.core import signing
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+SALT = 'questionnaires.sessions'
+
+# Horodatage du dernier enregistrement, dans les données de la session
+CLE_ENREGISTREMENT = '_session_saved_at'
+
+
+def est_signee(session_key):
+    """La clé est un cookie signé (session anonyme) et non une clé en base"""
+    return bool(session_key) and ':' in session_key
+
+
+class SessionStore(cached_db.SessionStore):
+    """Cookie signé pour les sessions anonymes, en base une fois connecté"""
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        if isinstance(self._cache, LocMemCache):
+            # Cache propre au processus : lectures et écritures en base seulement
+            self._cache = DummyCache('sessions', {})
+
+    def _authentifiee(self):
+        return SESSION_KEY in self._session
+
+    def load(self):
+        if est_signee(self.session_key):
+            try:
+                donnees = signing.loads(
+                    self.session_key, serializer=self.serializer,
+                    max_age=self.get_session_cookie_age(), salt=SALT,
+                )
+            except Exception:
+                # Signature invalide ou cookie expiré : nouvelle session
+                self._session_key = None
+                return {}
+        else:
+            donnees = super().load()
+        seuil = getattr(settings, 'SESSION_REFRESH_THRESHOLD', 0)
+        if donnees and time.time() - donnees.get(CLE_ENREGISTREMENT, 0) >= seuil:
+            self.modified = True
+        return donnees
+
+    def create(self):
+        if self._authentifiee():
+            return super().create()
+        # La clé signée est calculée à l'enregistrement
+        self._session_key = None
+        self.modified = True
+
+    def save(self, must_create=False):
+        self._session[CLE_ENREGISTREMENT] = int(time.time())
+        if self._authentifiee():
+            if est_signee(self.session_key):
+                # Connexion : passage en base sous une nouvelle clé
+                self._session_key = None
+            return super().save(must_create)
+        if self.session_key and not est_signee(self.session_key):
+            # Session anonyme encore en base (antérieure au moteur hybride)
+            super().delete(self.session_key)
+        self._session_key = signing.dumps(
+            self._session, compress=True, salt=SALT, serializer=self.serializer,
+        )
+        self.modified = True
+
+    def delete(self, session_key=None):
+        # Rien à supprimer côté serveur pour un cookie signé
+        if est_signee(session_key or self.session_key):
+            return
+        super().delete(session_key)
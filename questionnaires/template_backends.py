@@ -0,0 +1,32 @@
+from django.template.backends.django import DjangoTemplates
+
+from .instrumentation import timed_phase
+
+
+class TimedTemplate:
+    """Enveloppe d'un template qui impute son rendu à la phase 'template'"""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with timed_phase('template'):
+            return self.template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Moteur Django standard dont les rendus sont chronométrés (Server-Timing).
+
+    Le temps mesuré inclut les requêtes SQL exécutées paresseusement pendant
+    le rendu (querysets évalués dans le template).
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
@@ -0,0 +1,64 @@
+"""
+Outils de test réutilisables.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .instrumentation import is_savepoint, record_queries
+
+
+class QueryBudgetMixin:
+    """
+    Mixin TestCase ajoutant assertQueryBudget.
+
+    Usage:
+        class MesTests(QueryBudgetMixin, TestCase):
+            def test_dashboard(self):
+                with self.assertQueryBudget(8, 'dashboard'):
+                    self.client.get(reverse('dashboard'))
+
+    Les savepoints (atomic imbriqués des tests) ne sont pas comptés : le
+    budget reflète les requêtes exécutées en production.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, label=''):
+        with record_queries() as requetes:
+            yield requetes
+        # Filtrer en place pour que l'appelant récupère la liste comptée
+        requetes[:] = [r for r in requetes if not is_savepoint(r['sql'])]
+        if len(requetes) > budget:
+            self.fail(format_query_report(
+                requetes, f'Budget dépassé{f" pour {label}" if label else ""} : '
+                          f'{len(requetes)} requêtes pour un budget de {budget}'
+            ))
+
+
+def update_session(client, **valeurs):
+    """
+    Ajoute des valeurs à la session d'un client de test.
+
+    Avec le moteur hybride (questionnaires.sessions), la clé d'une session
+    anonyme est son contenu signé : elle change à chaque enregistrement et
+    le cookie du client doit suivre, ce que client.session ne fait pas.
+    """
+    session = client.session
+    session.update(valeurs)
+    session.save()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+    return session
+
+
+def format_query_report(requetes, titre):
+    """Formate une liste de requêtes regroupées par site d'appel"""
+    par_site = defaultdict(list)
+    for requete in requetes:
+        par_site[requete['site']].append(requete['sql'])
+
+    lignes = [titre]
+    for site, sqls in sorted(par_site.items(), key=lambda item: -len(item[1])):
+        lignes.append(f'  {site} ({len(sqls)} requête{"s" if len(sqls) > 1 else ""}) :')
+        lignes.extend(f'    {sql}' for sql in sqls)
+    return '\n'.join(lignes)
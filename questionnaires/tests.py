@@ -1,8 +1,45 @@
-from django.test import TestCase, Client
+import csv
+import json
+import marshal
+import os
+import tempfile
+import time
+from datetime import timedelta
+from functools import partial
+from io import StringIO
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.db import connection, connections
+from django.db.models import Count, IntegerField
+from django.db.models.functions import Cast
+from django.http import HttpResponse, QueryDict, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, Client, override_settings
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from axes.models import AccessAttempt, AccessLog
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.urls import reverse
-from .models import Entreprise, QuestionnaireClient, QuestionnaireCollaborateur
-from .utils import get_company_info
+from django.utils import timezone
+from . import importation, metrics, urls as questionnaire_urls, validation
+from .benchmarks import compare_to_baseline, run_benchmarks
+from .enregistrement import enregistrer_questionnaire
+from .fields import count_by_code
+from .forms import QuestionnaireCollaborateurForm
+from .models import Brouillon, Entreprise, EntrepriseArchivee, QuestionnaireClient, QuestionnaireCollaborateur, ProfilRequete
+from .testing import QueryBudgetMixin, update_session
+from .importation import import_csv
+from .instrumentation import is_savepoint, record_queries
+from .purge import purger
+from .middleware import ReplicaRoutingMiddleware
+from .routers import ReplicaRouter, replica_reads
+from .utils import get_company_info, is_luhn_valid
+from .views import DASHBOARD_SORTS, _filter_entreprises, _get_csv_headers, _order_entreprises
 
 User = get_user_model()
 
@@ -22,6 +59,48 @@ class HomePageTests(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+class PageAnonymeTests(TestCase):
+    """Tests pour le cache des pages informatives anonymes"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_second_visit_served_from_cache(self):
+        """La page est rendue une fois puis servie depuis le cache, avec un ETag"""
+        premiere = self.client.get(reverse('home'))
+        self.assertTemplateUsed(premiere, 'questionnaires/home.html')
+        seconde = self.client.get(reverse('home'))
+        self.assertEqual(seconde.templates, [])
+        self.assertEqual(seconde.content, premiere.content)
+        self.assertEqual(seconde['ETag'], premiere['ETag'])
+        self.assertIn('no-cache', seconde['Cache-Control'])
+
+    def test_repeat_visit_gets_304(self):
+        """Un navigateur qui a la version courante reçoit un 304 sans contenu"""
+        etag = self.client.get(reverse('mentions_legales'))['ETag']
+        response = self.client.get(reverse('mentions_legales'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_authenticated_and_messages_bypass_cache(self):
+        """Collaborateurs connectés et messages en attente : rendu normal"""
+        self.client.get(reverse('client_recapitulatif'))
+        with patch('questionnaires.views.get_company_info', return_value={
+            'success': True, 'nom': 'Test SARL', 'siren': '123456789', 'error': None,
+        }):
+            self.client.post(reverse('client_identification'), {'siren': '123456789'})
+        self.client.post(reverse('client_questionnaire'), {
+            'factures_format_electronique': 'yes', 'gestion_future': 'internal', 'aisance_outils': 'medium',
+        })
+        self.assertContains(self.client.get(reverse('client_recapitulatif')), 'Questionnaire enregistré avec succès')
+
+        user = User.objects.create_user(email='[email protected]', username='collab', password='testpass123')
+        self.client.force_login(user)
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Déconnexion')
+        self.assertFalse(response.has_header('ETag'))
+
+
 class SirenValidationTests(TestCase):
     """Tests pour la validation du format SIREN"""
 
@@ -105,6 +184,35 @@ class QuestionnaireClientTests(TestCase):
                 gestion_future='delegate'
             )
 
+    def test_accompagnement_bitmask(self):
+        """L'accompagnement reste une liste en Python, stockée et filtrée en masque de bits"""
+        QuestionnaireClient.objects.create(
+            entreprise=self.entreprise, accompagnement_souhaite=['formation', 'information']
+        )
+        autre = Entreprise.objects.create(siren='987654321', nom_entreprise='Autre')
+        QuestionnaireClient.objects.create(entreprise=autre, accompagnement_souhaite=['support'])
+
+        questionnaire = QuestionnaireClient.objects.get(entreprise=self.entreprise)
+        self.assertEqual(questionnaire.accompagnement_souhaite, ['information', 'formation'])
+        brut = QuestionnaireClient.objects.filter(pk=questionnaire.pk).values_list(
+            Cast('accompagnement_souhaite', IntegerField()), flat=True
+        )
+        self.assertEqual(brut.get(), 0b101)
+
+        formation = QuestionnaireClient.objects.filter(accompagnement_souhaite__has='formation')
+        self.assertEqual([q.pk for q in formation], ['123456789'])
+        with self.assertNumQueries(1):
+            comptages = count_by_code(QuestionnaireClient.objects.all(), 'accompagnement_souhaite')
+        self.assertEqual((comptages['formation'], comptages['support'], comptages['aucun']), (1, 1, 0))
+
+    @skipUnless(connection.vendor == 'sqlite', "Plan d'exécution vérifié sous SQLite")
+    def test_accompagnement_count_uses_index(self):
+        """Le comptage « qui souhaite X » parcourt l'index, pas la table"""
+        plan = QuestionnaireClient.objects.filter(
+            accompagnement_souhaite__has='formation'
+        ).values('accompagnement_souhaite').explain()
+        self.assertIn('COVERING INDEX qc_accompagnement_idx', plan)
+
 
 class QuestionnaireCollaborateurTests(TestCase):
     """Tests pour le questionnaire collaborateur"""
@@ -133,6 +241,250 @@ class QuestionnaireCollaborateurTests(TestCase):
         self.assertEqual(questionnaire.assujettie_tva, 'yes')
         self.assertEqual(questionnaire.collaborateur, self.user)
 
+    def test_choices_stored_as_integers(self):
+        """Les choix restent des codes en Python, stockés en entiers (0 = vide)"""
+        QuestionnaireCollaborateur.objects.create(
+            entreprise=self.entreprise, collaborateur=self.user, taille_entreprise='large'
+        )
+        brut = QuestionnaireCollaborateur.objects.values_list(
+            Cast('taille_entreprise', IntegerField()), Cast('regime_tva', IntegerField())
+        )
+        self.assertEqual(brut.get(), (3, 0))
+
+        questionnaire = QuestionnaireCollaborateur.objects.get(taille_entreprise='large')
+        self.assertEqual((questionnaire.taille_entreprise, questionnaire.regime_tva), ('large', ''))
+        self.assertEqual(questionnaire.get_taille_entreprise_display(), 'Grande entreprise')
+        repartition = QuestionnaireCollaborateur.objects.values('taille_entreprise').annotate(
+            nombre=Count('pk')
+        )
+        self.assertEqual(list(repartition), [{'taille_entreprise': 'large', 'nombre': 1}])
+        with self.assertRaises(ValueError):
+            QuestionnaireCollaborateur.objects.filter(taille_entreprise='huge').exists()
+
+
+class SuiviModificationsTests(TestCase):
+    """Tests pour l'écriture des seuls champs modifiés (SuiviModificationsMixin)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='collab@etac.fr',
+            username='collab',
+            password='testpass123',
+            is_collaborateur=True
+        )
+        self.entreprise = Entreprise.objects.create(siren='123456789', nom_entreprise='Test SARL')
+        QuestionnaireCollaborateur.objects.create(
+            entreprise=self.entreprise, collaborateur=self.user,
+            assujettie_tva='yes', taille_entreprise='small_medium',
+        )
+
+    def _ecritures(self, fonction):
+        with record_queries() as requetes:
+            fonction()
+        return [r['sql'] for r in requetes if r['sql'].startswith('UPDATE')]
+
+    def test_save_writes_only_changed_fields(self):
+        """save() n'écrit que les colonnes modifiées et date_modification, rien sans modification"""
+        questionnaire = QuestionnaireCollaborateur.objects.get(pk='123456789')
+        self.assertEqual(self._ecritures(questionnaire.save), [])
+
+        questionnaire.regime_tva = 'franchise'
+        self.assertEqual(questionnaire.champs_modifies(), ['regime_tva'])
+        ecritures = self._ecritures(questionnaire.save)
+        self.assertEqual(len(ecritures), 1)
+        self.assertIn('"regime_tva"', ecritures[0])
+        self.assertIn('"date_modification"', ecritures[0])
+        self.assertNotIn('"taille_entreprise"', ecritures[0])
+        self.assertEqual(questionnaire.champs_modifies(), [])
+        self.assertEqual(QuestionnaireCollaborateur.objects.get().regime_tva, 'franchise')
+
+    def test_deferred_field_load_keeps_pending_changes(self):
+        """Le chargement d'un champ différé ne fait pas oublier les modifications en attente"""
+        QuestionnaireCollaborateur.objects.update(commentaires='avant')
+        questionnaire = QuestionnaireCollaborateur.objects.only('commentaires').get(pk='123456789')
+        questionnaire.commentaires = 'apres'
+        self.assertEqual(questionnaire.code_ape, '')
+        self.assertEqual(questionnaire.champs_modifies(), ['commentaires'])
+        questionnaire.save()
+        self.assertEqual(QuestionnaireCollaborateur.objects.get().commentaires, 'apres')
+
+    def test_edit_without_changes_skips_update(self):
+        """Une édition qui ne change aucune réponse n'écrit pas le questionnaire"""
+        client = Client()
+        client.force_login(self.user)
+        date_modification = QuestionnaireCollaborateur.objects.get().date_modification
+        donnees = {'form_type': 'collaborateur', 'assujettie_tva': 'yes', 'taille_entreprise': 'small_medium'}
+
+        reponses = []
+        ecritures = self._ecritures(lambda: reponses.append(
+            client.post(reverse('editer_entreprise', args=['123456789']), donnees)
+        ))
+        self.assertRedirects(reponses[0], reverse('voir_questionnaire', args=['123456789']))
+        self.assertFalse([sql for sql in ecritures if 'questionnairecollaborateur' in sql])
+        self.assertEqual(QuestionnaireCollaborateur.objects.get().date_modification, date_modification)
+
+
+class EnregistrementQuestionnaireTests(TestCase):
+    """Tests pour l'enregistrement des questionnaires par upsert"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='collab@etac.fr',
+            username='collab',
+            password='testpass123',
+            is_collaborateur=True
+        )
+
+    def _enregistrer(self, donnees, collaborateur):
+        form = QuestionnaireCollaborateurForm(donnees)
+        self.assertTrue(form.is_valid(), form.errors)
+        with record_queries() as requetes:
+            enregistrer_questionnaire(form, '123456789', 'Test SARL', collaborateur=collaborateur)
+        return [r for r in requetes if not is_savepoint(r['sql'])]
+
+    def test_create_then_update_in_two_queries(self):
+        """Création et mise à jour : une requête pour l'entreprise, une pour le questionnaire"""
+        self.assertEqual(len(self._enregistrer({'assujettie_tva': 'yes'}, self.user)), 2)
+        creation = QuestionnaireCollaborateur.objects.get(entreprise='123456789')
+
+        autre = User.objects.create_user(email='autre@etac.fr', username='autre', password='x')
+        self.assertEqual(len(self._enregistrer({'assujettie_tva': 'no', 'code_ape': '62.01Z'}, autre)), 2)
+
+        questionnaire = QuestionnaireCollaborateur.objects.get(entreprise='123456789')
+        self.assertEqual((questionnaire.assujettie_tva, questionnaire.code_ape), ('no', '62.01Z'))
+        self.assertEqual(questionnaire.collaborateur, autre)
+        self.assertEqual(questionnaire.date_completion, creation.date_completion)
+        self.assertGreater(questionnaire.date_modification, creation.date_modification)
+
+    def test_existing_company_is_left_untouched(self):
+        """Une entreprise existante (soumission concurrente) n'est ni dupliquée ni renommée"""
+        Entreprise.objects.create(siren='123456789', nom_entreprise='Nom INSEE')
+        self._enregistrer({'assujettie_tva': 'yes'}, self.user)
+        self.assertEqual(Entreprise.objects.get().nom_entreprise, 'Nom INSEE')
+
+    def test_client_view_saves_in_fewer_queries(self):
+        """La soumission du questionnaire client n'exécute plus de lecture préalable"""
+        update_session(self.client, client_siren='123456789', client_nom_entreprise='Test SARL')
+        donnees = {'factures_format_electronique': 'yes', 'gestion_future': 'internal', 'aisance_outils': 'medium'}
+        for _ in range(2):
+            with record_queries() as requetes:
+                response = self.client.post(reverse('client_questionnaire'), donnees)
+            self.assertRedirects(response, reverse('client_recapitulatif'), fetch_redirect_response=False)
+            # Hors suppression du brouillon (BrouillonTests)
+            metier = [r for r in requetes if 'questionnaires_' in r['sql'] and not is_savepoint(r['sql'])
+                      and 'questionnaires_brouillon' not in r['sql']]
+            self.assertEqual(len(metier), 2)
+        self.assertEqual(QuestionnaireClient.objects.count(), 1)
+
+
+class BrouillonTests(TestCase):
+    """Tests pour les brouillons enregistrés côté serveur (PATCH par différences)"""
+
+    def setUp(self):
+        Entreprise.objects.create(siren='123456789', nom_entreprise='Test SARL')
+        self.client = Client()
+        update_session(self.client, client_siren='123456789', client_nom_entreprise='Test SARL')
+        self.url = reverse('brouillon_questionnaire', args=['client'])
+
+    def _patch(self, version, champs, client=None):
+        return (client or self.client).patch(
+            self.url, json.dumps({'version': version, 'champs': champs}), content_type='application/json'
+        )
+
+    def test_patch_merges_changed_fields(self):
+        """Chaque différence est fusionnée dans le brouillon et incrémente sa version"""
+        reponse = self._patch(0, {'gestion_future': 'internal', 'accompagnement_souhaite': ['conseil']})
+        self.assertEqual(reponse.json(), {'version': 1})
+        reponse = self._patch(1, {'aisance_outils': 'medium', 'accompagnement_souhaite': None})
+        self.assertEqual(reponse.json(), {'version': 2})
+
+        self.assertEqual(self.client.get(self.url).json(), {
+            'version': 2, 'donnees': {'gestion_future': 'internal', 'aisance_outils': 'medium'},
+        })
+
+    def test_patch_for_missing_company_is_404(self):
+        """Un brouillon pour une entreprise absente (archivée à froid) est refusé en 404"""
+        Entreprise.objects.all().delete()
+        reponse = self._patch(0, {'gestion_future': 'internal'})
+        self.assertEqual(reponse.status_code, 404)
+        self.assertFalse(Brouillon.objects.exists())
+
+    def test_stale_version_is_rejected_with_current_state(self):
+        """Une version périmée renvoie 409 et l'état courant, sans rien fusionner"""
+        self._patch(0, {'gestion_future': 'internal'})
+        reponse = self._patch(0, {'gestion_future': 'delegate'})
+        self.assertEqual(reponse.status_code, 409)
+        self.assertEqual(reponse.json(), {'version': 1, 'donnees': {'gestion_future': 'internal'}})
+
+    def test_invalid_patch_is_rejected(self):
+        """Champ inconnu, valeur non textuelle, JSON invalide ou jeton CSRF absent sont refusés"""
+        self.assertEqual(self._patch(0, {'siren': '987654321'}).status_code, 400)
+        self.assertEqual(self._patch(0, {'gestion_future': 3}).status_code, 400)
+        self.assertEqual(self.client.patch(self.url, 'pas du JSON').status_code, 400)
+
+        client_csrf = Client(enforce_csrf_checks=True)
+        client_csrf.cookies = self.client.cookies
+        self.assertEqual(self._patch(0, {'gestion_future': 'internal'}, client=client_csrf).status_code, 403)
+        self.assertFalse(Brouillon.objects.exists())
+
+    def test_submit_promotes_draft(self):
+        """La soumission finale ne poste que les champs non acquittés et supprime le brouillon"""
+        self._patch(0, {'factures_format_electronique': 'no', 'gestion_future': 'delegate', 'aisance_outils': 'medium',
+                        'accompagnement_souhaite': ['information', 'support']})
+
+        reponse = self.client.post(reverse('client_questionnaire'), {'brouillon': '1', 'commentaires': 'Merci'})
+        self.assertRedirects(reponse, reverse('client_recapitulatif'), fetch_redirect_response=False)
+        questionnaire = QuestionnaireClient.objects.get(pk='123456789')
+        self.assertEqual(questionnaire.gestion_future, 'delegate')
+        self.assertEqual(questionnaire.accompagnement_souhaite, ['information', 'support'])
+        self.assertEqual(questionnaire.commentaires, 'Merci')
+        self.assertFalse(Brouillon.objects.exists())
+
+
+class SchemaValidationTests(TestCase):
+    """Tests pour le schéma de validation généré à partir des formulaires"""
+
+    def test_schema_follows_form_definition(self):
+        """Champs obligatoires, choix et longueurs maximales viennent du formulaire"""
+        champs = validation.schema(Brouillon.TYPE_CLIENT)['champs']
+        self.assertEqual(champs['gestion_future']['choix'], ['internal', 'delegate', 'dont_know'])
+        self.assertTrue(champs['gestion_future']['requis'])
+        self.assertNotIn('requis', champs['caisse_enregistreuse'])
+        self.assertTrue(champs['accompagnement_souhaite']['multiple'])
+        self.assertEqual(champs['logiciel_facturation_nom'], {'max': 255, 'libelle': 'Si oui, lequel ?'})
+        self.assertNotIn('logiciel_facturation', champs)
+        self.assertEqual(validation.schema(Brouillon.TYPE_COLLABORATEUR)['champs']['code_ape']['max'], 10)
+
+    def test_version_changes_with_form_definition(self):
+        """La version est une empreinte de la définition des formulaires"""
+        version = validation.schema(Brouillon.TYPE_CLIENT)['version']
+        self.assertEqual(validation.schema(Brouillon.TYPE_CLIENT)['version'], version)
+        self.assertNotEqual(validation.schema(Brouillon.TYPE_COLLABORATEUR)['version'], version)
+        courante = validation.version(Brouillon.TYPE_COLLABORATEUR)
+        champ = QuestionnaireCollaborateurForm.base_fields['code_ape']
+        with patch.object(champ, 'max_length', 12):
+            self.assertNotEqual(validation.schema(Brouillon.TYPE_COLLABORATEUR)['version'], courante)
+
+    def test_versioned_url_is_cached_and_revalidated(self):
+        """L'URL versionnée est gardée en cache ; l'ETag permet une revalidation en 304"""
+        version = validation.version(Brouillon.TYPE_CLIENT)
+        url = reverse('schema_validation', args=['client'])
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'v': version})
+        self.assertEqual(response.json(), validation.schema(Brouillon.TYPE_CLIENT))
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"{version}"')
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('no-cache', self.client.get(url, {'v': 'ancienne'})['Cache-Control'])
+        self.assertEqual(self.client.get(reverse('schema_validation', args=['autre'])).status_code, 404)
+
+    def test_questionnaire_page_links_current_schema(self):
+        """La page du questionnaire référence la version courante du schéma"""
+        update_session(self.client, client_siren='123456789', client_nom_entreprise='Test SARL')
+        response = self.client.get(reverse('client_questionnaire'))
+        self.assertContains(response, f'?v={validation.version(Brouillon.TYPE_CLIENT)}')
+
 
 class ClientIdentificationViewTests(TestCase):
     """Tests pour la vue d'identification client"""
@@ -151,6 +503,58 @@ class ClientIdentificationViewTests(TestCase):
         # Vérifier le message d'erreur est affiché
 
 
+class SessionHybrideTests(TestCase):
+    """Tests pour le moteur de sessions hybride (cookie signé / cached_db)"""
+
+    INSEE_OK = {'success': True, 'nom': 'Test SARL', 'siren': '123456789', 'error': None}
+
+    def _cookie(self):
+        return self.client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def test_client_journey_writes_no_session_row(self):
+        """Le parcours client anonyme garde sa session dans un cookie signé"""
+        with patch('questionnaires.views.get_company_info', return_value=self.INSEE_OK):
+            self.client.post(reverse('client_identification'), {'siren': '123456789'})
+        response = self.client.get(reverse('client_questionnaire'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(':', self._cookie())
+        self.assertFalse(Session.objects.exists())
+
+    def test_authenticated_session_is_stored_in_database(self):
+        """Une session connectée passe en base, et en sort à la déconnexion"""
+        user = User.objects.create_user(email='[email protected]', username='collab',
+                                        password='testpass123', is_collaborateur=True)
+        update_session(self.client, client_siren='123456789')
+        self.client.force_login(user)
+        self.assertNotIn(':', self._cookie())
+        self.assertEqual(Session.objects.count(), 1)
+
+        self.client.post(reverse('logout'))
+        self.assertFalse(Session.objects.exists())
+
+    def test_deleted_session_not_served_from_local_cache(self):
+        """Une session supprimée ailleurs (autre worker) n'est pas relue dans le cache local"""
+        user = User.objects.create_user(email='[email protected]', username='collab',
+                                        password='testpass123', is_collaborateur=True)
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('dashboard')).status_code, 200)
+        # Suppression directe en base, sans passer par le cache de ce processus
+        Session.objects.all().delete()
+        self.assertEqual(self.client.get(reverse('dashboard')).status_code, 302)
+
+    def test_expiry_refreshed_only_past_threshold(self):
+        """La session n'est réenregistrée que si son dernier enregistrement dépasse le seuil"""
+        update_session(self.client, client_siren='123456789', client_nom_entreprise='Test SARL')
+        url = reverse('brouillon_questionnaire', args=['client'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+        with override_settings(SESSION_REFRESH_THRESHOLD=0):
+            response = self.client.get(url)
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+
 class CollaborateurDashboardTests(TestCase):
     """Tests pour le dashboard collaborateur"""
 
@@ -209,3 +613,919 @@ class ExportCSVTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
         self.assertIn('attachment', response['Content-Disposition'])
+
+    @patch('questionnaires.views.EXPORT_CHUNK_SIZE', 2)
+    def test_export_streams_in_chunks(self):
+        """L'export est envoyé par morceaux, avec un seul en-tête et toutes les lignes"""
+        for siren in ('111111111', '222222222', '333333333', '444444444'):
+            Entreprise.objects.create(siren=siren, nom_entreprise=f'Entreprise {siren}')
+        self.client.force_login(self.user)
+        morceaux = list(self.client.get(reverse('export_csv')).streaming_content)
+        self.assertGreater(len(morceaux), 2)
+        lignes = b''.join(morceaux).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lignes), 6)
+        self.assertTrue(lignes[0].startswith('SIREN;'))
+
+
+class SeedSyntheticCommandTests(TestCase):
+    """Tests pour la commande de génération de données synthétiques"""
+
+    def _seed(self, **options):
+        call_command('seed_synthetic', stdout=StringIO(), **options)
+
+    def test_generates_requested_volume(self):
+        """La commande crée le nombre d'entreprises demandé et des questionnaires liés"""
+        self._seed(entreprises=200, collaborateurs=3, batch_size=64)
+        self.assertEqual(Entreprise.objects.count(), 200)
+        self.assertGreater(QuestionnaireClient.objects.count(), 0)
+        self.assertGreater(QuestionnaireCollaborateur.objects.count(), 0)
+        self.assertEqual(
+            QuestionnaireCollaborateur.objects.values('collaborateur').distinct().count(), 3
+        )
+
+    def test_sirens_are_luhn_valid(self):
+        """Tous les SIREN générés respectent l'algorithme de Luhn"""
+        self._seed(entreprises=100)
+        for siren in Entreprise.objects.values_list('siren', flat=True):
+            self.assertEqual(len(siren), 9)
+            self.assertTrue(is_luhn_valid(siren), siren)
+
+    def test_required_fields_are_filled(self):
+        """Les champs obligatoires des formulaires ne sont jamais vides"""
+        self._seed(entreprises=100, taux_client=1)
+        self.assertFalse(QuestionnaireClient.objects.filter(gestion_future='').exists())
+        self.assertFalse(QuestionnaireClient.objects.filter(aisance_outils='').exists())
+
+    def test_deterministic_under_seed(self):
+        """Une même graine produit les mêmes données"""
+        self._seed(entreprises=50, seed=7)
+        premier = list(Entreprise.objects.order_by('siren').values_list('siren', 'nom_entreprise', 'is_archived'))
+        Entreprise.objects.all().delete()
+        self._seed(entreprises=50, seed=7)
+        second = list(Entreprise.objects.order_by('siren').values_list('siren', 'nom_entreprise', 'is_archived'))
+        self.assertEqual(premier, second)
+
+    def test_existing_entreprise_is_not_touched(self):
+        """Une entreprise réelle portant un SIREN généré n'est pas modifiée"""
+        self._seed(entreprises=10, seed=3)
+        entreprise = Entreprise.objects.order_by('siren').first()
+        Entreprise.objects.all().delete()
+        Entreprise.objects.create(siren=entreprise.siren, nom_entreprise='Réelle SARL')
+        self._seed(entreprises=10, seed=3)
+        self.assertEqual(Entreprise.objects.get(siren=entreprise.siren).nom_entreprise, 'Réelle SARL')
+        self.assertEqual(Entreprise.objects.count(), 10)
+
+
+class BenchmarkTests(TestCase):
+    """Tests pour le banc de mesure (commande bench)"""
+
+    def test_run_benchmarks_reports_metrics(self):
+        """Chaque scénario produit latences, requêtes, mémoire et débit"""
+        call_command('seed_synthetic', entreprises=30, stdout=StringIO())
+        resultats = run_benchmarks(iterations=2)
+        for scenario in ('dashboard', 'export_csv', 'voir_questionnaire', 'repartition_choix',
+                         'client_questionnaire_post', 'validate_siren', 'get_company_info_miss'):
+            self.assertIn(scenario, resultats)
+            self.assertEqual(
+                set(resultats[scenario]),
+                {'p50_ms', 'p95_ms', 'mean_ms', 'queries', 'peak_memory_kb', 'rows_per_second'},
+            )
+        self.assertEqual(resultats['get_company_info_hit']['queries'], 0)
+
+    def test_compare_to_baseline_flags_regressions(self):
+        """Une hausse des requêtes ou un p95 hors tolérance est signalé"""
+        reference = {'100': {'dashboard': {'p95_ms': 10, 'queries': 5, 'peak_memory_kb': 100}}}
+        stable = {'100': {'dashboard': {'p95_ms': 11, 'queries': 5, 'peak_memory_kb': 100}}}
+        degrade = {'100': {'dashboard': {'p95_ms': 15, 'queries': 6, 'peak_memory_kb': 100}}}
+        self.assertEqual(compare_to_baseline(stable, reference, tolerance=0.2), [])
+        self.assertEqual(len(compare_to_baseline(degrade, reference, tolerance=0.2)), 2)
+
+
+class ImportCSVTests(TestCase):
+    """Tests pour l'import CSV (format de l'export)"""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            email='staff@etac.fr',
+            username='staff',
+            password='testpass123',
+            is_staff=True,
+            is_collaborateur=True
+        )
+
+    def _exporter(self):
+        self.client.force_login(self.staff)
+        return b''.join(self.client.get(reverse('export_csv')).streaming_content).decode('utf-8-sig')
+
+    def _sans_dates(self, contenu):
+        """Lignes de l'export triées, sans les colonnes de dates"""
+        return sorted(ligne[:2] + ligne[4:] for ligne in csv.reader(StringIO(contenu), delimiter=';'))
+
+    def _importer(self, contenu, **options):
+        return import_csv(StringIO(contenu), utilisateur=self.staff, **options)
+
+    def test_every_export_column_is_mapped(self):
+        """Chaque colonne de l'export est importée ou explicitement ignorée"""
+        ignorees = {'Date Création', 'Date Modification'}
+        self.assertEqual(set(_get_csv_headers()) - ignorees, set(importation.COLONNES_OBLIGATOIRES))
+
+    def test_round_trip_restores_questionnaires(self):
+        """Un export réimporté sur une base vide restitue les mêmes réponses"""
+        call_command('seed_synthetic', entreprises=30, taux_client=0.7, taux_collaborateur=0.5,
+                     taux_archive=0, stdout=StringIO())
+        avant = self._exporter()
+        Entreprise.objects.all().delete()
+
+        rapport = self._importer(avant, taille_lot=7)
+
+        self.assertEqual(rapport.erreurs, [])
+        self.assertEqual(rapport.entreprises_creees, 30)
+        self.assertEqual(self._sans_dates(avant), self._sans_dates(self._exporter()))
+
+    def test_update_keeps_metadata(self):
+        """Une réimportation met à jour les réponses sans toucher archivage ni date de complétion"""
+        entreprise = Entreprise.objects.create(siren='123456789', nom_entreprise='Ancien nom', is_archived=True)
+        questionnaire = QuestionnaireClient.objects.create(
+            entreprise=entreprise, factures_format_electronique='no',
+            gestion_future='internal', aisance_outils='medium'
+        )
+        Entreprise.objects.filter(pk=entreprise.pk).update(is_archived=False)
+        contenu = self._exporter().replace('Ancien nom', 'Nouveau nom').replace('Gérer en interne avec accompagnement', 'Déléguer au cabinet')
+        Entreprise.objects.filter(pk=entreprise.pk).update(is_archived=True)
+
+        rapport = self._importer(contenu)
+
+        self.assertEqual((rapport.entreprises_mises_a_jour, rapport.clients_mis_a_jour), (1, 1))
+        entreprise.refresh_from_db()
+        self.assertEqual(entreprise.nom_entreprise, 'Nouveau nom')
+        self.assertTrue(entreprise.is_archived)
+        mis_a_jour = QuestionnaireClient.objects.get(pk=entreprise.pk)
+        self.assertEqual(mis_a_jour.gestion_future, 'delegate')
+        self.assertEqual(mis_a_jour.date_completion, questionnaire.date_completion)
+        self.assertEqual(mis_a_jour.modifie_par_collaborateur, self.staff)
+
+    def test_invalid_rows_are_reported_not_fatal(self):
+        """Les lignes invalides sont listées, les autres importées"""
+        entete = ';'.join(_get_csv_headers())
+        vide = [''] * (len(_get_csv_headers()) - 6)
+        lignes = [
+            ['123456789', 'Valide', '', '', 'Non', 'Non'] + vide,
+            ['12345', 'SIREN court', '', '', 'Non', 'Non'] + vide,
+            ['987654321', 'Réponse obligatoire absente', '', '', 'Oui', 'Non'] + vide,
+        ]
+        contenu = '\n'.join([entete] + [';'.join(l) for l in lignes])
+
+        rapport = self._importer(contenu)
+
+        self.assertEqual(rapport.lignes, 3)
+        self.assertEqual(rapport.lignes_rejetees, 2)
+        self.assertEqual(list(Entreprise.objects.values_list('siren', flat=True)), ['123456789'])
+        colonnes = {(numero, colonne) for numero, _, colonne, _ in rapport.erreurs}
+        self.assertIn((3, 'SIREN'), colonnes)
+        self.assertIn((4, 'Client - Gestion Future'), colonnes)
+
+    def test_missing_columns_rejects_file(self):
+        """Un fichier sans les colonnes de l'export est refusé d'emblée"""
+        with self.assertRaises(importation.FichierInvalide):
+            self._importer('SIREN;Nom Entreprise\n123456789;Test\n')
+
+    def test_upload_view_is_staff_only(self):
+        """La page d'import est réservée au staff"""
+        collaborateur = User.objects.create_user(
+            email='collab@etac.fr', username='collab', password='testpass123', is_collaborateur=True
+        )
+        self.client.force_login(collaborateur)
+        self.assertEqual(self.client.get(reverse('import_csv')).status_code, 403)
+
+    def test_upload_view_imports_file(self):
+        """Le staff importe un fichier et voit le bilan"""
+        Entreprise.objects.create(siren='123456789', nom_entreprise='Test SARL')
+        contenu = self._exporter().encode('utf-8-sig')
+        Entreprise.objects.all().delete()
+
+        response = self.client.post(reverse('import_csv'), {
+            'fichier': SimpleUploadedFile('export.csv', contenu, content_type='text/csv'),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['rapport'].entreprises_creees, 1)
+        self.assertTrue(Entreprise.objects.filter(siren='123456789').exists())
+
+    def test_upload_view_rejects_non_utf8_file_before_import(self):
+        """Un fichier hors UTF-8 est refusé avant l'enregistrement du premier lot"""
+        # Fichier plus long que le tampon de lecture : l'octet invalide n'est lu qu'en fin d'import
+        Entreprise.objects.bulk_create(
+            Entreprise(siren=f'{100000000 + i}', nom_entreprise='Test SARL') for i in range(200)
+        )
+        lignes = self._exporter().splitlines(keepends=True)
+        Entreprise.objects.all().delete()
+        contenu = ''.join(lignes[:-1]).encode('utf-8') + lignes[-1].replace('Test SARL', 'Société').encode('latin-1')
+
+        # Un lot par ligne : la première ligne serait enregistrée avant l'erreur de décodage
+        with patch.object(importation, 'import_csv', partial(importation.import_csv, taille_lot=1)):
+            response = self.client.post(reverse('import_csv'), {
+                'fichier': SimpleUploadedFile('export.csv', contenu, content_type='text/csv'),
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('rapport', response.context)
+        self.assertIn('Le fichier doit être encodé en UTF-8.', [str(m) for m in response.context['messages']])
+        self.assertFalse(Entreprise.objects.exists())
+
+
+class ArchivageTests(TestCase):
+    """Tests pour l'archivage unitaire et groupé"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='collab@etac.fr',
+            username='collab',
+            password='testpass123',
+            is_collaborateur=True
+        )
+        self.client.force_login(self.user)
+        for siren, nom in (('111111111', 'Alpha'), ('222222222', 'Beta'), ('333333333', 'Alpine')):
+            Entreprise.objects.create(siren=siren, nom_entreprise=nom)
+
+    def _archivees(self):
+        return set(Entreprise.objects.filter(is_archived=True).values_list('siren', flat=True))
+
+    def test_single_archive_writes_only_archive_columns(self):
+        """L'archivage unitaire ne réécrit que les colonnes d'archivage et date_modification"""
+        with record_queries() as requetes:
+            self.client.post(reverse('archiver_entreprise', args=['111111111']))
+        mises_a_jour = [q['sql'] for q in requetes if q['sql'].startswith('UPDATE "questionnaires_entreprise"')]
+        self.assertEqual(len(mises_a_jour), 1)
+        self.assertNotIn('nom_entreprise', mises_a_jour[0])
+        self.assertEqual(self._archivees(), {'111111111'})
+
+    def test_bulk_archive_selection_in_one_update(self):
+        """La sélection est archivée par une seule requête UPDATE"""
+        with record_queries() as requetes:
+            response = self.client.post(reverse('archiver_entreprises'), {
+                'portee': 'selection', 'sirens': ['111111111', '222222222'],
+            })
+        self.assertRedirects(response, reverse('dashboard'))
+        mises_a_jour = [q for q in requetes if q['sql'].startswith('UPDATE "questionnaires_entreprise"')]
+        self.assertEqual(len(mises_a_jour), 1)
+        self.assertEqual(self._archivees(), {'111111111', '222222222'})
+
+    def test_bulk_archive_current_filter(self):
+        """« Tous les résultats » archive les entreprises correspondant au filtre courant"""
+        response = self.client.post(reverse('archiver_entreprises'), {
+            'portee': 'filtre', 'search': 'Alp', 'filter': 'all',
+        })
+        self.assertRedirects(response, reverse('dashboard') + '?search=Alp&filter=all')
+        self.assertEqual(self._archivees(), {'111111111', '333333333'})
+
+    def test_bulk_unarchive(self):
+        """Les entreprises archivées peuvent être désarchivées en masse"""
+        Entreprise.objects.update(is_archived=True)
+        self.client.post(reverse('archiver_entreprises'), {
+            'action': 'desarchiver', 'portee': 'filtre', 'statut': 'archived', 'search': 'Beta',
+        })
+        self.assertEqual(self._archivees(), {'111111111', '333333333'})
+
+    def test_dashboard_lists_archived(self):
+        """Le dashboard affiche les entreprises archivées avec statut=archived"""
+        Entreprise.objects.filter(siren='222222222').update(is_archived=True)
+        response = self.client.get(reverse('dashboard'), {'statut': 'archived'})
+        self.assertEqual([e.siren for e in response.context['entreprises']], ['222222222'])
+
+
+class ColdStorageTests(TestCase):
+    """Tests pour le transfert des entreprises archivées vers les archives"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='collab@etac.fr',
+            username='collab',
+            password='testpass123',
+            is_collaborateur=True
+        )
+        ancienne = timezone.now() - timedelta(days=400)
+        for siren, archivage in (('111111111', ancienne), ('222222222', timezone.now()), ('333333333', None)):
+            entreprise = Entreprise.objects.create(
+                siren=siren, nom_entreprise=f'Entreprise {siren}',
+                is_archived=archivage is not None, date_archivage=archivage,
+            )
+            QuestionnaireClient.objects.create(entreprise=entreprise, accompagnement_souhaite=['formation'])
+            QuestionnaireCollaborateur.objects.create(entreprise=entreprise, collaborateur=self.user)
+
+    def test_moves_old_archives_with_questionnaires(self):
+        """Seules les entreprises archivées depuis plus du seuil quittent les tables courantes"""
+        sortie = StringIO()
+        call_command('cold_storage', jours=365, batch_size=1, stdout=sortie)
+        self.assertIn('1 entreprises transférées', sortie.getvalue())
+        self.assertFalse(Entreprise.objects.filter(siren='111111111').exists())
+        self.assertFalse(QuestionnaireClient.objects.filter(entreprise='111111111').exists())
+        self.assertEqual(Entreprise.objects.count(), 2)
+
+        archive = EntrepriseArchivee.objects.get()
+        self.assertEqual(archive.siren, '111111111')
+        self.assertTrue(archive.questionnaire_client and archive.questionnaire_collaborateur)
+
+    def test_restore_round_trip(self):
+        """La restauration remet entreprise et questionnaires à l'identique, toujours archivés"""
+        qc = QuestionnaireClient.objects.get(entreprise='111111111')
+        call_command('cold_storage', jours=365, stdout=StringIO())
+        call_command('cold_storage', restaurer=['111111111'], stdout=StringIO())
+
+        self.assertFalse(EntrepriseArchivee.objects.exists())
+        entreprise = Entreprise.objects.get(siren='111111111')
+        self.assertTrue(entreprise.is_archived)
+        self.assertGreater(entreprise.date_archivage, timezone.now() - timedelta(minutes=1))
+        restaure = QuestionnaireClient.objects.get(entreprise=entreprise)
+        self.assertEqual(restaure.accompagnement_souhaite, ['formation'])
+        self.assertEqual(restaure.date_completion, qc.date_completion)
+        self.assertEqual(entreprise.questionnaire_collaborateur.collaborateur, self.user)
+
+    def test_restore_refuses_existing_siren(self):
+        """Une archive dont le SIREN existe de nouveau n'est pas restaurée"""
+        call_command('cold_storage', jours=365, stdout=StringIO())
+        Entreprise.objects.create(siren='111111111', nom_entreprise='Recréée')
+        with self.assertRaises(CommandError):
+            call_command('cold_storage', restaurer=['111111111'], stdout=StringIO())
+        self.assertTrue(EntrepriseArchivee.objects.filter(siren='111111111').exists())
+
+    def test_admin_lists_and_restores_archives(self):
+        """L'admin affiche le contenu archivé et restaure par action groupée"""
+        call_command('cold_storage', jours=365, stdout=StringIO())
+        admin_user = User.objects.create_superuser(email='admin@etac.fr', username='admin', password='x')
+        self.client.force_login(admin_user)
+        url = reverse('admin:questionnaires_entreprisearchivee_change', args=['111111111'])
+        self.assertContains(self.client.get(url), '&quot;formation&quot;')
+        self.client.post(reverse('admin:questionnaires_entreprisearchivee_changelist'), {
+            'action': 'action_restaurer', '_selected_action': ['111111111'],
+        })
+        self.assertTrue(Entreprise.objects.filter(siren='111111111').exists())
+
+    def test_dashboard_archiving_sets_date(self):
+        """Archiver depuis le dashboard date l'archivage, désarchiver l'efface"""
+        self.client.force_login(self.user)
+        self.client.post(reverse('archiver_entreprises'), {'portee': 'selection', 'sirens': ['333333333']})
+        self.assertIsNotNone(Entreprise.objects.get(siren='333333333').date_archivage)
+        self.client.post(reverse('archiver_entreprises'), {
+            'action': 'desarchiver', 'portee': 'selection', 'sirens': ['333333333'],
+        })
+        self.assertIsNone(Entreprise.objects.get(siren='333333333').date_archivage)
+
+
+class PurgeTests(TestCase):
+    """Tests pour la purge par lots des sessions et enregistrements d'axes"""
+
+    def setUp(self):
+        maintenant = timezone.now()
+        for i in range(5):
+            Session.objects.create(session_key=f'expiree{i:025d}', session_data='', expire_date=maintenant - timedelta(hours=1))
+        Session.objects.create(session_key='active' + '0' * 26, session_data='', expire_date=maintenant + timedelta(hours=1))
+        for i, jours in enumerate((200, 150, 10)):
+            ip = f'10.0.0.{i + 1}'
+            tentative = AccessAttempt.objects.create(username='collab', ip_address=ip, failures_since_start=1)
+            journal = AccessLog.objects.create(username='collab', ip_address=ip)
+            # attempt_time est renseigné automatiquement (auto_now_add)
+            AccessAttempt.objects.filter(pk=tentative.pk).update(attempt_time=maintenant - timedelta(days=jours))
+            AccessLog.objects.filter(pk=journal.pk).update(attempt_time=maintenant - timedelta(days=jours))
+
+    def test_purges_in_batches_and_reports(self):
+        """Sessions expirées et enregistrements anciens supprimés par lots, les autres conservés"""
+        sortie = StringIO()
+        with patch('questionnaires.purge.time.sleep') as pause:
+            call_command('purge', jours=90, batch_size=2, stdout=sortie)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['active' + '0' * 26])
+        self.assertEqual(AccessAttempt.objects.count(), 1)
+        self.assertEqual(AccessLog.objects.count(), 1)
+        self.assertIn('django_session : 5 lignes supprimées', sortie.getvalue())
+        self.assertIn('9 lignes supprimées en', sortie.getvalue())
+        # Lots complets de sessions (2 + 2), tentatives et journaux (2) : une pause après chacun
+        self.assertEqual(pause.call_count, 4)
+
+    def test_batches_follow_primary_key(self):
+        """Chaque lot reprend après la dernière clé, sans OFFSET"""
+        with record_queries() as requetes:
+            self.assertEqual(purger(Session.objects.filter(expire_date__lt=timezone.now()), taille_lot=2, pause=0), 5)
+        selections = [r['sql'] for r in requetes if r['sql'].startswith('SELECT') and 'django_session' in r['sql']]
+        self.assertEqual(len(selections), 3)
+        self.assertFalse(any('OFFSET' in sql for sql in selections))
+
+    def test_dry_run_changes_nothing(self):
+        """--verifier compte les lignes sans rien supprimer"""
+        sortie = StringIO()
+        call_command('purge', jours=90, verifier=True, stdout=sortie)
+        self.assertIn('axes_accessattempt : 2 lignes à supprimer', sortie.getvalue())
+        self.assertEqual(Session.objects.count(), 6)
+
+
+# Marqueurs d'un tri en mémoire dans la sortie d'EXPLAIN, par moteur
+TRI_EN_MEMOIRE = {'sqlite': 'TEMP B-TREE', 'mysql': 'filesort'}
+
+
+@skipUnless(connection.vendor in TRI_EN_MEMOIRE, "Plans d'exécution vérifiés sous SQLite et MySQL")
+class DashboardQueryPlanTests(TestCase):
+    """Chaque tri du dashboard (et l'export) est servi par un index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_synthetic', entreprises=200, taux_archive=0.2, stdout=StringIO())
+
+    def assertNoSort(self, queryset, label):
+        plan = queryset.explain()
+        self.assertNotIn(TRI_EN_MEMOIRE[connection.vendor], plan, f'{label} :\n{plan}')
+        self.assertIn('INDEX', plan.upper(), f'{label} :\n{plan}')
+
+    def test_every_dashboard_sort_uses_an_index(self):
+        """Les huit tris, sur les entreprises actives et archivées, évitent le tri en mémoire"""
+        for statut in ('active', 'archived'):
+            base = _filter_entreprises(QueryDict(f'statut={statut}')).select_related(
+                'questionnaire_client', 'questionnaire_collaborateur'
+            )
+            for sort_by in DASHBOARD_SORTS:
+                with self.subTest(statut=statut, sort=sort_by):
+                    self.assertNoSort(_order_entreprises(base, sort_by)[:20], sort_by)
+
+    def test_default_ordering_uses_an_index(self):
+        """L'ordre par défaut (dashboard sans tri, export) évite le tri en mémoire"""
+        self.assertNoSort(Entreprise.objects.filter(is_archived=False)[:20], 'ordre par défaut')
+
+
+# Budget de requêtes SQL de chaque URL de questionnaires/urls.py. Toute
+# nouvelle URL doit déclarer son budget ici (cf. test_every_url_declares_a_budget).
+QUERY_BUDGETS = {
+    'home': 0,
+    'mentions_legales': 0,
+    'validate_siren': 0,
+    'brouillon_questionnaire': 3,
+    'schema_validation': 0,
+    'client_introduction': 0,
+    'client_identification': 2,
+    'client_questionnaire': 3,
+    'client_recapitulatif': 0,
+    'collaborateur_login': 0,
+    'dashboard': 7,
+    'collaborateur_identification': 4,
+    'collaborateur_questionnaire': 6,
+    'collaborateur_recapitulatif': 2,
+    'voir_questionnaire': 6,
+    'editer_entreprise': 6,
+    'export_csv': 3,
+    'import_csv': 8,
+    'archiver_entreprise': 4,
+    'archiver_entreprises': 3,
+    'logout': 6,
+    'metrics': 0,
+}
+
+
+@override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Budgets de requêtes SQL par URL, constants quel que soit le volume de données"""
+
+    INSEE_OK = {'success': True, 'nom': 'Test SARL', 'siren': '123456789', 'error': None}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='[email protected]',
+            username='collab',
+            password='testpass123',
+            is_collaborateur=True,
+            is_staff=True
+        )
+
+    def _csv_import(self, siren):
+        """Fichier d'import d'une ligne (entreprise et deux questionnaires)"""
+        valeurs = {
+            'SIREN': siren, 'Nom Entreprise': 'Test SARL',
+            'Q. Client Complété': 'Oui', 'Q. Collaborateur Complété': 'Oui',
+            'Client - Factures Format Électronique': 'Oui',
+            'Client - Gestion Future': 'Déléguer au cabinet',
+            'Client - Aisance Outils': 'Moyen',
+        }
+        en_tetes = _get_csv_headers()
+        lignes = [en_tetes, [valeurs.get(colonne, '') for colonne in en_tetes]]
+        return '\n'.join(';'.join(ligne) for ligne in lignes).encode('utf-8')
+
+    def _requetes(self, siren):
+        """
+        Requête représentative de chaque URL (la plus coûteuse des méthodes acceptées).
+
+        Returns:
+            dict: url_name -> (méthode, url, données, connecté, session)
+        """
+        session_client = {'client_siren': siren, 'client_nom_entreprise': 'Test SARL'}
+        session_collab = {'collab_siren': siren, 'collab_nom_entreprise': 'Test SARL'}
+        return {
+            'home': ('get', reverse('home'), {}, False, None),
+            'mentions_legales': ('get', reverse('mentions_legales'), {}, False, None),
+            'validate_siren': ('get', reverse('validate_siren'), {'siren': siren}, False, None),
+            'brouillon_questionnaire': ('patch', reverse('brouillon_questionnaire', args=['client']), json.dumps({
+                'version': 0, 'champs': {'gestion_future': 'internal'},
+            }), False, session_client),
+            'schema_validation': ('get', reverse('schema_validation', args=['client']), {}, False, None),
+            'client_introduction': ('get', reverse('client_introduction'), {}, False, None),
+            'client_identification': ('post', reverse('client_identification'), {'siren': siren}, False, None),
+            'client_questionnaire': ('post', reverse('client_questionnaire'), {
+                'factures_format_electronique': 'yes',
+                'gestion_future': 'internal',
+                'aisance_outils': 'medium',
+                'accompagnement_souhaite': ['formation'],
+            }, False, session_client),
+            'client_recapitulatif': ('get', reverse('client_recapitulatif'), {}, False, None),
+            'collaborateur_login': ('get', reverse('collaborateur_login'), {}, False, None),
+            'dashboard': ('get', reverse('dashboard'), {'search': siren[:3], 'sort': 'nom_entreprise'}, True, None),
+            'collaborateur_identification': ('post', reverse('collaborateur_identification'), {'siren': siren}, True, None),
+            'collaborateur_questionnaire': ('post', reverse('collaborateur_questionnaire'), {
+                'assujettie_tva': 'yes',
+            }, True, session_collab),
+            'collaborateur_recapitulatif': ('get', reverse('collaborateur_recapitulatif'), {}, True, None),
+            'voir_questionnaire': ('get', reverse('voir_questionnaire', args=[siren]), {}, True, None),
+            'editer_entreprise': ('post', reverse('editer_entreprise', args=[siren]), {
+                'form_type': 'collaborateur',
+                'assujettie_tva': 'no',
+            }, True, None),
+            'export_csv': ('get', reverse('export_csv'), {}, True, None),
+            'import_csv': ('post', reverse('import_csv'), {
+                'fichier': SimpleUploadedFile('import.csv', self._csv_import(siren), content_type='text/csv'),
+            }, True, None),
+            'archiver_entreprise': ('post', reverse('archiver_entreprise', args=[siren]), {}, True, None),
+            'archiver_entreprises': ('post', reverse('archiver_entreprises'), {
+                'action': 'desarchiver', 'portee': 'filtre', 'statut': 'archived', 'filter': 'both',
+            }, True, None),
+            'logout': ('post', reverse('logout'), {}, True, None),
+            'metrics': ('get', reverse('metrics'), {}, False, None),
+        }
+
+    def _executer(self, methode, url, donnees, connecte, session):
+        client = Client()
+        if connecte:
+            client.force_login(self.user)
+        if session:
+            update_session(client, **session)
+
+        def executer():
+            response = getattr(client, methode)(url, donnees)
+            # Les réponses en flux (export) interrogent la base pendant leur lecture
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response
+        return executer
+
+    def test_every_url_declares_a_budget(self):
+        """Chaque URL de l'application a un budget de requêtes déclaré"""
+        noms = {pattern.name for pattern in questionnaire_urls.urlpatterns}
+        self.assertEqual(noms, set(QUERY_BUDGETS))
+
+    def test_budgets_hold_for_1_and_1000_rows(self):
+        """Les budgets sont respectés et constants avec 1 et 1000 entreprises"""
+        comptes = {}
+        for taille in (1, 1000):
+            Entreprise.objects.all().delete()
+            call_command('seed_synthetic', entreprises=taille, taux_client=1,
+                         taux_collaborateur=1, taux_archive=0, stdout=StringIO())
+            siren = Entreprise.objects.order_by('siren').values_list('siren', flat=True).first()
+            for nom, requete in self._requetes(siren).items():
+                executer = self._executer(*requete)
+                with self.subTest(url=nom, lignes=taille):
+                    with patch('questionnaires.views.get_company_info', return_value=self.INSEE_OK):
+                        with self.assertQueryBudget(QUERY_BUDGETS[nom], nom) as requetes:
+                            response = executer()
+                    self.assertLess(response.status_code, 400)
+                    comptes.setdefault(nom, []).append(len(requetes))
+
+        for nom, (petit, grand) in comptes.items():
+            with self.subTest(url=nom):
+                self.assertEqual(petit, grand, f'{nom} : {petit} requêtes pour 1 ligne, {grand} pour 1000')
+
+    def test_budget_failure_lists_sql_by_call_site(self):
+        """Un dépassement liste les requêtes regroupées par site d'appel"""
+        Entreprise.objects.create(siren='123456789', nom_entreprise='Test SARL')
+        with self.assertRaises(AssertionError) as ctx:
+            with self.assertQueryBudget(1, 'exemple'):
+                for entreprise in Entreprise.objects.all():
+                    hasattr(entreprise, 'questionnaire_client')
+        message = str(ctx.exception)
+        self.assertIn('2 requêtes pour un budget de 1', message)
+        self.assertIn('tests.test_budget_failure_lists_sql_by_call_site (2 requêtes)', message)
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """Tests pour le profilage à la demande"""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            email='staff@etac.fr',
+            username='staff',
+            password='testpass123',
+            is_staff=True
+        )
+        self.collab = User.objects.create_user(
+            email='collab@etac.fr',
+            username='collab',
+            password='testpass123',
+            is_collaborateur=True
+        )
+
+    def test_no_profile_without_trigger(self):
+        """Sans en-tête ni paramètre, aucune requête n'est profilée"""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('dashboard'))
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(ProfilRequete.objects.exists())
+
+    def test_staff_header_triggers_profile(self):
+        """L'en-tête X-Profile d'un membre du staff enregistre un profil"""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('dashboard'), headers={'X-Profile': '1'})
+        profil = ProfilRequete.objects.get()
+        self.assertEqual(response['X-Profile-Id'], str(profil.pk))
+        self.assertEqual(profil.vue, 'dashboard')
+        self.assertGreater(profil.nb_requetes_sql, 0)
+        self.assertEqual(profil.nb_requetes_sql, len(profil.requetes_sql))
+        self.assertIn('views.dashboard', {r['site'] for r in profil.requetes_sql})
+        self.assertTrue(bytes(profil.donnees))
+
+    def test_non_staff_cannot_trigger_profile(self):
+        """Un collaborateur non staff ne peut pas déclencher le profilage"""
+        self.client.force_login(self.collab)
+        self.client.get(reverse('dashboard'), {'_profile': '1'})
+        self.assertFalse(ProfilRequete.objects.exists())
+
+    @override_settings(PROFILING_MAX_PROFILES=2)
+    def test_retention_is_bounded(self):
+        """Seuls les derniers profils sont conservés"""
+        self.client.force_login(self.staff)
+        for _ in range(4):
+            self.client.get(reverse('home'), {'_profile': '1'})
+        self.assertEqual(ProfilRequete.objects.count(), 2)
+
+    def test_admin_download(self):
+        """Le profil est téléchargeable depuis l'admin au format pstats"""
+        self.staff.is_superuser = True
+        self.staff.save()
+        self.client.force_login(self.staff)
+        profil_id = self.client.get(reverse('home'), {'_profile': '1'})['X-Profile-Id']
+        response = self.client.get(reverse('admin:questionnaires_profilrequete_telecharger', args=[profil_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('profil-', response['Content-Disposition'])
+        self.assertTrue(marshal.loads(response.content))
+
+
+@override_settings(METRICS_DIR=None)
+class MetricsTests(TestCase):
+    """Tests pour l'endpoint de métriques Prometheus"""
+
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        self.staff = User.objects.create_user(
+            email='staff@etac.fr',
+            username='staff',
+            password='testpass123',
+            is_staff=True
+        )
+
+    def test_metrics_requires_staff_or_allowed_ip(self):
+        """/metrics est refusé aux anonymes hors liste d'IP autorisées"""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with override_settings(METRICS_ALLOWED_IPS=['127.0.0.1']):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    def test_request_latency_and_db_histograms(self):
+        """Les requêtes alimentent les histogrammes par nom de vue"""
+        self.client.force_login(self.staff)
+        self.client.get(reverse('dashboard'))
+        contenu = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('etac_http_request_duration_seconds_bucket{view="dashboard",le="+Inf"} 1', contenu)
+        self.assertIn('etac_db_queries_per_request_count{view="dashboard"} 1', contenu)
+        self.assertIn('etac_http_requests_total{method="GET",status="200",view="dashboard"} 1', contenu)
+
+    @patch('questionnaires.utils.requests.get')
+    def test_insee_and_cache_metrics(self, mock_get):
+        """get_company_info alimente les compteurs INSEE et le ratio de cache"""
+        cache.clear()
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {
+            'uniteLegale': {'periodesUniteLegale': [{'denominationUniteLegale': 'TEST SARL'}]}
+        }
+        get_company_info('552100554')
+        get_company_info('552100554')
+        cache.clear()
+        contenu = metrics.render()
+        self.assertIn('etac_insee_requests_total{outcome="success"} 1', contenu)
+        self.assertIn('etac_insee_request_duration_seconds_count 1', contenu)
+        self.assertIn('etac_cache_hit_ratio{cache="insee"} 0.5', contenu)
+
+    def test_export_duration(self):
+        """L'export CSV enregistre sa durée et ses lignes"""
+        Entreprise.objects.create(siren='123456789', nom_entreprise='Test SARL')
+        self.client.force_login(self.staff)
+        b''.join(self.client.get(reverse('export_csv')).streaming_content)
+        contenu = metrics.render()
+        self.assertIn('etac_export_duration_seconds_count{format="csv"} 1', contenu)
+        self.assertIn('etac_export_rows_total{format="csv"} 1', contenu)
+
+    def test_aggregates_worker_files(self):
+        """Les fichiers des autres workers sont additionnés"""
+        with tempfile.TemporaryDirectory() as repertoire, override_settings(METRICS_DIR=repertoire):
+            metrics.inc('etac_export_rows_total', {'format': 'csv'}, 3)
+            autre_worker = {
+                'counters': [['etac_export_rows_total', [['format', 'csv']], 4]],
+                'histograms': [],
+            }
+            Path(repertoire, '999999.json').write_text(json.dumps(autre_worker))
+            self.assertIn('etac_export_rows_total{format="csv"} 7', metrics.render())
+
+    def test_idle_worker_publishes_last_values(self):
+        """Un worker inactif écrit ses dernières valeurs sans attendre une nouvelle requête"""
+        with tempfile.TemporaryDirectory() as repertoire, \
+                override_settings(METRICS_DIR=repertoire, METRICS_FLUSH_INTERVAL=0.05):
+            metrics.inc('etac_export_rows_total', {'format': 'csv'}, 3)
+            metrics.REGISTRY.flush()
+            # Incrément après la dernière requête, dans l'intervalle d'écriture
+            metrics.inc('etac_export_rows_total', {'format': 'csv'}, 2)
+            metrics.REGISTRY.flush()
+            fichier = Path(repertoire, f'{os.getpid()}.json')
+            limite = time.monotonic() + 2
+            while time.monotonic() < limite:
+                compteurs = json.loads(fichier.read_text())['counters']
+                if compteurs == [['etac_export_rows_total', [['format', 'csv']], 5]]:
+                    break
+                time.sleep(0.02)
+            self.assertEqual(compteurs, [['etac_export_rows_total', [['format', 'csv']], 5]])
+            self.assertFalse(metrics.REGISTRY.modifie())
+
+
+class SlowQueryLogTests(TestCase):
+    """Tests pour le journal des requêtes SQL lentes"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='collab@etac.fr',
+            username='collab',
+            password='testpass123',
+            is_collaborateur=True
+        )
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001)
+    def test_slow_queries_are_logged_with_call_site(self):
+        """Chaque requête au-dessus du seuil est journalisée avec sa vue et son site d'appel"""
+        client = Client()
+        client.force_login(self.user)
+        with self.assertLogs('etac.slow_queries', level='INFO') as logs:
+            client.get(reverse('dashboard'))
+        enregistrements = [json.loads(record.getMessage()) for record in logs.records]
+        self.assertTrue(enregistrements)
+        self.assertEqual({e['vue'] for e in enregistrements}, {'dashboard'})
+        self.assertIn('views.dashboard', {e['site'] for e in enregistrements})
+        self.assertNotIn('%s', ''.join(e['sql'] for e in enregistrements))
+
+    def test_summary_command_ranks_by_total_time(self):
+        """La commande de synthèse classe les requêtes par temps total"""
+        lignes = [
+            {'date': '2026-01-01T00:00:00', 'duree_ms': 50, 'vue': 'dashboard',
+             'site': 'views.dashboard', 'sql': 'SELECT A'},
+            {'date': '2026-01-01T00:00:00', 'duree_ms': 30, 'vue': 'export_csv',
+             'site': 'views.export_csv', 'sql': 'SELECT B'},
+            {'date': '2026-01-01T00:00:00', 'duree_ms': 30, 'vue': 'export_csv',
+             'site': 'views.export_csv', 'sql': 'SELECT B'},
+        ]
+        with tempfile.TemporaryDirectory() as repertoire:
+            journal = Path(repertoire, 'slow.log')
+            journal.write_text('\n'.join(json.dumps(l) for l in lignes[:2]) + '\n')
+            Path(repertoire, 'slow.log.1').write_text(json.dumps(lignes[2]) + '\n')
+            sortie = StringIO()
+            call_command('slow_queries', fichier=str(journal), json=True, stdout=sortie)
+        resultats = json.loads(sortie.getvalue())
+        self.assertEqual([r['sql'] for r in resultats], ['SELECT B', 'SELECT A'])
+        self.assertEqual(resultats[0]['nombre'], 2)
+        self.assertEqual(resultats[0]['sites'], {'views.export_csv': 2})
+
+
+@override_settings(SERVER_TIMING_ENABLED=True)
+class ServerTimingTests(TestCase):
+    """Tests pour l'en-tête Server-Timing"""
+
+    def test_dashboard_reports_db_and_template_phases(self):
+        """Le dashboard détaille les temps SQL, de rendu et total"""
+        user = User.objects.create_user(
+            email='collab@etac.fr',
+            username='collab',
+            password='testpass123',
+            is_collaborateur=True
+        )
+        self.client.force_login(user)
+        entete = self.client.get(reverse('dashboard'))['Server-Timing']
+        self.assertRegex(entete, r'db;dur=[\d.]+;desc="SQL \(\d+\)"')
+        self.assertIn('template;dur=', entete)
+        self.assertIn('total;dur=', entete)
+
+    @patch('questionnaires.utils.requests.get')
+    def test_identification_reports_insee_and_cache_phases(self, mock_get):
+        """L'identification client détaille les temps INSEE et cache"""
+        cache.clear()
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {
+            'uniteLegale': {'periodesUniteLegale': [{'denominationUniteLegale': 'TEST SARL'}]}
+        }
+        entete = self.client.post(reverse('client_identification'), {'siren': '552100554'})['Server-Timing']
+        cache.clear()
+        self.assertIn('insee;dur=', entete)
+        self.assertIn('cache;dur=', entete)
+
+    @override_settings(SERVER_TIMING_ENABLED=False)
+    def test_disabled(self):
+        """Sans activation, aucun en-tête n'est ajouté"""
+        self.assertNotIn('Server-Timing', self.client.get(reverse('home')))
+
+
+class ReplicaRoutingTests(TestCase):
+    """Tests pour le routage des lectures vers le réplica (alias simulé)"""
+
+    def setUp(self):
+        for cible in ('questionnaires.routers.replica_alias', 'questionnaires.middleware.replica_alias'):
+            patcher = patch(cible, return_value='replica')
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def _base_lue(self, request):
+        """Base de lecture des entreprises pendant la vue, puis la réponse"""
+        bases = []
+
+        def vue(request):
+            bases.append(self.router.db_for_read(Entreprise))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(vue)(request)
+        return bases[0], response
+
+    def test_router_reads(self):
+        """Seules les lectures des questionnaires dans un bloc vont au réplica"""
+        self.assertEqual(self.router.db_for_read(Entreprise), 'default')
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Entreprise), 'replica')
+            self.assertEqual(self.router.db_for_read(User), 'default')
+            self.assertEqual(self.router.db_for_write(Entreprise), 'default')
+            with replica_reads(False):
+                self.assertEqual(self.router.db_for_read(Entreprise), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'questionnaires'))
+
+    def test_read_only_views_use_replica(self):
+        """Dashboard et listes de l'admin lisent sur le réplica, pas le reste"""
+        self.assertEqual(self._base_lue(self.factory.get(reverse('dashboard')))[0], 'replica')
+        self.assertEqual(
+            self._base_lue(self.factory.get(reverse('admin:questionnaires_entreprise_changelist')))[0],
+            'replica'
+        )
+        self.assertEqual(self._base_lue(self.factory.get(reverse('home')))[0], 'default')
+
+    def test_reads_stick_to_primary_after_write(self):
+        """Après une écriture, l'utilisateur lit sur la base principale"""
+        base, response = self._base_lue(self.factory.post(reverse('archiver_entreprises')))
+        self.assertEqual(base, 'default')
+        cookie = response.cookies[ReplicaRoutingMiddleware.COOKIE]
+        self.assertEqual(cookie['max-age'], 10)
+
+        request = self.factory.get(reverse('dashboard'))
+        request.COOKIES[ReplicaRoutingMiddleware.COOKIE] = cookie.value
+        self.assertEqual(self._base_lue(request)[0], 'default')
+
+    def test_streaming_content_reads_replica(self):
+        """Le contenu d'un export en flux est lui aussi lu sur le réplica"""
+        def contenu():
+            yield self.router.db_for_read(Entreprise)
+
+        middleware = ReplicaRoutingMiddleware(lambda request: StreamingHttpResponse(contenu()))
+        response = middleware(self.factory.get(reverse('export_csv')))
+        self.assertEqual(b''.join(response.streaming_content), b'replica')
+
+
+# DB_REPLICA_NAME=replica.sqlite3 python manage.py test questionnaires.tests.ReplicaDatabaseTests
+@skipUnless('replica' in connections, 'Réplica non configuré (DB_REPLICA_NAME)')
+class ReplicaDatabaseTests(TransactionTestCase):
+    """
+    Tests du routage sur un réplica réel (miroir de la base de test).
+
+    TransactionTestCase : le réplica est une autre connexion, qui ne voit que
+    les données validées.
+    """
+
+    databases = {'default', 'replica'} if 'replica' in connections else {'default'}
+
+    def test_dashboard_queries_run_on_replica(self):
+        """Les requêtes du dashboard sur les entreprises passent par le réplica"""
+        user = User.objects.create_user(
+            email='collab@etac.fr',
+            username='collab',
+            password='testpass123',
+            is_collaborateur=True
+        )
+        Entreprise.objects.create(siren='123456789', nom_entreprise='Test SARL')
+        self.client.force_login(user)
+        with record_queries() as requetes:
+            response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'Test SARL')
+        aliases = {r['alias'] for r in requetes if 'questionnaires_entreprise' in r['sql']}
+        self.assertEqual(aliases, {'replica'})
@@ -9,6 +9,8 @@ urlpatterns = [
 
     # API
     path('api/validate-siren/', views.validate_siren, name='validate_siren'),
+    path('api/brouillon/<str:type_questionnaire>/', views.brouillon_questionnaire, name='brouillon_questionnaire'),
+    path('api/schema/<str:type_questionnaire>/', views.schema_validation, name='schema_validation'),
 
     # Parcours CLIENT
     path('client/introduction/', views.client_introduction, name='client_introduction'),
@@ -31,7 +33,12 @@ urlpatterns = [
     path('collaborateur/voir/<str:siren>/', views.voir_questionnaire, name='voir_questionnaire'),
 
     # Actions - Édition, Suppression, Export
+    path('collaborateur/archiver/', views.archiver_entreprises, name='archiver_entreprises'),
     path('collaborateur/archiver/<str:siren>/', views.archiver_entreprise, name='archiver_entreprise'),
     path('collaborateur/editer/<str:siren>/', views.editer_entreprise, name='editer_entreprise'),
     path('collaborateur/export-csv/', views.export_csv, name='export_csv'),
+    path('collaborateur/import-csv/', views.import_csv, name='import_csv'),
+
+    # Supervision
+    path('metrics', views.metrics, name='metrics'),
 ]
@@ -1,8 +1,12 @@
+import time
 import requests
 from django.conf import settings
 from django.core.cache import cache
 import logging
 
+from . import metrics
+from .instrumentation import timed_phase
+
 logger = logging.getLogger(__name__)
 
 
@@ -15,6 +19,50 @@ ERROR_MESSAGES = {
 }
 
 
+def luhn_check_digit(partial):
+    """
+    Calcule le chiffre de contrôle Luhn à ajouter à une suite de chiffres.
+
+    Args:
+        partial (str): Chiffres sans la clé (ex: les 8 premiers chiffres d'un SIREN)
+
+    Returns:
+        str: Chiffre de contrôle (un caractère)
+    """
+    total = 0
+    # On parcourt depuis la droite : la clé sera en position 0, donc le
+    # premier chiffre lu ici (position 1) est doublé.
+    for index, digit in enumerate(reversed(partial)):
+        value = int(digit)
+        if index % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def is_luhn_valid(number):
+    """Vérifie qu'un numéro (SIREN, SIRET...) respecte l'algorithme de Luhn"""
+    if not number or not number.isdigit():
+        return False
+    return luhn_check_digit(number[:-1]) == number[-1]
+
+
+def _record_insee_call(debut, resultat):
+    """Alimente les métriques d'un appel à l'API INSEE (statut HTTP ou type d'échec)"""
+    if resultat == 200:
+        outcome = 'success'
+    elif resultat == 404:
+        outcome = 'not_found'
+    elif isinstance(resultat, int):
+        outcome = 'http_error'
+    else:
+        outcome = resultat
+    metrics.observe('etac_insee_request_duration_seconds', time.perf_counter() - debut)
+    metrics.inc('etac_insee_requests_total', {'outcome': outcome})
+
+
 def get_company_info(siren):
     """
     Récupère les informations d'une entreprise via l'API INSEE Sirene 3.11.
@@ -33,10 +81,13 @@ def get_company_info(siren):
     """
     # Vérifier le cache
     cache_key = f'insee_siren_{siren}'
-    cached = cache.get(cache_key)
+    with timed_phase('cache'):
+        cached = cache.get(cache_key)
     if cached:
+        metrics.inc('etac_cache_lookups_total', {'cache': 'insee', 'result': 'hit'})
         logger.info(f'API INSEE - Cache hit for SIREN {siren}')
         return cached
+    metrics.inc('etac_cache_lookups_total', {'cache': 'insee', 'result': 'miss'})
 
     # Validation format SIREN
     if not siren or len(siren) != 9 or not siren.isdigit():
@@ -46,14 +97,18 @@ def get_company_info(siren):
         }
 
     # Appel API INSEE avec nouvelle version 3.11
-    url = f'https://api.insee.fr/api-sirene/3.11/siren/{siren}'
+    url = f'{settings.INSEE_API_URL}/siren/{siren}'
     headers = {
         'X-INSEE-Api-Key-Integration': settings.INSEE_API_KEY
     }
 
+    debut = time.perf_counter()
+    response = None
     try:
         logger.info(f'API INSEE - Calling API for SIREN {siren}')
-        response = requests.get(url, headers=headers, timeout=5)
+        with timed_phase('insee'):
+            response = requests.get(url, headers=headers, timeout=5)
+        _record_insee_call(debut, response.status_code)
 
         if response.status_code == 200:
             data = response.json()
@@ -107,6 +162,7 @@ def get_company_info(siren):
             }
 
     except requests.Timeout:
+        _record_insee_call(debut, 'timeout')
         logger.error(f'API INSEE - Timeout for SIREN {siren}')
         error_key = 'Délai d\'attente dépassé'
         return {
@@ -114,6 +170,8 @@ def get_company_info(siren):
             'error': ERROR_MESSAGES.get(error_key, error_key)
         }
     except Exception as e:
+        if response is None:
+            _record_insee_call(debut, 'exception')
         logger.error(f'API INSEE - Exception for SIREN {siren}: {str(e)}')
         error_key = 'Erreur technique'
         return {
@@ -0,0 +1,77 @@
+"""
+Schéma de validation des questionnaires pour le navigateur.
+
+Généré à partir des formulaires Django (champs obligatoires, choix possibles,
+longueurs maximales) : static/questionnaires/js/validation.js s'en sert pour
+bloquer les soumissions manifestement invalides avant l'envoi. Le serveur
+reste seul juge : le formulaire Django valide toujours la soumission.
+
+Le schéma est calculé une fois par processus. Sa version est une empreinte
+de son contenu : elle change avec la définition des formulaires, et l'URL
+versionnée (?v=...) peut être gardée indéfiniment en cache par le navigateur.
+"""
+import hashlib
+import json
+from functools import cache
+
+from django import forms
+
+from .brouillons import FORMULAIRES
+
+
+def _regles(champ):
+    """
+    Règles d'un champ de formulaire (clés absentes = pas de contrainte).
+
+    Returns:
+        dict: {'requis', 'choix', 'multiple', 'max', 'libelle'}
+    """
+    regles = {}
+    if champ.required:
+        regles['requis'] = True
+    if isinstance(champ, forms.ChoiceField):
+        regles['choix'] = [str(code) for code, _ in champ.choices if code != '']
+        if isinstance(champ, forms.MultipleChoiceField):
+            regles['multiple'] = True
+    if getattr(champ, 'max_length', None):
+        regles['max'] = champ.max_length
+    if regles:
+        regles['libelle'] = str(champ.label)
+    return regles
+
+
+def schema(type_questionnaire):
+    """
+    Schéma de validation d'un questionnaire. Seuls les champs contraints y
+    figurent (pas les cases à cocher ni les textes libres sans limite).
+
+    Returns:
+        dict: {'version', 'champs': {champ: règles}}
+    """
+    # Instance et non base_fields : certains champs deviennent obligatoires dans __init__
+    formulaire = FORMULAIRES[type_questionnaire]()
+    champs = {}
+    for nom, champ in formulaire.fields.items():
+        regles = _regles(champ)
+        if regles:
+            champs[nom] = regles
+    definition = json.dumps(champs, sort_keys=True, ensure_ascii=False)
+    version = hashlib.sha256(definition.encode('utf-8')).hexdigest()[:12]
+    return {'version': version, 'champs': champs}
+
+
+@cache
+def schema_json(type_questionnaire):
+    """
+    Schéma sérialisé, calculé au premier appel pour chaque questionnaire.
+
+    Returns:
+        tuple: (version, contenu JSON en octets)
+    """
+    contenu = schema(type_questionnaire)
+    return contenu['version'], json.dumps(contenu, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def version(type_questionnaire):
+    """Version courante du schéma, pour l'URL versionnée des gabarits"""
+    return schema_json(type_questionnaire)[0]
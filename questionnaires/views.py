@@ -1,12 +1,24 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse
-from django.views.decorators.http import require_http_methods
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import etag, require_http_methods
 from django.db.models import Q
 from django.core.paginator import Paginator
+from django.template.defaultfilters import pluralize
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
 import csv
-from .models import Entreprise, QuestionnaireClient, QuestionnaireCollaborateur
+import io
+import json
+import time
+from urllib.parse import urlencode
+from . import brouillons, importation, metrics as metrics_registry, validation
+from .enregistrement import assurer_entreprise, enregistrer_questionnaire
+from .pages import page_anonyme
+from .models import Brouillon, Entreprise, QuestionnaireClient, QuestionnaireCollaborateur
 from .forms import QuestionnaireClientForm, QuestionnaireCollaborateurForm
 from .utils import get_company_info
 
@@ -65,11 +77,13 @@ def _process_siren_identification(request, siren, session_prefix, check_existing
     }
 
 
+@page_anonyme
 def home(request):
     """Page d'accueil avec les 2 CTA"""
     return render(request, 'questionnaires/home.html')
 
 
+@page_anonyme
 def mentions_legales(request):
     """Page mentions légales et RGPD"""
     return render(request, 'questionnaires/mentions_legales.html')
@@ -79,6 +93,7 @@ def mentions_legales(request):
 # PARCOURS CLIENT
 # ============================================================================
 
+@page_anonyme
 def client_introduction(request):
     """Page d'introduction du parcours client"""
     return render(request, 'questionnaires/client/introduction.html')
@@ -155,25 +170,15 @@ def client_questionnaire(request):
         messages.error(request, 'Session expirée. Veuillez recommencer.')
         return redirect('client_identification')
 
-    # Créer ou récupérer l'entreprise
-    entreprise, created = Entreprise.objects.get_or_create(
-        siren=siren,
-        defaults={'nom_entreprise': nom_entreprise}
-    )
-
-    # Récupérer l'instance existante si elle existe
-    questionnaire = getattr(entreprise, 'questionnaire_client', None)
-
     if request.method == 'POST':
-        form = QuestionnaireClientForm(request.POST, instance=questionnaire)
+        form = QuestionnaireClientForm(brouillons.donnees_soumises(request.POST, siren, Brouillon.TYPE_CLIENT))
         if form.is_valid():
-            questionnaire = form.save(commit=False)
-            questionnaire.entreprise = entreprise
-            questionnaire.save()
-            form.save_m2m()  # Nécessaire pour sauvegarder les ManyToMany (accompagnement_souhaite)
+            # Entreprise et questionnaire créés ou mis à jour en deux requêtes
+            enregistrer_questionnaire(form, siren, nom_entreprise)
+            brouillons.supprimer(siren, Brouillon.TYPE_CLIENT)
 
             # Stocker l'ID du questionnaire en session
-            request.session['questionnaire_id'] = str(entreprise.siren)
+            request.session['questionnaire_id'] = str(siren)
             messages.success(request, 'Questionnaire enregistré avec succès !')
             return redirect('client_recapitulatif')
         else:
@@ -186,15 +191,91 @@ def client_questionnaire(request):
                         field_label = form.fields[field].label or field
                         messages.error(request, f'{field_label}: {error}')
     else:
+        assurer_entreprise(siren, nom_entreprise)
+        questionnaire = QuestionnaireClient.objects.filter(entreprise=siren).first()
         form = QuestionnaireClientForm(instance=questionnaire)
 
     return render(request, 'questionnaires/client/questionnaire.html', {
         'siren': siren,
         'nom_entreprise': nom_entreprise,
-        'form': form
+        'form': form,
+        'brouillon': brouillons.charger(siren, Brouillon.TYPE_CLIENT),
+        'schema_version': validation.version(Brouillon.TYPE_CLIENT),
     })
 
 
+@require_http_methods(["GET", "PATCH"])
+def brouillon_questionnaire(request, type_questionnaire):
+    """
+    API des brouillons de questionnaires (cf. questionnaires.brouillons),
+    pour le SIREN en session du parcours client ou collaborateur.
+
+    GET : {'version', 'donnees'} du brouillon en cours.
+    PATCH {'version': n, 'champs': {...}} : fusionne les champs modifiés
+    depuis la version n et renvoie {'version'} ; 409 avec l'état courant
+    ({'version', 'donnees'}) si la version est périmée, 404 si l'entreprise
+    n'existe plus.
+    """
+    if type_questionnaire == Brouillon.TYPE_CLIENT:
+        siren = request.session.get('client_siren')
+    elif type_questionnaire == Brouillon.TYPE_COLLABORATEUR:
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentification requise'}, status=403)
+        siren = request.session.get('collab_siren')
+    else:
+        return JsonResponse({'error': 'Type de questionnaire inconnu'}, status=404)
+    if not siren:
+        return JsonResponse({'error': 'Session expirée. Veuillez recommencer.'}, status=403)
+
+    if request.method == 'GET':
+        return JsonResponse(brouillons.charger(siren, type_questionnaire) or {'version': 0, 'donnees': {}})
+
+    try:
+        corps = json.loads(request.body)
+        if not isinstance(corps, dict):
+            raise brouillons.DiffInvalide('Objet JSON attendu')
+        brouillon = brouillons.appliquer(
+            siren, type_questionnaire, corps.get('version'), corps.get('champs'),
+            auteur=request.user if request.user.is_authenticated else None,
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except brouillons.VersionPerimee as e:
+        return JsonResponse({'version': e.brouillon.version, 'donnees': e.brouillon.donnees}, status=409)
+    except brouillons.EntrepriseInconnue:
+        return JsonResponse({'error': 'Entreprise introuvable'}, status=404)
+    return JsonResponse({'version': brouillon.version})
+
+
+def _version_schema(request, type_questionnaire):
+    if type_questionnaire in brouillons.FORMULAIRES:
+        return validation.version(type_questionnaire)
+    return None
+
+
+@require_http_methods(["GET"])
+@etag(_version_schema)
+def schema_validation(request, type_questionnaire):
+    """
+    Schéma de validation d'un questionnaire pour le navigateur
+    (cf. questionnaires.validation), sans accès à la base.
+
+    Avec la version courante en paramètre (?v=...), la réponse est gardée
+    en cache indéfiniment : une nouvelle définition change l'URL. Sinon le
+    navigateur revalide avec l'ETag (304 si le schéma n'a pas changé).
+    """
+    if type_questionnaire not in brouillons.FORMULAIRES:
+        return JsonResponse({'error': 'Type de questionnaire inconnu'}, status=404)
+    version, contenu = validation.schema_json(type_questionnaire)
+    response = HttpResponse(contenu, content_type='application/json')
+    if request.GET.get('v') == version:
+        patch_cache_control(response, public=True, max_age=365 * 24 * 3600, immutable=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+@page_anonyme
 def client_recapitulatif(request):
     """Page de récapitulatif client"""
     return render(request, 'questionnaires/client/recapitulatif.html')
@@ -204,24 +285,21 @@ def client_recapitulatif(request):
 # PARCOURS COLLABORATEUR
 # ============================================================================
 
-@login_required
-def dashboard(request):
-    """Dashboard collaborateur avec filtres et recherche"""
-    # Récupérer les paramètres de filtrage
-    search_query = request.GET.get('search', '').strip()
-    filter_questionnaire = request.GET.get('filter', 'all')
-    sort_by = request.GET.get('sort', '-date_modification')
+def _filter_entreprises(params):
+    """
+    Entreprises correspondant aux filtres du dashboard (recherche, type de
+    questionnaire, statut d'archivage).
 
-    # Statistiques
-    total_entreprises = Entreprise.objects.filter(is_archived=False).count()
-    questionnaires_client = QuestionnaireClient.objects.count()
-    questionnaires_collaborateur = QuestionnaireCollaborateur.objects.count()
+    Args:
+        params: QueryDict (GET du dashboard ou POST des actions groupées)
 
-    # Liste des entreprises avec filtres
-    entreprises = Entreprise.objects.filter(is_archived=False).select_related(
-        'questionnaire_client',
-        'questionnaire_collaborateur'
-    )
+    Returns:
+        QuerySet d'Entreprise
+    """
+    search_query = params.get('search', '').strip()
+    filter_questionnaire = params.get('filter', 'all')
+
+    entreprises = Entreprise.objects.filter(is_archived=params.get('statut') == 'archived')
 
     # Recherche par SIREN ou nom
     if search_query:
@@ -252,11 +330,50 @@ def dashboard(request):
             questionnaire_collaborateur__isnull=True
         )
 
-    # Tri
-    valid_sorts = ['siren', '-siren', 'nom_entreprise', '-nom_entreprise',
+    return entreprises
+
+
+# Tris proposés par le dashboard. Chacun est servi par un index de Entreprise
+# (index partiels par statut d'archivage, ou clé primaire) : pas de tri en mémoire.
+DASHBOARD_SORTS = ['siren', '-siren', 'nom_entreprise', '-nom_entreprise',
                    'date_creation', '-date_creation', 'date_modification', '-date_modification']
-    if sort_by in valid_sorts:
-        entreprises = entreprises.order_by(sort_by)
+
+
+def _order_entreprises(entreprises, sort_by):
+    """
+    Applique un tri du dashboard, départagé par le SIREN dans le même sens
+    (ordre stable entre les pages, et parcours de l'index dans un seul sens).
+    Un tri inconnu conserve l'ordre par défaut du modèle.
+    """
+    if sort_by not in DASHBOARD_SORTS:
+        return entreprises
+    if sort_by.lstrip('-') == 'siren':
+        return entreprises.order_by(sort_by)
+    return entreprises.order_by(sort_by, '-siren' if sort_by.startswith('-') else 'siren')
+
+
+@login_required
+def dashboard(request):
+    """Dashboard collaborateur avec filtres et recherche"""
+    # Récupérer les paramètres de filtrage
+    search_query = request.GET.get('search', '').strip()
+    filter_questionnaire = request.GET.get('filter', 'all')
+    statut = 'archived' if request.GET.get('statut') == 'archived' else 'active'
+    sort_by = request.GET.get('sort', '-date_modification')
+
+    # Statistiques
+    total_entreprises = Entreprise.objects.filter(is_archived=False).count()
+    questionnaires_client = QuestionnaireClient.objects.count()
+    questionnaires_collaborateur = QuestionnaireCollaborateur.objects.count()
+
+    # Liste des entreprises avec filtres
+    entreprises = _filter_entreprises(request.GET).select_related(
+        'questionnaire_client',
+        'questionnaire_collaborateur'
+    )
+
+    # Tri
+    entreprises = _order_entreprises(entreprises, sort_by)
 
     # Pagination
     paginator = Paginator(entreprises, 20)  # 20 entreprises par page
@@ -271,6 +388,7 @@ def dashboard(request):
         'page_obj': page_obj,
         'search_query': search_query,
         'filter_questionnaire': filter_questionnaire,
+        'statut': statut,
         'sort_by': sort_by,
     }
 
@@ -315,26 +433,16 @@ def collaborateur_questionnaire(request):
         messages.error(request, 'Session expirée. Veuillez recommencer.')
         return redirect('collaborateur_identification')
 
-    # Créer ou récupérer l'entreprise
-    entreprise, created = Entreprise.objects.get_or_create(
-        siren=siren,
-        defaults={'nom_entreprise': nom_entreprise}
-    )
-
-    # Récupérer l'instance existante si elle existe
-    questionnaire = getattr(entreprise, 'questionnaire_collaborateur', None)
-
     if request.method == 'POST':
-        form = QuestionnaireCollaborateurForm(request.POST, instance=questionnaire)
+        form = QuestionnaireCollaborateurForm(
+            brouillons.donnees_soumises(request.POST, siren, Brouillon.TYPE_COLLABORATEUR)
+        )
         if form.is_valid():
-            questionnaire = form.save(commit=False)
-            questionnaire.entreprise = entreprise
-            questionnaire.collaborateur = request.user
-            questionnaire.save()
-            form.save_m2m()
+            enregistrer_questionnaire(form, siren, nom_entreprise, collaborateur=request.user)
+            brouillons.supprimer(siren, Brouillon.TYPE_COLLABORATEUR)
 
             # Stocker en session
-            request.session['questionnaire_id'] = str(entreprise.siren)
+            request.session['questionnaire_id'] = str(siren)
             messages.success(request, 'Questionnaire enregistré avec succès !')
             return redirect('collaborateur_recapitulatif')
         else:
@@ -347,12 +455,16 @@ def collaborateur_questionnaire(request):
                         field_label = form.fields[field].label or field
                         messages.error(request, f'{field_label}: {error}')
     else:
+        assurer_entreprise(siren, nom_entreprise)
+        questionnaire = QuestionnaireCollaborateur.objects.filter(entreprise=siren).first()
         form = QuestionnaireCollaborateurForm(instance=questionnaire)
 
     return render(request, 'questionnaires/collaborateur/questionnaire.html', {
         'siren': siren,
         'nom_entreprise': nom_entreprise,
-        'form': form
+        'form': form,
+        'brouillon': brouillons.charger(siren, Brouillon.TYPE_COLLABORATEUR),
+        'schema_version': validation.version(Brouillon.TYPE_COLLABORATEUR),
     })
 
 
@@ -395,11 +507,49 @@ def archiver_entreprise(request, siren):
     """Archiver (soft delete) une entreprise"""
     entreprise = get_object_or_404(Entreprise, siren=siren)
     entreprise.is_archived = True
-    entreprise.save()
+    entreprise.date_archivage = timezone.now()
+    # Écriture ciblée : l'indicateur, sa date et la date de modification (auto_now)
+    entreprise.save(update_fields=['is_archived', 'date_archivage', 'date_modification'])
     messages.success(request, f'L\'entreprise {entreprise.nom_entreprise} a été archivée.')
     return redirect('dashboard')
 
 
+@login_required
+@require_http_methods(["POST"])
+def archiver_entreprises(request):
+    """
+    Archiver ou désarchiver plusieurs entreprises en une seule requête UPDATE :
+    la sélection du tableau (portee=selection) ou toutes les entreprises
+    correspondant aux filtres courants (portee=filtre).
+    """
+    archiver = request.POST.get('action') != 'desarchiver'
+
+    if request.POST.get('portee') == 'filtre':
+        entreprises = _filter_entreprises(request.POST)
+    else:
+        entreprises = Entreprise.objects.filter(siren__in=request.POST.getlist('sirens'))
+
+    maintenant = timezone.now()
+    nombre = entreprises.filter(is_archived=not archiver).update(
+        is_archived=archiver,
+        date_archivage=maintenant if archiver else None,
+        date_modification=maintenant,  # update() ne déclenche pas auto_now
+    )
+
+    if nombre:
+        action = 'archivée' if archiver else 'désarchivée'
+        messages.success(request, f'{nombre} entreprise{pluralize(nombre)} {action}{pluralize(nombre)}.')
+    else:
+        messages.warning(request, 'Aucune entreprise sélectionnée.')
+
+    parametres = {
+        cle: request.POST[cle]
+        for cle in ('search', 'filter', 'statut', 'sort')
+        if request.POST.get(cle)
+    }
+    return redirect(f"{reverse('dashboard')}?{urlencode(parametres)}" if parametres else 'dashboard')
+
+
 @login_required
 def editer_entreprise(request, siren):
     """Éditer les questionnaires d'une entreprise"""
@@ -578,28 +728,93 @@ def _build_csv_row(entreprise, qc, qco):
     ]
 
 
-@login_required
-def export_csv(request):
-    """Exporter toutes les entreprises et questionnaires en CSV"""
-    # Créer la réponse CSV
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = 'attachment; filename="export_questionnaires.csv"'
-    response.write('\ufeff')  # BOM UTF-8 pour Excel
+# Entreprises lues par bloc lors de l'export (curseur côté serveur sous
+# PostgreSQL) et lignes CSV envoyées par morceau de réponse
+EXPORT_CHUNK_SIZE = 2000
 
-    writer = csv.writer(response, delimiter=';')
 
-    # En-têtes
+def _lignes_export(entreprises):
+    """Génère le CSV d'export par morceaux, sans le construire en mémoire"""
+    debut = time.perf_counter()
+    tampon = io.StringIO()
+    writer = csv.writer(tampon, delimiter=';')
+
+    tampon.write('\ufeff')  # BOM UTF-8 pour Excel
     writer.writerow(_get_csv_headers())
 
-    # Données
+    lignes = 0
+    for entreprise in entreprises.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        qc = getattr(entreprise, 'questionnaire_client', None)
+        qco = getattr(entreprise, 'questionnaire_collaborateur', None)
+        writer.writerow(_build_csv_row(entreprise, qc, qco))
+        lignes += 1
+        if lignes % EXPORT_CHUNK_SIZE == 0:
+            yield tampon.getvalue()
+            tampon.seek(0)
+            tampon.truncate()
+    yield tampon.getvalue()
+
+    metrics_registry.observe('etac_export_duration_seconds', time.perf_counter() - debut, {'format': 'csv'})
+    metrics_registry.inc('etac_export_rows_total', {'format': 'csv'}, lignes)
+
+
+@login_required
+def export_csv(request):
+    """Exporter toutes les entreprises et questionnaires en CSV (réponse en flux)"""
     entreprises = Entreprise.objects.filter(is_archived=False).select_related(
         'questionnaire_client',
         'questionnaire_collaborateur'
     )
 
-    for entreprise in entreprises:
-        qc = getattr(entreprise, 'questionnaire_client', None)
-        qco = getattr(entreprise, 'questionnaire_collaborateur', None)
-        writer.writerow(_build_csv_row(entreprise, qc, qco))
-
+    response = StreamingHttpResponse(_lignes_export(entreprises), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="export_questionnaires.csv"'
     return response
+
+
+# Nombre maximum d'erreurs affichées après un import (le détail complet est
+# disponible via la commande import_csv --rapport)
+ERREURS_IMPORT_AFFICHEES = 200
+
+
+@login_required
+def import_csv(request):
+    """Importer (créer ou mettre à jour) des entreprises depuis un CSV d'export - staff uniquement"""
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+
+    context = {}
+    if request.method == 'POST':
+        fichier = request.FILES.get('fichier')
+        if fichier is None:
+            messages.error(request, 'Veuillez sélectionner un fichier CSV.')
+        else:
+            try:
+                rapport = importation.import_csv(
+                    importation.ouvrir_fichier_envoye(fichier), utilisateur=request.user
+                )
+            except importation.FichierInvalide as e:
+                messages.error(request, str(e))
+            else:
+                context['rapport'] = rapport
+                context['erreurs'] = rapport.erreurs[:ERREURS_IMPORT_AFFICHEES]
+
+    return render(request, 'questionnaires/collaborateur/import_csv.html', context)
+
+
+# ============================================================================
+# SUPERVISION
+# ============================================================================
+
+@require_http_methods(["GET"])
+def metrics(request):
+    """
+    Métriques au format texte Prometheus.
+    Accès réservé aux IP de METRICS_ALLOWED_IPS et aux membres du staff.
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        if not (request.user.is_authenticated and request.user.is_staff):
+            return HttpResponseForbidden()
+    return HttpResponse(
+        metrics_registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -1,142 +1,158 @@
 /**
- * Autosave questionnaire dans localStorage
- * Sauvegarde automatique toutes les 30 secondes
+ * Brouillon du questionnaire enregistré côté serveur
+ * Seuls les champs modifiés depuis la dernière version acquittée sont
+ * envoyés (PATCH), après une courte pause de saisie, quand le navigateur
+ * est inactif. Les champs modifiés sont suivis par form-state.js.
+ * Cf. questionnaires/brouillons.py
  */
 
 (function() {
     'use strict';
 
-    const AUTOSAVE_INTERVAL = 30000; // 30 secondes
-    let autosaveTimer = null;
-    let formId = null;
+    const DELAI_ENVOI = 1500; // ms sans saisie avant l'envoi des modifications
+    const DELAI_INACTIVITE = 2000; // ms d'attente maximale d'un moment d'inactivité
+    const DELAI_REESSAI = 10000; // ms avant un nouvel essai après une erreur
+    const CHAMP_PROMOTION = 'brouillon';
 
-    /**
-     * Initialiser l'autosave pour un formulaire
-     */
-    function initAutosave(formElement) {
-        if (!formElement) return;
-
-        formId = formElement.id || 'questionnaire-form';
-        const storageKey = `autosave_${formId}_${window.location.pathname}`;
+    const siInactif = window.requestIdleCallback
+        || ((fonction) => setTimeout(fonction, 0));
 
-        // Charger les données sauvegardées au chargement
-        loadAutosavedData(formElement, storageKey);
+    let url = null;
+    let etat = null;
+    let version = 0; // dernière version acquittée par le serveur (0 = pas de brouillon)
+    let envoiEnCours = null;
+    let renvoyer = false;
+    let minuterie = null;
+    let soumis = false; // plus aucun envoi une fois le formulaire soumis
 
-        // Afficher un indicateur si des données ont été restaurées
-        const savedData = localStorage.getItem(storageKey);
-        if (savedData) {
-            showAutosaveNotification('Données restaurées depuis la dernière sauvegarde automatique.');
+    /**
+     * Initialiser le brouillon pour un formulaire
+     */
+    function initAutosave(form) {
+        url = form.dataset.brouillonUrl;
+        if (!url) return;
+        etat = window.EtatFormulaire.pour(form);
+
+        // Anciennes sauvegardes locales (avant les brouillons serveur)
+        Object.keys(localStorage)
+            .filter(cle => cle.startsWith('autosave_'))
+            .forEach(cle => localStorage.removeItem(cle));
+
+        // Reprendre le brouillon en cours, éventuellement saisi sur un autre appareil
+        const element = document.getElementById('brouillon-data');
+        const brouillon = element ? JSON.parse(element.textContent) : null;
+        if (brouillon && brouillon.version) {
+            version = brouillon.version;
+            etat.definirReference(brouillon.donnees);
+            etat.restaurer(brouillon.donnees);
+            showAutosaveNotification('Brouillon restauré depuis la dernière sauvegarde.');
         }
 
-        // Sauvegarder toutes les 30 secondes
-        autosaveTimer = setInterval(() => {
-            saveFormData(formElement, storageKey);
-        }, AUTOSAVE_INTERVAL);
-
-        // Sauvegarder avant de quitter la page
-        window.addEventListener('beforeunload', () => {
-            saveFormData(formElement, storageKey);
+        etat.abonner(() => planifier(DELAI_ENVOI));
+
+        // Envoyer les dernières modifications avant de quitter la page
+        window.addEventListener('pagehide', () => envoyer(true));
+
+        form.addEventListener('submit', (event) => {
+            clearTimeout(minuterie);
+            soumis = true;
+            if (envoiEnCours) {
+                // Attendre l'acquittement : un envoi arrivant après la
+                // soumission recréerait le brouillon
+                event.preventDefault();
+                envoiEnCours.finally(() => {
+                    preparerSoumission(form);
+                    form.submit();
+                });
+                return;
+            }
+            preparerSoumission(form);
         });
 
-        // Nettoyer la sauvegarde lors de la soumission du formulaire
-        formElement.addEventListener('submit', () => {
-            localStorage.removeItem(storageKey);
-            if (autosaveTimer) {
-                clearInterval(autosaveTimer);
-            }
+        // Retour arrière après soumission : formulaire de nouveau complet
+        window.addEventListener('pageshow', () => {
+            soumis = false;
+            Array.from(form.elements).forEach(champ => { champ.disabled = false; });
+            const promotion = form.querySelector(`input[name="${CHAMP_PROMOTION}"]`);
+            if (promotion) promotion.remove();
         });
+    }
 
-        // Ajouter un bouton pour vider la sauvegarde
-        addClearAutosaveButton(formElement, storageKey);
+    function planifier(delai) {
+        clearTimeout(minuterie);
+        minuterie = setTimeout(() => siInactif(() => envoyer(), { timeout: DELAI_INACTIVITE }), delai);
     }
 
     /**
-     * Sauvegarder les données du formulaire
+     * Envoyer les champs modifiés depuis la dernière version acquittée
      */
-    function saveFormData(form, storageKey) {
-        const formData = new FormData(form);
-        const data = {};
-
-        // Collecter toutes les données du formulaire (sauf le token CSRF)
-        for (let [key, value] of formData.entries()) {
-            // Ne pas sauvegarder le token CSRF
-            if (key === 'csrfmiddlewaretoken') continue;
-
-            if (data[key]) {
-                // Si la clé existe déjà, c'est un champ multiple (checkbox)
-                if (Array.isArray(data[key])) {
-                    data[key].push(value);
-                } else {
-                    data[key] = [data[key], value];
-                }
-            } else {
-                data[key] = value;
-            }
+    function envoyer(keepalive = false) {
+        if (soumis) return null;
+        if (envoiEnCours) {
+            renvoyer = true;
+            return envoiEnCours;
         }
+        const diff = etat.modifications();
+        if (!Object.keys(diff).length) return null;
 
-        // Sauvegarder dans localStorage
-        try {
-            localStorage.setItem(storageKey, JSON.stringify({
-                data: data,
-                timestamp: new Date().toISOString()
-            }));
-            showAutosaveIndicator();
-        } catch (e) {
-            console.error('Erreur lors de la sauvegarde automatique:', e);
-        }
+        const form = document.getElementById('questionnaire-form');
+        envoiEnCours = fetch(url, {
+            method: 'PATCH',
+            credentials: 'same-origin',
+            keepalive: keepalive,
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': form.elements.csrfmiddlewaretoken.value,
+            },
+            body: JSON.stringify({ version: version, champs: diff }),
+        }).then(async (reponse) => {
+            const corps = await reponse.json();
+            if (reponse.ok) {
+                version = corps.version;
+                etat.acquitter(diff);
+                showAutosaveIndicator();
+            } else if (reponse.status === 409) {
+                // Brouillon modifié depuis un autre appareil : reprendre ses
+                // réponses, sauf pour les champs modifiés ici, puis renvoyer
+                version = corps.version;
+                etat.definirReference(corps.donnees);
+                etat.restaurer(corps.donnees, diff);
+                renvoyer = true;
+            } else {
+                throw new Error(corps.error || reponse.status);
+            }
+        }).catch((e) => {
+            console.error('Erreur lors de la sauvegarde du brouillon:', e);
+            planifier(DELAI_REESSAI);
+        }).finally(() => {
+            envoiEnCours = null;
+            if (renvoyer) {
+                renvoyer = false;
+                envoyer();
+            }
+        });
+        return envoiEnCours;
     }
 
     /**
-     * Charger les données sauvegardées
+     * Soumission finale : si le brouillon est à jour, seuls les champs pas
+     * encore acquittés sont envoyés et le serveur complète avec le brouillon
      */
-    function loadAutosavedData(form, storageKey) {
-        try {
-            const saved = localStorage.getItem(storageKey);
-            if (!saved) return;
-
-            const { data, timestamp } = JSON.parse(saved);
-
-            // Vérifier que la sauvegarde n'est pas trop ancienne (24h)
-            const savedDate = new Date(timestamp);
-            const now = new Date();
-            const hoursDiff = (now - savedDate) / (1000 * 60 * 60);
-
-            if (hoursDiff > 24) {
-                localStorage.removeItem(storageKey);
-                return;
+    function preparerSoumission(form) {
+        const diff = etat.modifications();
+        // Pas de brouillon, ou un champ vidé (absent d'un POST) : envoi complet
+        if (!version || Object.values(diff).includes(null)) return;
+
+        Array.from(form.elements).forEach(champ => {
+            if (champ.name && champ.name !== 'csrfmiddlewaretoken' && !(champ.name in diff)) {
+                champ.disabled = true;
             }
-
-            // Restaurer les données dans le formulaire
-            for (let [key, value] of Object.entries(data)) {
-                const field = form.elements[key];
-                if (!field) continue;
-
-                if (field.type === 'radio') {
-                    // Radio buttons
-                    const radio = form.querySelector(`input[name="${key}"][value="${value}"]`);
-                    if (radio) radio.checked = true;
-                } else if (field.type === 'checkbox') {
-                    // Checkboxes
-                    if (Array.isArray(value)) {
-                        value.forEach(v => {
-                            const checkbox = form.querySelector(`input[name="${key}"][value="${v}"]`);
-                            if (checkbox) checkbox.checked = true;
-                        });
-                    } else {
-                        if (field.value === value || value === '1' || value === 'on') {
-                            field.checked = true;
-                        }
-                    }
-                } else {
-                    // Champs texte, textarea, select
-                    field.value = value;
-                }
-            }
-
-        } catch (e) {
-            console.error('Erreur lors du chargement de la sauvegarde:', e);
-            localStorage.removeItem(storageKey);
-        }
+        });
+        const promotion = document.createElement('input');
+        promotion.type = 'hidden';
+        promotion.name = CHAMP_PROMOTION;
+        promotion.value = '1';
+        form.appendChild(promotion);
     }
 
     /**
@@ -161,7 +177,7 @@
                 opacity: 0;
                 transition: opacity 0.3s;
             `;
-            indicator.textContent = '✓ Sauvegarde automatique';
+            indicator.textContent = '✓ Brouillon enregistré';
             document.body.appendChild(indicator);
         }
 
@@ -205,37 +221,7 @@
         }, 2000);
     }
 
-    /**
-     * Ajouter un bouton pour vider la sauvegarde automatique
-     */
-    function addClearAutosaveButton(form, storageKey) {
-        // Vérifier s'il y a des données sauvegardées
-        const saved = localStorage.getItem(storageKey);
-        if (!saved) return;
-
-        // Créer le bouton
-        const button = document.createElement('button');
-        button.type = 'button';
-        button.className = 'btn btn-link';
-        button.style.cssText = 'margin-top: 10px; font-size: 0.9rem;';
-        button.textContent = 'Vider la sauvegarde automatique';
-        button.onclick = () => {
-            if (confirm('Êtes-vous sûr de vouloir supprimer la sauvegarde automatique ?')) {
-                localStorage.removeItem(storageKey);
-                button.remove();
-                form.reset();
-                alert('Sauvegarde automatique supprimée.');
-            }
-        };
-
-        // Insérer le bouton après les actions du formulaire
-        const formActions = form.querySelector('.form-actions');
-        if (formActions) {
-            formActions.appendChild(button);
-        }
-    }
-
-    // Initialiser l'autosave au chargement de la page
+    // Initialiser le brouillon au chargement de la page
     document.addEventListener('DOMContentLoaded', function() {
         const form = document.getElementById('questionnaire-form');
         if (form) {
@@ -0,0 +1,173 @@
+/**
+ * État partagé du questionnaire
+ * Les valeurs sont tenues à jour champ par champ à partir des événements
+ * input/change : aucun parcours complet du formulaire après l'initialisation.
+ * Utilisé par autosave.js (champs modifiés depuis le dernier enregistrement)
+ * et progress-bar.js (champs obligatoires remplis).
+ *
+ * Valeur d'un champ : texte, liste de textes (cases à cocher multiples), ou
+ * undefined si rien n'est saisi ou coché (comme pour un envoi de formulaire).
+ */
+
+(function() {
+    'use strict';
+
+    const IGNORES = ['csrfmiddlewaretoken', 'brouillon'];
+    const etats = new WeakMap();
+
+    function egales(a, b) {
+        if (Array.isArray(a) && Array.isArray(b)) {
+            return a.length === b.length && a.every((valeur, i) => valeur === b[i]);
+        }
+        return a === b;
+    }
+
+    /**
+     * Créer l'état d'un formulaire
+     */
+    function creerEtat(form) {
+        const valeurs = {}; // champ -> valeur courante
+        let reference = {}; // champ -> valeur enregistrée (brouillon)
+        const modifies = new Set(); // champs dont la valeur diffère de la référence
+        const abonnes = [];
+        const noms = new Set();
+
+        Array.from(form.elements).forEach(champ => {
+            if (champ.name && !IGNORES.includes(champ.name) && !['submit', 'button'].includes(champ.type)) {
+                noms.add(champ.name);
+            }
+        });
+
+        /**
+         * Lire la valeur d'un seul champ dans le formulaire
+         */
+        function lire(nom) {
+            const item = form.elements.namedItem(nom);
+            if (!item) return undefined;
+            const elements = item instanceof RadioNodeList ? Array.from(item) : [item];
+            const lues = [];
+            elements.forEach(element => {
+                if (element.disabled) return;
+                if (element.type === 'radio' || element.type === 'checkbox') {
+                    if (element.checked) lues.push(element.value);
+                } else {
+                    lues.push(element.value);
+                }
+            });
+            if (!lues.length) return undefined;
+            return lues.length === 1 ? lues[0] : lues;
+        }
+
+        function comparer(nom) {
+            if (egales(valeurs[nom], reference[nom])) {
+                modifies.delete(nom);
+            } else {
+                modifies.add(nom);
+            }
+        }
+
+        function actualiser(nomsModifies) {
+            nomsModifies.forEach(nom => {
+                valeurs[nom] = lire(nom);
+                comparer(nom);
+            });
+            abonnes.forEach(abonne => abonne(nomsModifies));
+        }
+
+        noms.forEach(nom => {
+            valeurs[nom] = lire(nom);
+            comparer(nom);
+        });
+
+        function surEvenement(event) {
+            const nom = event.target.name;
+            if (noms.has(nom)) actualiser([nom]);
+        }
+        form.addEventListener('input', surEvenement);
+        form.addEventListener('change', surEvenement);
+
+        return {
+            noms: noms,
+
+            valeur(nom) {
+                return valeurs[nom];
+            },
+
+            /**
+             * Champs modifiés depuis la référence : champ -> valeur (null = vidé)
+             */
+            modifications() {
+                const diff = {};
+                modifies.forEach(nom => {
+                    diff[nom] = valeurs[nom] === undefined ? null : valeurs[nom];
+                });
+                return diff;
+            },
+
+            /**
+             * Enregistrer comme référence des valeurs acquittées par le serveur
+             * (un champ modifié depuis leur envoi reste modifié)
+             */
+            acquitter(diff) {
+                Object.keys(diff).forEach(nom => {
+                    if (diff[nom] === null) {
+                        delete reference[nom];
+                    } else {
+                        reference[nom] = diff[nom];
+                    }
+                    comparer(nom);
+                });
+            },
+
+            /**
+             * Remplacer toute la référence (brouillon relu sur le serveur)
+             */
+            definirReference(donnees) {
+                reference = Object.assign({}, donnees);
+                noms.forEach(comparer);
+            },
+
+            /**
+             * Remplir le formulaire avec des valeurs, sauf les champs `exclus`
+             */
+            restaurer(donnees, exclus = {}) {
+                const restaures = [];
+                noms.forEach(nom => {
+                    if (nom in exclus) return;
+                    const item = form.elements.namedItem(nom);
+                    const elements = item instanceof RadioNodeList ? Array.from(item) : [item];
+                    const attendues = [].concat(donnees[nom] ?? []);
+                    elements.forEach(element => {
+                        if (element.type === 'radio' || element.type === 'checkbox') {
+                            element.checked = attendues.includes(element.value);
+                        } else if (element.type !== 'hidden') {
+                            element.value = attendues[0] ?? '';
+                        }
+                    });
+                    restaures.push(nom);
+                });
+                actualiser(restaures);
+            },
+
+            /**
+             * S'abonner aux modifications : fonction appelée avec la liste des champs modifiés
+             */
+            abonner(fonction) {
+                abonnes.push(fonction);
+            },
+        };
+    }
+
+    window.EtatFormulaire = {
+        /**
+         * État d'un formulaire, créé au premier appel et partagé ensuite
+         */
+        pour(form) {
+            if (!etats.has(form)) {
+                etats.set(form, creerEtat(form));
+            }
+            return etats.get(form);
+        },
+    };
+
+})();
@@ -1,6 +1,7 @@
 /**
  * Barre de progression pour les questionnaires
- * Calcule automatiquement la progression en fonction des champs requis remplis
+ * Calcule la progression en fonction des champs requis remplis, mise à jour
+ * champ par champ à partir de l'état partagé (form-state.js)
  */
 
 (function() {
@@ -8,7 +9,9 @@
 
     let progressBar = null;
     let progressText = null;
-    let totalRequiredFields = 0;
+    let etat = null;
+    const requiredFields = new Set(); // noms des champs requis
+    const filledFields = new Set(); // noms des champs requis remplis
 
     /**
      * Initialiser la barre de progression
@@ -20,15 +23,13 @@
         // Créer la barre de progression
         createProgressBar(form);
 
-        // Compter les champs requis
-        totalRequiredFields = form.querySelectorAll('[required]').length;
+        // Recenser les champs requis (un seul nom par groupe de boutons radio)
+        form.querySelectorAll('[required]').forEach(field => requiredFields.add(field.name));
+        etat = window.EtatFormulaire.pour(form);
+        updateFields(requiredFields);
 
-        // Mettre à jour la progression au chargement
-        updateProgress();
-
-        // Mettre à jour lors des changements
-        form.addEventListener('change', updateProgress);
-        form.addEventListener('input', debounce(updateProgress, 500));
+        // Mettre à jour les seuls champs modifiés
+        etat.abonner(updateFields);
     }
 
     /**
@@ -58,25 +59,29 @@
     }
 
     /**
-     * Mettre à jour la progression
+     * Mettre à jour la progression pour des champs modifiés
      */
-    function updateProgress() {
-        const form = document.getElementById('questionnaire-form');
-        if (!form || !progressBar) return;
-
-        // Compter les champs requis remplis
-        let filledFields = 0;
-        const requiredFields = form.querySelectorAll('[required]');
-
-        requiredFields.forEach(field => {
-            if (isFieldFilled(field)) {
-                filledFields++;
+    function updateFields(names) {
+        names.forEach(name => {
+            if (!requiredFields.has(name)) return;
+            if (isFilled(etat.valeur(name))) {
+                filledFields.add(name);
+            } else {
+                filledFields.delete(name);
             }
         });
+        updateProgress();
+    }
+
+    /**
+     * Afficher la progression
+     */
+    function updateProgress() {
+        if (!progressBar) return;
 
         // Calculer le pourcentage
-        const percentage = totalRequiredFields > 0
-            ? Math.round((filledFields / totalRequiredFields) * 100)
+        const percentage = requiredFields.size > 0
+            ? Math.round((filledFields.size / requiredFields.size) * 100)
             : 0;
 
         // Mettre à jour l'affichage
@@ -96,41 +101,12 @@
     }
 
     /**
-     * Vérifier si un champ est rempli
-     */
-    function isFieldFilled(field) {
-        const type = field.type;
-        const tagName = field.tagName.toLowerCase();
-
-        if (type === 'radio') {
-            // Pour les radio, vérifier si au moins un est coché
-            const name = field.name;
-            const radios = document.querySelectorAll(`input[name="${name}"]`);
-            return Array.from(radios).some(r => r.checked);
-        } else if (type === 'checkbox') {
-            return field.checked;
-        } else if (tagName === 'select') {
-            return field.value !== '';
-        } else if (tagName === 'textarea' || type === 'text' || type === 'email' || type === 'number') {
-            return field.value.trim() !== '';
-        }
-
-        return false;
-    }
-
-    /**
-     * Debounce pour éviter trop d'appels
+     * Vérifier si une valeur (cf. form-state.js) est renseignée
      */
-    function debounce(func, wait) {
-        let timeout;
-        return function executedFunction(...args) {
-            const later = () => {
-                clearTimeout(timeout);
-                func(...args);
-            };
-            clearTimeout(timeout);
-            timeout = setTimeout(later, wait);
-        };
+    function isFilled(value) {
+        if (value === undefined) return false;
+        if (Array.isArray(value)) return value.length > 0;
+        return value.trim() !== '';
     }
 
     // Initialiser au chargement de la page
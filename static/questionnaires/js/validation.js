@@ -0,0 +1,108 @@
+/**
+ * Validation du questionnaire avant l'envoi
+ * Le schéma (champs obligatoires, choix possibles, longueurs maximales) est
+ * généré à partir des formulaires Django (cf. questionnaires/validation.py) ;
+ * son URL est versionnée, le navigateur le garde en cache.
+ * Les soumissions manifestement invalides sont bloquées ici, le serveur
+ * valide toujours la soumission. Valeurs lues dans form-state.js.
+ * Chargé avant autosave.js : une soumission bloquée ne promeut pas le brouillon.
+ */
+
+(function() {
+    'use strict';
+
+    let schema = null; // pas de validation tant que le schéma n'est pas chargé
+
+    /**
+     * Initialiser la validation pour un formulaire
+     */
+    function initValidation(form) {
+        const url = form.dataset.schemaUrl;
+        if (!url) return;
+        const etat = window.EtatFormulaire.pour(form);
+
+        fetch(url, { credentials: 'same-origin' })
+            .then(reponse => reponse.ok ? reponse.json() : null)
+            .then(corps => { schema = corps; })
+            .catch(e => console.error('Erreur lors du chargement du schéma de validation:', e));
+
+        form.addEventListener('submit', (event) => {
+            if (!schema) return;
+            const erreurs = valider(etat);
+            afficherErreurs(form, erreurs);
+            const premier = Object.keys(erreurs)[0];
+            if (premier) {
+                event.preventDefault();
+                event.stopImmediatePropagation();
+                const champ = form.elements.namedItem(premier);
+                const element = champ instanceof RadioNodeList ? champ[0] : champ;
+                if (element) {
+                    element.scrollIntoView({ behavior: 'smooth', block: 'center' });
+                    element.focus({ preventScroll: true });
+                }
+            }
+        });
+
+        // Effacer l'erreur d'un champ dès qu'il est modifié
+        etat.abonner(noms => noms.forEach(nom => effacerErreur(form, nom)));
+    }
+
+    /**
+     * Erreurs du formulaire : champ -> message
+     */
+    function valider(etat) {
+        const erreurs = {};
+        Object.entries(schema.champs).forEach(([nom, regles]) => {
+            // Champ absent de la page : laissé au serveur
+            if (!etat.noms.has(nom)) return;
+            const valeurs = [].concat(etat.valeur(nom) ?? []).filter(valeur => valeur.trim() !== '');
+            if (!valeurs.length) {
+                if (regles.requis) erreurs[nom] = 'Ce champ est obligatoire.';
+                return;
+            }
+            if (regles.choix && valeurs.some(valeur => !regles.choix.includes(valeur))) {
+                erreurs[nom] = 'Choix invalide.';
+            } else if (!regles.multiple && valeurs.length > 1) {
+                erreurs[nom] = 'Une seule réponse possible.';
+            } else if (regles.max && [...valeurs[0].trim()].length > regles.max) {
+                erreurs[nom] = `${regles.max} caractères au maximum.`;
+            }
+        });
+        return erreurs;
+    }
+
+    function elements(form, nom) {
+        const item = form.elements.namedItem(nom);
+        if (!item) return [];
+        return item instanceof RadioNodeList ? Array.from(item) : [item];
+    }
+
+    function afficherErreurs(form, erreurs) {
+        form.querySelectorAll('.field-error').forEach(message => message.remove());
+        form.querySelectorAll('input.error, textarea.error, select.error').forEach(element => element.classList.remove('error'));
+        Object.entries(erreurs).forEach(([nom, texte]) => {
+            const champs = elements(form, nom);
+            if (!champs.length) return;
+            champs.forEach(champ => champ.classList.add('error'));
+            const message = document.createElement('span');
+            message.className = 'form-help field-error';
+            message.dataset.champ = nom;
+            message.textContent = `${schema.champs[nom].libelle} : ${texte}`;
+            (champs[0].closest('.form-group') || champs[0].parentElement).appendChild(message);
+        });
+    }
+
+    function effacerErreur(form, nom) {
+        elements(form, nom).forEach(champ => champ.classList.remove('error'));
+        form.querySelectorAll(`.field-error[data-champ="${nom}"]`).forEach(message => message.remove());
+    }
+
+    // Initialiser avant autosave.js (ordre des écouteurs de soumission)
+    document.addEventListener('DOMContentLoaded', function() {
+        const form = document.getElementById('questionnaire-form');
+        if (form) {
+            initValidation(form);
+        }
+    });
+
+})();
@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        from .backends import invalider
+        from .models import User
+
+        # Cache des utilisateurs connectés (CachedModelBackend)
+        post_save.connect(invalider, sender=User, dispatch_uid='users_cache_save')
+        post_delete.connect(invalider, sender=User, dispatch_uid='users_cache_delete')
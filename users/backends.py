@@ -0,0 +1,85 @@
+"""
+Backend d'authentification avec cache des utilisateurs connectés.
+
+AuthenticationMiddleware recharge l'utilisateur de la session à chaque
+requête (get_user). Avec USER_CACHE_ALIAS, la ligne users_user est gardée
+USER_CACHE_TIMEOUT secondes dans ce cache, par identifiant : les requêtes
+suivantes des collaborateurs n'interrogent plus la table.
+
+Le cache doit être partagé entre les processus (Redis, Memcached) :
+l'invalidation ci-dessous doit atteindre tous les workers. Un cache mémoire
+local est refusé par la vérification users.E001 ; sans USER_CACHE_ALIAS,
+le backend se comporte comme ModelBackend.
+
+La sécurité de la session est inchangée :
+- déconnexion : la session est vidée, get_user n'est plus appelé ;
+- désactivation, changement de mot de passe : l'enregistrement de
+  l'utilisateur (post_save) invalide le cache, la requête suivante relit la
+  ligne (user_can_authenticate, empreinte du mot de passe en session) ;
+- suppression : post_delete invalide le cache.
+
+Une modification sans signal (QuerySet.update) est prise en compte au plus
+tard à l'expiration du cache, d'où une durée courte.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def cache_utilisateurs():
+    """Cache des utilisateurs (USER_CACHE_ALIAS), ou None s'il est absent ou local au processus"""
+    alias = getattr(settings, 'USER_CACHE_ALIAS', None)
+    if not alias or isinstance(caches[alias], LocMemCache):
+        return None
+    return caches[alias]
+
+
+def cle_cache(user_id):
+    """Clé de cache d'un utilisateur"""
+    return f'users_user_{user_id}'
+
+
+def invalider(sender, instance, **kwargs):
+    """Signal post_save / post_delete : retire l'utilisateur du cache"""
+    cache = cache_utilisateurs()
+    if cache is not None:
+        cache.delete(cle_cache(instance.pk))
+
+
+@checks.register(checks.Tags.caches)
+def verifier_cache_utilisateurs(app_configs, **kwargs):
+    """USER_CACHE_ALIAS doit désigner un cache partagé entre les processus"""
+    alias = getattr(settings, 'USER_CACHE_ALIAS', None)
+    if not alias:
+        return []
+    if alias not in settings.CACHES:
+        return [checks.Error(f'USER_CACHE_ALIAS : cache « {alias} » absent de CACHES', id='users.E002')]
+    if isinstance(caches[alias], LocMemCache):
+        return [checks.Error(
+            f'USER_CACHE_ALIAS : le cache « {alias} » est local au processus',
+            hint="L'invalidation n'atteindrait pas les autres workers : utiliser un cache "
+                 "partagé (Redis, Memcached) ou retirer USER_CACHE_ALIAS.",
+            id='users.E001',
+        )]
+    return []
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend dont get_user lit l'utilisateur dans le cache partagé"""
+
+    def get_user(self, user_id):
+        cache = cache_utilisateurs()
+        if cache is None:
+            return super().get_user(user_id)
+        cle = cle_cache(user_id)
+        user = cache.get(cle)
+        if user is None:
+            try:
+                user = get_user_model()._default_manager.get(pk=user_id)
+            except get_user_model().DoesNotExist:
+                return None
+            cache.set(cle, user, getattr(settings, 'USER_CACHE_TIMEOUT', 60))
+        return user if self.user_can_authenticate(user) else None
@@ -1,5 +1,14 @@
-from django.test import TestCase
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.urls import reverse
+
+from questionnaires.instrumentation import record_queries
+
+from .backends import verifier_cache_utilisateurs
 
 User = get_user_model()
 
@@ -60,3 +69,80 @@ class UserModelTests(TestCase):
             password='testpass123'
         )
         self.assertEqual(str(user), '[email protected]')
+
+
+class CachedModelBackendTests(TestCase):
+    """Tests pour le cache des utilisateurs connectés (cache partagé sur disque)"""
+
+    @classmethod
+    def setUpClass(cls):
+        repertoire = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(repertoire.cleanup)
+        cls.enterClassContext(override_settings(
+            CACHES={**settings.CACHES, 'utilisateurs': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': repertoire.name,
+            }},
+            USER_CACHE_ALIAS='utilisateurs',
+        ))
+        super().setUpClass()
+
+    def setUp(self):
+        caches['utilisateurs'].clear()
+        self.user = User.objects.create_user(
+            email='[email protected]',
+            username='collab',
+            password='testpass123',
+            is_collaborateur=True
+        )
+        self.client.force_login(self.user)
+        self.url = reverse('dashboard')
+
+    def _requetes_utilisateur(self):
+        with record_queries() as requetes:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [r for r in requetes if 'users_user' in r['sql']]
+
+    def test_user_loaded_once(self):
+        """Seule la première requête authentifiée lit l'utilisateur en base"""
+        self.assertEqual(len(self._requetes_utilisateur()), 1)
+        self.assertEqual(self._requetes_utilisateur(), [])
+
+    def test_deactivation_logs_out(self):
+        """Un utilisateur désactivé perd sa session malgré le cache"""
+        self._requetes_utilisateur()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertRedirects(response, f"{reverse('collaborateur_login')}?next={self.url}",
+                             fetch_redirect_response=False)
+
+    def test_password_change_invalidates_sessions(self):
+        """Un changement de mot de passe invalide les autres sessions"""
+        self._requetes_utilisateur()
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('nouveau-mot-de-passe')
+        user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_deleted_user_is_logged_out(self):
+        """Un utilisateur supprimé n'est plus chargé depuis le cache"""
+        self._requetes_utilisateur()
+        self.user.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_local_cache_is_refused(self):
+        """Un cache local au processus est refusé et n'est pas utilisé"""
+        with override_settings(USER_CACHE_ALIAS='default'):
+            self.assertEqual([e.id for e in verifier_cache_utilisateurs(None)], ['users.E001'])
+            self.assertEqual(len(self._requetes_utilisateur()), 1)
+            self.assertEqual(len(self._requetes_utilisateur()), 1)
+        self.assertEqual(verifier_cache_utilisateurs(None), [])
+
+    def test_without_alias_user_loaded_each_request(self):
+        """Sans USER_CACHE_ALIAS, l'utilisateur est relu à chaque requête (ModelBackend)"""
+        with override_settings(USER_CACHE_ALIAS=None):
+            self.assertEqual(len(self._requetes_utilisateur()), 1)
+            self.assertEqual(len(self._requetes_utilisateur()), 1)